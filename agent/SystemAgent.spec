@@ -3,10 +3,10 @@
 
 a = Analysis(
     ['main_gui.py'],
-    pathex=[],
+    pathex=['../backend/scanner'],  # icmp_engine.py is shared with the backend scanner
     binaries=[],
     datas=[('functions', 'functions'), ('block_outbound.py', '.'), ('disconnect_windows.py', '.'), ('reconnect_windows.py', '.'), ('unblock_outbound.py', '.'), ('requirements.txt', '.')],
-    hiddenimports=[],
+    hiddenimports=['icmp_engine'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
@@ -1,9 +1,21 @@
 import ipaddress
+import os
 import subprocess
 import platform
+import sys
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import netifaces
-from functions.ports import scan_ports
+from functions.ports import scan_many, DEFAULT_HOST_CONCURRENCY, DEFAULT_SOCKET_BUDGET
+
+# Batched ICMP engine: one copy, shared with backend/scanner (bundled by the .spec files).
+# Optional: without it (agent-only checkout, build missing the module) hosts are pinged by subprocess.
+SCANNER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "backend", "scanner")
+if os.path.isdir(SCANNER_DIR) and SCANNER_DIR not in sys.path:
+    sys.path.append(SCANNER_DIR)
+try:
+    from icmp_engine import icmp_sweep
+except ImportError:
+    icmp_sweep = None
 
 def get_local_network():
     """Detect the local subnet (e.g. 192.168.1.0/24) automatically."""
@@ -36,10 +48,33 @@ def ping_host(ip):
     except Exception:
         return False
 
-def scan_network(network_cidr=None, port_range="1-1024"):
+def ping_hosts(hosts, max_workers=50):
+    """
+    Return the list of hosts that answer ICMP echo.
+    Uses one batched ICMP socket; falls back to a `ping` subprocess per host
+    when this process may not open ICMP sockets (or the engine is not available).
+    """
+    hosts = [str(ip) for ip in hosts]
+    alive = icmp_sweep(hosts, timeout=1) if icmp_sweep is not None else None
+    if alive is not None:
+        return [ip for ip in hosts if ip in alive]
+
+    active = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(ping_host, ip): ip for ip in hosts}
+        for future in as_completed(futures):
+            if future.result():
+                active.append(futures[future])
+    return active
+
+def scan_network(network_cidr=None, port_range="1-1024", host_concurrency=DEFAULT_HOST_CONCURRENCY,
+                 socket_budget=DEFAULT_SOCKET_BUDGET, on_host=None):
     """
     Scans the entire network for active devices and their open ports.
     If network_cidr is not provided, it will be auto-detected.
+    Live hosts are port-scanned `host_concurrency` at a time with at most
+    `socket_budget` sockets open in total; each host's entry is passed to
+    on_host({"ip", "ports"}) as soon as its scan finishes.
     """
     if not network_cidr:
         network_cidr = get_local_network()
@@ -49,29 +84,30 @@ def scan_network(network_cidr=None, port_range="1-1024"):
         print(f"[*] Detected local network: {network_cidr}")
 
     network = ipaddress.ip_network(network_cidr, strict=False)
-    active_hosts = []
 
     print(f"[*] Scanning network {network_cidr} ...")
 
-    with ThreadPoolExecutor(max_workers=50) as executor:
-        futures = {executor.submit(ping_host, ip): ip for ip in network.hosts()}
-        for future in as_completed(futures):
-            ip = futures[future]
-            if future.result():
-                print(f"[+] Host {ip} is alive")
-                active_hosts.append(str(ip))
+    active_hosts = ping_hosts(network.hosts())
+    for ip in active_hosts:
+        print(f"[+] Host {ip} is alive")
 
     network_results = []
-    for ip in active_hosts:
+
+    def host_done(ip, ports):
         if port_range:
-            print(f"[*] Scanning ports on {ip}")
-            ports = scan_ports(ip, port_range)
-        else:
+            print(f"[+] Port scan of {ip} finished")
+        entry = {"ip": ip, "ports": ports}
+        network_results.append(entry)
+        if on_host is not None:
+            on_host(entry)
+
+    if port_range:
+        print(f"[*] Scanning ports on {len(active_hosts)} hosts ({host_concurrency} at a time)")
+        scan_many(active_hosts, port_range, host_concurrency=host_concurrency, socket_budget=socket_budget,
+                  on_host=host_done)
+    else:
+        for ip in active_hosts:
             print(f"[*] Skipping port scan for {ip} (ping-only)")
-            ports = []
-        network_results.append({
-            "ip": ip,
-            "ports": ports
-        })
+            host_done(ip, [])
 
     return network_results
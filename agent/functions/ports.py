@@ -1,14 +1,416 @@
+"""
+ports.py
+
+TCP port scanning for the agent.
+
+The default engine is a built-in asyncio connect scan: every port in the range is
+tried with a bounded number of connects in flight, and only the ports that
+accept get a short banner read (plus an HTTP HEAD where a service waits for the
+client to speak first). `nmap -sV` is optional and, when asked for, only runs
+against the ports already found open.
+
+Output is the same JSON list the nmap-only version produced:
+  [{"port", "protocol", "state", "service", "service_version"}, ...]
+
+Usage:
+  from functions.ports import scan_ports
+  scan_ports("127.0.0.1", "1-65535")                        # native scan + banners
+  scan_ports("192.168.1.10", "22,80,443,8000-8100", nmap_sv=True)
+  scan_ports("192.168.1.10", "1-1024", engine="nmap")       # previous behaviour
+  scan_many(["192.168.1.10", "192.168.1.11"], "1-1024")     # several hosts, one socket budget
+  scan_ports(engine="local")                                # this machine's listening sockets, no probing
+  scan_ports(engine="local", banners=True)                  # ... plus banner probes of the TCP listeners
+"""
+
+import asyncio
+import errno
 import json
-from nmap import PortScanner
+import os
+import re
+import socket
+
+try:
+    import resource
+except ImportError:  # Windows: no RLIMIT_NOFILE, sockets are not bounded by it
+    resource = None
+
+MAX_SOCKET_BUDGET = 1000    # sockets open at once across all hosts of scan_many(), at most
+FD_HEADROOM = 128           # descriptors kept free for stdio, the event loop's selector, logs, HTTP clients
+
+def default_socket_budget():
+    """Sockets a scan may hold open: the soft RLIMIT_NOFILE minus headroom (at most 3/4 of it), capped at MAX_SOCKET_BUDGET."""
+    if resource is None:
+        return MAX_SOCKET_BUDGET
+    try:
+        soft, _hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    except (OSError, ValueError):
+        return MAX_SOCKET_BUDGET
+    if soft == resource.RLIM_INFINITY:
+        return MAX_SOCKET_BUDGET
+    return max(16, min(MAX_SOCKET_BUDGET, soft - FD_HEADROOM, soft * 3 // 4))
 
-def scan_ports(target="127.0.0.1", port_range="1-65535"):
+DEFAULT_SOCKET_BUDGET = default_socket_budget()   # sockets open at once across all hosts of scan_many()
+DEFAULT_CONCURRENCY = min(500, DEFAULT_SOCKET_BUDGET)  # connects in flight per scan
+CONNECT_TIMEOUT = 1.0       # seconds to wait for a SYN/ACK (or RST) per port
+BANNER_TIMEOUT = 1.5        # seconds to wait for a service greeting on an open port
+BANNER_BYTES = 1024
+DEFAULT_HOST_CONCURRENCY = 16  # hosts scanned at once by scan_many()
+FD_RETRIES = 6              # back-off rounds when the process runs out of descriptors
+FD_BACKOFF = 0.05           # first back-off in seconds, doubled each round
+_FD_EXHAUSTED = (errno.EMFILE, errno.ENFILE, errno.ENOBUFS)
+
+# services that wait for the client to speak first; they get an HTTP request instead of silence
+HTTP_PORTS = {80, 81, 591, 2375, 3000, 5000, 5601, 7001, 8000, 8008, 8080, 8081, 8088, 8888, 9000, 9090, 9200}
+TLS_PORTS = {443, 465, 636, 853, 993, 995, 5061, 8443, 9443}
+
+_HTTP_SERVER = re.compile(r"^Server: *([^\r\n]+)", re.I | re.M)
+_BANNER_PATTERNS = (
+    ("ssh", re.compile(r"^SSH-[\d.]+-([^\s\r\n]+)")),
+    ("ftp", re.compile(r"^220[- ].*?\b((?:vsFTPd|ProFTPD|Pure-FTPd|FileZilla Server|Microsoft FTP Service)[^\r\n)]*)", re.I)),
+    ("smtp", re.compile(r"^220[- ]\S+ .*?E?SMTP ([^\r\n]*)", re.I)),
+    ("pop3", re.compile(r"^\+OK ([^\r\n]*)")),
+    ("imap", re.compile(r"^\* OK ([^\r\n]*)")),
+    ("redis", re.compile(r"^-(?:NOAUTH|ERR)[^\r\n]*")),
+)
+
+# ---------- Port ranges ----------
+def parse_port_range(port_range):
+    """'1-1024,8080,8443' -> sorted list of unique ports (1..65535)."""
+    ports = set()
+    for part in str(port_range or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            lo, hi = part.split("-", 1)
+            lo = int(lo) if lo.strip() else 1
+            hi = int(hi) if hi.strip() else 65535
+            ports.update(range(max(1, lo), min(65535, hi) + 1))
+        else:
+            port = int(part)
+            if 1 <= port <= 65535:
+                ports.add(port)
+    return sorted(ports)
+
+# ---------- Connect scan ----------
+async def _connect(host, port, timeout):
+    # bare non-blocking socket: much cheaper than open_connection() when most ports refuse
+    loop = asyncio.get_running_loop()
+    for attempt in range(FD_RETRIES + 1):
+        try:
+            sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+            break
+        except OSError as e:
+            # out of descriptors: wait for other connects to finish instead of failing the scan
+            if e.errno not in _FD_EXHAUSTED or attempt == FD_RETRIES:
+                return False
+            await asyncio.sleep(FD_BACKOFF * 2 ** attempt)
+    sock.setblocking(False)
+    try:
+        await asyncio.wait_for(loop.sock_connect(sock, (host, port)), timeout)
+        return True
+    except (OSError, asyncio.TimeoutError):
+        return False
+    finally:
+        sock.close()
+
+async def tcp_connect_scan(host, ports, concurrency=DEFAULT_CONCURRENCY, timeout=CONNECT_TIMEOUT, on_open=None, limit=None):
     """
-    Scan ports and return list of open ports with service info as JSON.
+    Return the sorted list of `ports` on `host` that accept a TCP connection.
+    `concurrency` workers pull ports from one shared iterator, so at most that many
+    connects (and sockets) exist at once however large the range is.
+    `limit` (asyncio.Semaphore) is a socket budget shared with other scans on the same loop.
+    on_open(port) is called as each open port is found.
+    """
+    ports = iter(ports)
+    found = []
+
+    async def worker():
+        for port in ports:
+            if limit is not None:
+                async with limit:
+                    ok = await _connect(host, port, timeout)
+            else:
+                ok = await _connect(host, port, timeout)
+            if ok:
+                found.append(port)
+                if on_open is not None:
+                    on_open(port)
+
+    await asyncio.gather(*(worker() for _ in range(max(1, int(concurrency)))))
+    return sorted(found)
+
+# ---------- Banners / service identification ----------
+async def grab_banner(host, port, timeout=BANNER_TIMEOUT):
+    """Greeting sent by the service (or its answer to an HTTP HEAD), decoded; '' if none."""
+    if port in TLS_PORTS:
+        return ""
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return ""
+    try:
+        data = b""
+        if port not in HTTP_PORTS:
+            try:
+                data = await asyncio.wait_for(reader.read(BANNER_BYTES), timeout)
+            except asyncio.TimeoutError:
+                data = b""
+        if not data:
+            # silent service: many speak HTTP (dev servers, admin UIs, APIs)
+            authority = f"[{host}]" if ":" in host else host
+            writer.write(f"HEAD / HTTP/1.0\r\nHost: {authority}\r\n\r\n".encode())
+            await writer.drain()
+            data = await asyncio.wait_for(reader.read(BANNER_BYTES), timeout)
+        return data.decode("utf-8", errors="replace")
+    except (OSError, asyncio.TimeoutError):
+        return ""
+    finally:
+        writer.close()
+
+def default_service_name(port, proto="tcp"):
+    try:
+        return socket.getservbyport(port, proto)
+    except OSError:
+        return None
+
+def identify_service(port, banner):
+    """(service, service_version) from a banner, falling back to the well-known name for the port."""
+    if banner.startswith("HTTP/"):
+        m = _HTTP_SERVER.search(banner)
+        return "http", (m.group(1).strip() if m else None)
+    for name, pattern in _BANNER_PATTERNS:
+        m = pattern.search(banner or "")
+        if m:
+            version = m.group(1).strip() if m.groups() else None
+            if name == "ssh" and version:
+                version = version.replace("_", " ", 1)  # OpenSSH_8.9p1 -> OpenSSH 8.9p1
+            return name, version or None
+    if port in TLS_PORTS:
+        return default_service_name(port) or "ssl", None
+    return default_service_name(port), None
+
+async def _probe_services(host, ports, concurrency, timeout, limit=None):
+    limit = limit or asyncio.Semaphore(max(1, int(concurrency)))
+
+    async def one(port):
+        async with limit:
+            return identify_service(port, await grab_banner(host, port, timeout))
+
+    return dict(zip(ports, await asyncio.gather(*(one(p) for p in ports))))
+
+async def native_scan(host, ports, concurrency=DEFAULT_CONCURRENCY, timeout=CONNECT_TIMEOUT, banners=True, limit=None):
+    """Connect scan of `ports`, then banner probes on the open ones. Returns result dicts."""
+    open_ports = await tcp_connect_scan(host, ports, concurrency=concurrency, timeout=timeout, limit=limit)
+    services = await _probe_services(host, open_ports, min(concurrency, 64), BANNER_TIMEOUT, limit=limit) if banners else {}
+    results = []
+    for port in open_ports:
+        service, version = services.get(port) or (default_service_name(port), None)
+        results.append({
+            "port": port,
+            "protocol": "tcp",
+            "state": "open",
+            "service": service,
+            "service_version": version,
+        })
+    return results
+
+async def scan_hosts(hosts, ports, host_concurrency=DEFAULT_HOST_CONCURRENCY, socket_budget=DEFAULT_SOCKET_BUDGET,
+                     timeout=CONNECT_TIMEOUT, banners=True, enrich=None, on_host=None):
+    """
+    native_scan() of several hosts on one event loop: at most `host_concurrency` hosts
+    at a time, and at most `socket_budget` sockets open across all of them.
+    enrich(host, results) -> results, if given, runs in a worker thread per finished host
+    (e.g. nmap -sV) without stalling the other scans.
+    on_host(host, results) is called as each host finishes. Returns {host: results}.
+    """
+    ports = list(ports)
+    limit = asyncio.Semaphore(max(1, int(socket_budget)))
+    hosts_limit = asyncio.Semaphore(max(1, int(host_concurrency)))
+    per_host = max(1, min(DEFAULT_CONCURRENCY, int(socket_budget)))
+    done = {}
+
+    async def one(host):
+        async with hosts_limit:
+            try:
+                results = await native_scan(host, ports, concurrency=per_host, timeout=timeout, banners=banners, limit=limit)
+            except Exception as e:
+                print(f"[!] Port scan of {host} failed: {e}")
+                results = []
+        if enrich is not None:
+            results = await asyncio.to_thread(enrich, host, results)
+        done[host] = results
+        if on_host is not None:
+            on_host(host, results)
+
+    await asyncio.gather(*(one(h) for h in hosts))
+    return done
+
+# ---------- Local inventory ----------
+_PROC_TCP_LISTEN = "0A"
+_PROC_UDP_UNCONNECTED = "07"
+
+def _listening_psutil():
+    import psutil
+
+    sockets = []
+    for conn in psutil.net_connections(kind="inet"):
+        if not conn.laddr:
+            continue
+        if conn.type == socket.SOCK_STREAM:
+            if conn.status != psutil.CONN_LISTEN:
+                continue
+            proto = "tcp"
+        elif conn.type == socket.SOCK_DGRAM:
+            if conn.raddr:
+                continue
+            proto = "udp"
+        else:
+            continue
+        sockets.append((proto, conn.laddr.ip, conn.laddr.port, conn.pid))
+    return sockets
+
+def _proc_addr(hex_addr):
+    ip_hex, port_hex = hex_addr.split(":")
+    raw = bytes.fromhex(ip_hex)
+    if len(raw) == 4:
+        ip = socket.inet_ntop(socket.AF_INET, raw[::-1])
+    else:
+        # /proc prints IPv6 addresses as four host-endian 32-bit words
+        raw = b"".join(raw[i:i + 4][::-1] for i in range(0, 16, 4))
+        ip = socket.inet_ntop(socket.AF_INET6, raw)
+    return ip, int(port_hex, 16)
+
+def _socket_owners():
+    """socket inode -> pid, for the processes whose fds this user may read."""
+    owners = {}
+    for pid in os.listdir("/proc"):
+        if not pid.isdigit():
+            continue
+        fd_dir = f"/proc/{pid}/fd"
+        try:
+            fds = os.listdir(fd_dir)
+        except OSError:
+            continue
+        for fd in fds:
+            try:
+                target = os.readlink(f"{fd_dir}/{fd}")
+            except OSError:
+                continue
+            if target.startswith("socket:["):
+                owners.setdefault(target[8:-1], int(pid))
+    return owners
+
+def _listening_proc():
+    sockets = []
+    owners = None
+    for proto, name, wanted in (("tcp", "tcp", _PROC_TCP_LISTEN), ("tcp", "tcp6", _PROC_TCP_LISTEN),
+                                ("udp", "udp", _PROC_UDP_UNCONNECTED), ("udp", "udp6", _PROC_UDP_UNCONNECTED)):
+        try:
+            with open(f"/proc/net/{name}") as f:
+                next(f, None)
+                rows = [line.split() for line in f]
+        except OSError:
+            continue
+        for fields in rows:
+            if len(fields) < 10 or fields[3] != wanted:
+                continue
+            if proto == "udp" and not fields[2].endswith(":0000"):
+                continue  # connected UDP socket (has a remote port)
+            if owners is None:
+                owners = _socket_owners()
+            ip, port = _proc_addr(fields[1])
+            sockets.append((proto, ip, port, owners.get(fields[9])))
+    return sockets
+
+def _process_name(pid):
+    if not pid:
+        return None
+    try:
+        import psutil
+        return psutil.Process(pid).name()
+    except Exception:
+        pass
+    try:
+        with open(f"/proc/{pid}/comm") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def listening_sockets():
+    """
+    (protocol, local address, port, pid) for every listening TCP socket and every
+    unconnected UDP socket, from psutil or, without it, /proc/net/{tcp,tcp6,udp,udp6}.
+    pid is None when the owner is not visible to this user.
     """
+    try:
+        return _listening_psutil()
+    except ImportError:
+        pass
+    except Exception as e:
+        print(f"[!] psutil socket table unavailable: {e}")
+    if os.path.isdir("/proc/net"):
+        return _listening_proc()
+    print("[!] No socket table source available (install psutil)")
+    return []
+
+def _probe_address(addresses):
+    """Where to connect to reach a local listener: a concrete bind address, else the loopback of its family."""
+    concrete = next((a for a in addresses if a not in ("0.0.0.0", "::")), None)
+    if concrete is not None:
+        return concrete
+    # an IPv6-only (V6ONLY) wildcard listener does not answer on 127.0.0.1
+    return "127.0.0.1" if "0.0.0.0" in addresses else "::1"
+
+def local_inventory(port_range=None, probe=False):
+    """
+    Result dicts (the scan_ports() schema plus "addresses", "pid" and "process") for the
+    ports this machine listens on, read from the OS socket table instead of probed.
+    probe=True also reads banners from the TCP ports to fill service_version.
+    """
+    wanted = set(parse_port_range(port_range)) if port_range else None
+    entries = {}
+    for proto, ip, port, pid in listening_sockets():
+        if wanted is not None and port not in wanted:
+            continue
+        entry = entries.get((proto, port))
+        if entry is None:
+            entry = entries[(proto, port)] = {
+                "port": port,
+                "protocol": proto,
+                "state": "open",
+                "service": default_service_name(port, proto),
+                "service_version": None,
+                "addresses": [],
+                "pid": pid,
+                "process": _process_name(pid),
+            }
+        if ip not in entry["addresses"]:
+            entry["addresses"].append(ip)
+        if entry["pid"] is None and pid:
+            entry["pid"], entry["process"] = pid, _process_name(pid)
+    results = [entries[k] for k in sorted(entries, key=lambda k: (k[1], k[0]))]
+
+    if probe:
+        tcp = [r for r in results if r["protocol"] == "tcp"]
+
+        async def probe_all():
+            async def one(r):
+                return identify_service(r["port"], await grab_banner(_probe_address(r["addresses"]), r["port"]))
+            return await asyncio.gather(*(one(r) for r in tcp))
+
+        for r, (service, version) in zip(tcp, asyncio.run(probe_all())):
+            r["service"] = service or r["service"]
+            r["service_version"] = version
+    return results
+
+# ---------- nmap ----------
+def _nmap_results(target, port_range):
+    from nmap import PortScanner  # optional: only needed for -sV
+
     nm = PortScanner()
     nm.scan(target, port_range, arguments="-sV")
     results = []
-
     for host in nm.all_hosts():
         for proto in nm[host].all_protocols():
             ports = nm[host][proto].keys()
@@ -23,4 +425,63 @@ def scan_ports(target="127.0.0.1", port_range="1-65535"):
                         filter(None, [port_info.get("product"), port_info.get("version")])
                     ) or None
                 })
+    return results
+
+def _enrich_with_nmap(target, results):
+    """Overwrite service/version with `nmap -sV` findings for the ports already known to be open."""
+    if not results:
+        return results
+    try:
+        found = {(r["port"], r["protocol"]): r for r in _nmap_results(target, ",".join(str(r["port"]) for r in results))}
+    except Exception as e:
+        print(f"[!] nmap service detection skipped: {e}")
+        return results
+    for r in results:
+        extra = found.get((r["port"], r["protocol"]))
+        if extra:
+            r["service"] = extra["service"] or r["service"]
+            r["service_version"] = extra["service_version"] or r["service_version"]
+    return results
+
+def scan_ports(target="127.0.0.1", port_range="1-65535", engine="native", nmap_sv=False,
+               concurrency=DEFAULT_CONCURRENCY, timeout=CONNECT_TIMEOUT, banners=None):
+    """
+    Scan ports and return list of open ports with service info as JSON.
+    engine="native": asyncio connect scan + banner probes (no nmap needed);
+    nmap_sv=True additionally runs `nmap -sV` on the open ports only.
+    engine="nmap": the whole range through `nmap -sV`.
+    engine="local": no packets at all - the ports this machine listens on (TCP and UDP,
+    any interface) from the OS socket table, with owning pid/process; `target` is
+    ignored. banners defaults to on for the scanning engines and off for "local",
+    which stays passive unless banners=True asks it to probe the TCP listeners.
+    """
+    if banners is None:
+        banners = engine != "local"
+    if engine == "local":
+        return json.dumps(local_inventory(port_range, probe=banners), indent=2)
+    if engine == "nmap":
+        return json.dumps(_nmap_results(target, port_range), indent=2)
+    results = asyncio.run(native_scan(target, parse_port_range(port_range), concurrency=concurrency,
+                                      timeout=timeout, banners=banners))
+    if nmap_sv:
+        results = _enrich_with_nmap(target, results)
     return json.dumps(results, indent=2)
+
+def scan_many(hosts, port_range="1-1024", host_concurrency=DEFAULT_HOST_CONCURRENCY, socket_budget=DEFAULT_SOCKET_BUDGET,
+              timeout=CONNECT_TIMEOUT, banners=True, nmap_sv=False, on_host=None):
+    """
+    Native scan of `port_range` on every host in `hosts`, several hosts at a time
+    under one shared socket budget (see scan_hosts()).
+    on_host(host, ports_json) is called as each host finishes, with the same JSON
+    string scan_ports() returns. Returns {host: ports_json}.
+    """
+    def finished(host, results):
+        out[host] = json.dumps(results, indent=2)
+        if on_host is not None:
+            on_host(host, out[host])
+
+    out = {}
+    asyncio.run(scan_hosts([str(h) for h in hosts], parse_port_range(port_range), host_concurrency=host_concurrency,
+                           socket_budget=socket_budget, timeout=timeout, banners=banners,
+                           enrich=_enrich_with_nmap if nmap_sv else None, on_host=finished))
+    return out
@@ -16,10 +16,13 @@ load_dotenv()
 
 def run_scans():
     # --- 1. Port Scan ---
+    # local ports come straight from the OS socket table (all ports, every interface, owning process);
+    # connecting to the TCP listeners for banners is opt-in (PORT_BANNERS=1)
     target_ip = "127.0.0.1"
-    port_range = "1-1024"
-    print("\n[*] Scanning localhost ports...\n")
-    port_results = scan_ports(target_ip, port_range)
+    port_range = "1-65535"
+    banners = os.getenv("PORT_BANNERS", "").strip().lower() in ("1", "true", "yes")
+    print("\n[*] Reading local listening ports...\n")
+    port_results = scan_ports(target_ip, port_range, engine="local", banners=banners)
     print("[*] Port Scan Results:\n", json.dumps(port_results, indent=2))
     send_scan_results(port_results, endpoint_path="ports")
 
@@ -6,10 +6,10 @@ block_cipher = None
 
 a = Analysis(
     ['main_gui.py'],
-    pathex=[],
+    pathex=['../backend/scanner'],  # icmp_engine.py is shared with the backend scanner
     binaries=[],
     datas=[('functions', 'functions')],
-    hiddenimports=[],
+    hiddenimports=['icmp_engine'],
     hookspath=[],
     runtime_hooks=[],
     excludes=[],
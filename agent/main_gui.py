@@ -53,7 +53,10 @@ def run_agent_jobs(cfg, progress_queue: queue.Queue):
             progress_queue.put(("status", "Running port scan..."))
             target_ip = cfg.get("port_target", "127.0.0.1")
             port_range = cfg.get("port_range", "1-1024")
-            ports = scan_ports(target_ip, port_range)
+            # this machine: read the socket table instead of probing it
+            engine = cfg.get("port_engine") or ("local" if target_ip in ("127.0.0.1", "localhost", "::1") else "native")
+            # banner probes: on for scans of other hosts, opt-in ("port_banners") for the local inventory
+            ports = scan_ports(target_ip, port_range, engine=engine, banners=cfg.get("port_banners"))
             progress_queue.put(("log", f"Port results: {len(ports)} entries"))
             send_scan_results(ports, endpoint_path="ports")
             progress_queue.put(("status", "Port scan complete."))
@@ -1,103 +1,279 @@
 // backend/api/scanRun.js
 import express from "express";
+import net from "net";
 import { spawn } from "child_process";
 import ScanResult from "../models/ScanResult.js";
 import path from "path";
 
 const router = express.Router();
 
-// POST /api/scan
-router.post("/", async (req, res) => {
-  console.log("[*] Starting network scan (manual trigger)...");
+// Resident scanner (scanner/scanner_daemon.py); when nothing listens here we spawn scan_to_json.py
+const SCANNER_SOCKET = process.env.SCANNER_SOCKET || "/tmp/nvt-scanner.sock";
 
-  // Path to your scanner script (relative to backend root)
-  const scannerScript = path.join(process.cwd(), "scanner", "scan_to_json.py");
+// Safety: timeout in case python hangs (optional)
+const TIMEOUT_MS = 120_000; // 2 minutes
+// The scanner plans against this budget and returns what it has (marked partial) before the kill above
+const SCAN_DEADLINE_S = Number(process.env.SCAN_DEADLINE_S || (TIMEOUT_MS - 10_000) / 1000);
 
-  // Spawn python process
-  const py = spawn("python", [scannerScript, "--auto", "--json"], {
-    cwd: process.cwd(),
-    shell: false,
-    windowsHide: true,
-    // you can set env if needed: env: process.env
-  });
+const saveScan = async (results) => {
+  // Save scan result to MongoDB (if your ScanResult model expects network/devices)
+  try {
+    const scanDoc = new ScanResult({
+      network: results.network ?? null,
+      devices: results.devices ?? [],
+      createdAt: new Date(),
+    });
 
-  let stdout = "";
-  let stderr = "";
-  let timedOut = false;
+    await scanDoc.save();
+  } catch (saveErr) {
+    // don't fail the response if saving fails — log and continue
+    console.error("Failed to save scan result to DB:", saveErr);
+  }
+};
 
-  // Safety: timeout in case python hangs (optional)
-  const TIMEOUT_MS = 120_000; // 2 minutes
-  const timeout = setTimeout(() => {
-    timedOut = true;
-    py.kill("SIGKILL");
-  }, TIMEOUT_MS);
+// Scans in flight, keyed by their options: concurrent requests attach to the same promise
+const inflight = new Map();
+// Last completed scan per key ({ at, body }), served to requests that accept a result up to maxAge old
+const lastScan = new Map();
+// Default freshness bound in seconds (0 = always scan); a request may pass maxAge itself
+const DEFAULT_MAX_AGE_S = Number(process.env.SCAN_MAX_AGE_S || 0);
 
-  py.stdout.on("data", (chunk) => {
-    stdout += chunk.toString();
-  });
+// Run the scan through the daemon's JSON-RPC socket (one JSON object per line).
+// Resolves null when no daemon is reachable, otherwise { timedOut } or a summary-shaped { ok, results }.
+const scanViaDaemon = (onDevice, maxAge) =>
+  new Promise((resolve) => {
+    if (process.platform === "win32") return resolve(null);
 
-  py.stderr.on("data", (chunk) => {
-    stderr += chunk.toString();
-    // still log python stderr for debugging
-    console.error("Scanner stderr:", chunk.toString());
-  });
+    const sock = net.createConnection(SCANNER_SOCKET);
+    let buffer = "";
+    let connected = false;
+    let settled = false;
 
-  py.on("error", (err) => {
-    clearTimeout(timeout);
-    console.error("Failed to start scanner process:", err);
-    return res.status(500).json({ ok: false, error: err.message });
-  });
+    const finish = (value) => {
+      if (settled) return;
+      settled = true;
+      clearTimeout(timer);
+      sock.destroy();
+      resolve(value);
+    };
+    // the daemon keeps scanning (other callers may share the scan); we just stop waiting
+    const timer = setTimeout(() => finish({ timedOut: true }), TIMEOUT_MS);
 
-  py.on("close", async (code) => {
-    clearTimeout(timeout);
+    sock.on("connect", () => {
+      connected = true;
+      const params = { stream: true, deadline: SCAN_DEADLINE_S, ...(maxAge > 0 ? { max_age: maxAge } : {}) };
+      sock.write(JSON.stringify({ jsonrpc: "2.0", id: 1, method: "scan", params }) + "\n");
+    });
 
-    if (timedOut) {
-      console.error("Scanner timed out.");
-      return res.status(500).json({ ok: false, error: "Scanner timed out" });
-    }
+    sock.on("data", (chunk) => {
+      buffer += chunk.toString();
+      let newline;
+      while ((newline = buffer.indexOf("\n")) !== -1) {
+        const line = buffer.slice(0, newline).trim();
+        buffer = buffer.slice(newline + 1);
+        if (!line) continue;
+        let msg;
+        try {
+          msg = JSON.parse(line);
+        } catch {
+          console.error("Scanner daemon sent non-JSON line:", line);
+          continue;
+        }
+        const event = msg.params || {};
+        if (msg.method === "scan.event" && event.type === "device") {
+          onDevice(event.device, event);
+        } else if (msg.method === "scan.event" && event.type === "phase") {
+          console.log(`[*] Scan phase ${event.phase}: ${event.status}`);
+        } else if (msg.id === 1) {
+          if (msg.error) {
+            finish({ ok: false, results: { error: msg.error.message, ...(msg.error.data || {}) } });
+          } else {
+            const { scan_id: _scanId, cached, ...results } = msg.result;
+            finish({ ok: true, cached, results });
+          }
+        }
+      }
+    });
 
-    if (code !== 0) {
-      console.error(`Scanner exited with code ${code}`, stderr || stdout);
-      return res.status(500).json({ ok: false, error: stderr || "Scan failed" });
-    }
+    sock.on("error", (err) => finish(connected ? { ok: false, results: { error: err.message } } : null));
+    sock.on("close", () => finish(connected ? { ok: false, results: { error: "Scanner daemon closed the connection" } } : null));
+  });
 
-    // Attempt to extract JSON array/object from stdout even if extra logging is present
-    const startIdx = stdout.indexOf("{") !== -1 ? stdout.indexOf("{") : stdout.indexOf("[");
-    const endIdx = stdout.lastIndexOf("}") !== -1 ? stdout.lastIndexOf("}") : stdout.lastIndexOf("]");
-    let jsonText = stdout;
-    if (startIdx !== -1 && endIdx !== -1 && endIdx >= startIdx) {
-      jsonText = stdout.slice(startIdx, endIdx + 1);
-    }
+// Spawn scan_to_json.py (NDJSON: one line per device / phase, then a summary line).
+// Resolves { status, body } in the shape the route responds with.
+const scanViaProcess = (maxAge) =>
+  new Promise((resolve) => {
+    // Path to your scanner script (relative to backend root)
+    const scannerScript = path.join(process.cwd(), "scanner", "scan_to_json.py");
+    const args = [scannerScript, "--auto", "--stream", "--deadline", String(SCAN_DEADLINE_S)];
+    if (maxAge > 0) args.push("--max-age", String(maxAge));
+
+    const py = spawn("python", args, {
+      cwd: process.cwd(),
+      shell: false,
+      windowsHide: true,
+      // you can set env if needed: env: process.env
+    });
 
-    try {
-      const parsed = JSON.parse(jsonText);
+    let stdout = "";
+    let stderr = "";
+    let timedOut = false;
+    let network = null;
+    let summary = null;
+    const streamed = []; // devices received so far, kept if the scan times out
 
-      // Save scan result to MongoDB (if your ScanResult model expects network/devices)
+    const timeout = setTimeout(() => {
+      timedOut = true;
+      py.kill("SIGKILL");
+    }, TIMEOUT_MS);
+
+    const handleLine = (line) => {
+      let record;
       try {
-        const scanDoc = new ScanResult({
-          network: parsed.results?.network ?? null,
-          devices: parsed.results?.devices ?? parsed.devices ?? [],
-          createdAt: new Date(),
-        });
+        record = JSON.parse(line);
+      } catch {
+        console.error("Scanner emitted non-JSON line:", line);
+        return;
+      }
+      if (record.type === "device") {
+        streamed.push(record.device);
+      } else if (record.type === "phase") {
+        console.log(`[*] Scan phase ${record.phase}: ${record.status}`);
+      } else if (record.type === "summary") {
+        summary = record;
+        network = record.results?.network ?? network;
+      } else if (record.ok === false) {
+        // startup failure (e.g. scanner import error) is printed as a plain object
+        summary = record;
+      }
+    };
 
-        await scanDoc.save();
-      } catch (saveErr) {
-        // don't fail the response if saving fails — log and continue
-        console.error("Failed to save scan result to DB:", saveErr);
+    py.stdout.on("data", (chunk) => {
+      stdout += chunk.toString();
+      let newline;
+      while ((newline = stdout.indexOf("\n")) !== -1) {
+        const line = stdout.slice(0, newline).trim();
+        stdout = stdout.slice(newline + 1);
+        if (line) handleLine(line);
       }
+    });
+
+    py.stderr.on("data", (chunk) => {
+      stderr += chunk.toString();
+      // still log python stderr for debugging
+      console.error("Scanner stderr:", chunk.toString());
+    });
+
+    py.on("error", (err) => {
+      clearTimeout(timeout);
+      console.error("Failed to start scanner process:", err);
+      resolve({ status: 500, body: { ok: false, error: err.message } });
+    });
 
-      // Return parsed results to frontend
-      return res.json({ ok: true, results: parsed.results ?? parsed });
-    } catch (err) {
-      console.error("Parse error:", err, "raw stdout:", stdout);
-      return res.status(500).json({
-        ok: false,
-        error: "Failed to parse scanner output",
-        raw: stdout,
-        stderr,
+    py.on("close", async (code) => {
+      clearTimeout(timeout);
+      if (stdout.trim()) handleLine(stdout.trim());
+
+      if (timedOut) {
+        console.error("Scanner timed out.");
+        if (!streamed.length) {
+          return resolve({ status: 500, body: { ok: false, error: "Scanner timed out" } });
+        }
+        // keep whatever was discovered before the kill
+        const partial = { network, devices: streamed, partial: true };
+        await saveScan(partial);
+        return resolve({ status: 200, body: { ok: true, partial: true, results: partial } });
+      }
+
+      if (code !== 0 || !summary || summary.ok === false) {
+        console.error(`Scanner exited with code ${code}`, stderr || stdout);
+        return resolve({
+          status: 500,
+          body: { ok: false, error: summary?.results?.error || stderr || "Scan failed", stderr },
+        });
+      }
+
+      // a result the scanner served from its cache (or joined) was saved when it was first scanned
+      if (!summary.cached) await saveScan(summary.results ?? {});
+      resolve({
+        status: 200,
+        body: {
+          ok: true,
+          results: summary.results,
+          ...(summary.results?.partial ? { partial: true } : {}),
+          ...(summary.cached ? { cached: summary.cached } : {}),
+        },
       });
-    }
+    });
   });
+
+const runScan = async (maxAge) => {
+  const daemonStreamed = [];
+  let daemonNetwork = null;
+  const viaDaemon = await scanViaDaemon((device, event) => {
+    daemonStreamed.push(device);
+    daemonNetwork = event.network ?? daemonNetwork;
+  }, maxAge);
+
+  if (!viaDaemon) return scanViaProcess(maxAge);
+
+  if (viaDaemon.timedOut) {
+    console.error("Scanner daemon timed out.");
+    if (!daemonStreamed.length) {
+      return { status: 500, body: { ok: false, error: "Scanner timed out" } };
+    }
+    const partial = { network: daemonNetwork, devices: daemonStreamed, partial: true };
+    await saveScan(partial);
+    return { status: 200, body: { ok: true, partial: true, results: partial } };
+  }
+  if (!viaDaemon.ok) {
+    console.error("Scanner daemon scan failed:", viaDaemon.results?.error);
+    return { status: 500, body: { ok: false, error: viaDaemon.results?.error || "Scan failed" } };
+  }
+  if (!viaDaemon.cached) await saveScan(viaDaemon.results);
+  return {
+    status: 200,
+    body: {
+      ok: true,
+      results: viaDaemon.results,
+      ...(viaDaemon.results.partial ? { partial: true } : {}),
+      ...(viaDaemon.cached ? { cached: viaDaemon.cached } : {}),
+    },
+  };
+};
+
+// POST /api/scan   (optional body/query: maxAge = seconds a previous result may be old)
+router.post("/", async (req, res) => {
+  const requested = Number(req.body?.maxAge ?? req.query.maxAge);
+  const maxAge = Number.isFinite(requested) && requested >= 0 ? requested : DEFAULT_MAX_AGE_S;
+  const key = "auto"; // the only target this route scans today; options that change the scan belong in the key
+
+  const last = lastScan.get(key);
+  if (maxAge > 0 && last && Date.now() - last.at <= maxAge * 1000) {
+    const age = (Date.now() - last.at) / 1000;
+    return res.json({ ...last.body, cached: { source: "cache", age } });
+  }
+
+  if (inflight.has(key)) {
+    console.log("[*] Scan already running; attaching to it.");
+  } else {
+    console.log("[*] Starting network scan (manual trigger)...");
+    inflight.set(
+      key,
+      runScan(maxAge)
+        .then((outcome) => {
+          if (outcome.status === 200 && !outcome.body.partial && !outcome.body.cached) {
+            lastScan.set(key, { at: Date.now(), body: outcome.body });
+          }
+          return outcome;
+        })
+        .catch((err) => ({ status: 500, body: { ok: false, error: err.message } }))
+        .finally(() => inflight.delete(key))
+    );
+  }
+
+  const { status, body } = await inflight.get(key);
+  return res.status(status).json(body);
 });
 
 export default router;
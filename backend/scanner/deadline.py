@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+deadline.py
+
+Time budget for one scan, and a record of what the scan got through in that time.
+
+A scan given --deadline N has to return within N seconds; callers such as
+api/scanRun.js kill the process soon afterwards. Instead of racing that kill,
+the scanner plans against a Deadline:
+  - phases run in order of expected value per second (plan()), cheapest insight first,
+  - no new probe (ARP window, ICMP batch, TCP check) starts unless the time it
+    needs is still left,
+  - a reserve at the end is kept for merging and writing the result,
+and it reports what it covered in a Coverage per phase, so a cut-short result
+says exactly which address ranges were fully probed.
+
+Usage:
+  from deadline import Deadline, Coverage, plan
+  deadline = Deadline(60)            # None = no limit
+  deadline.allows(0.5)               # True while at least 0.5 s (plus the reserve) is left
+  deadline.share(3, later=5)         # sub-deadline for a 3 s step that has 5 s of work after it
+  for phase in plan([Phase("arp", cost=3, value=254, run=...), ...], deadline): ...
+  coverage = Coverage(); coverage.add("192.168.1.7"); coverage.ranges()   # ["192.168.1.7"]
+"""
+
+import bisect
+import ipaddress
+import math
+import threading
+import time
+
+DEFAULT_RESERVE = 1.0  # seconds kept back for merge + output (capped at a fifth of the budget)
+
+class Deadline:
+    """Monotonic-clock budget; `seconds=None` never runs out."""
+
+    def __init__(self, seconds=None, reserve=DEFAULT_RESERVE):
+        self.seconds = seconds
+        self.started = time.monotonic()
+        self.reserve = 0.0 if seconds is None else min(reserve, max(0.0, seconds) / 5)
+        self.at = None if seconds is None else self.started + max(0.0, seconds) - self.reserve
+        self._lock = threading.Lock()
+
+    @classmethod
+    def of(cls, value):
+        """A Deadline from a number of seconds, None, or an existing Deadline (returned as is)."""
+        return value if isinstance(value, Deadline) else cls(value)
+
+    @property
+    def limited(self):
+        return self.at is not None
+
+    def remaining(self):
+        at = self.at
+        return math.inf if at is None else max(0.0, at - time.monotonic())
+
+    def allows(self, cost):
+        """True if something expected to take `cost` seconds can still finish in time."""
+        return self.remaining() >= cost
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def share(self, cost, later=0.0):
+        """
+        Deadline for one step expected to take `cost` seconds, followed by steps expected
+        to take `later`: it gets whatever the later steps do not need, and at least its
+        own estimate (steps are planned best value first, so the earlier one wins when
+        both do not fit). Never ends after self.
+        """
+        if not self.limited:
+            return self
+        budget = max(cost, self.remaining() - later)
+        child = Deadline(None)
+        child.seconds = self.seconds
+        child.started = self.started
+        child.at = min(self.at, time.monotonic() + max(0.0, budget))
+        return child
+
+    def tighten(self, seconds):
+        """Also end `seconds` from now (keeping the reserve), if that is sooner."""
+        at = time.monotonic() + max(0.0, seconds) - min(DEFAULT_RESERVE, max(0.0, seconds) / 5)
+        with self._lock:
+            if self.at is None or at < self.at:
+                self.at = at
+
+class Phase:
+    """One scan phase for plan(): expected `cost` in seconds, expected `value` (e.g. hosts learned)."""
+    __slots__ = ("name", "cost", "value", "run")
+
+    def __init__(self, name, cost, value, run):
+        self.name = name
+        self.cost = cost
+        self.value = value
+        self.run = run
+
+    @property
+    def density(self):
+        return self.value / max(self.cost, 1e-3)
+
+def plan(phases, deadline=None):
+    """
+    Phases ordered by value per second, highest first (stable for ties). Without a
+    limited deadline the given order is kept: every phase runs to completion anyway.
+    """
+    phases = list(phases)
+    if deadline is None or not deadline.limited:
+        return phases
+    return sorted(phases, key=lambda p: -p.density)
+
+class Coverage:
+    """
+    Addresses whose probing finished, kept as merged [first, last] intervals.
+    Addresses complete slightly out of order, so memory is bounded by the number of
+    gaps (about the number of probes in flight), not by the size of the range.
+    `stopped` is set by whoever cut the phase short.
+    """
+
+    def __init__(self):
+        self._starts = {}  # first -> last
+        self._ends = {}    # last -> first
+        self._firsts = []  # sorted keys of _starts, to find the interval around an address
+        self.count = 0
+        self.stopped = False
+        self._lock = threading.Lock()
+
+    def add(self, ip):
+        """Mark one address done; an address that is already covered is not counted again."""
+        value = int(ipaddress.IPv4Address(ip))
+        with self._lock:
+            i = bisect.bisect_right(self._firsts, value) - 1
+            if i >= 0 and self._starts[self._firsts[i]] >= value:
+                return
+            first = self._ends.pop(value - 1, value)
+            last = self._starts.pop(value + 1, value)
+            if first != value:
+                del self._starts[first]
+            else:
+                bisect.insort(self._firsts, value)
+            if last != value:
+                del self._ends[last]
+                self._firsts.remove(value + 1)
+            self._starts[first] = last
+            self._ends[last] = first
+            self.count += 1
+
+    def update(self, ips):
+        for ip in ips:
+            self.add(ip)
+
+    def spans(self):
+        """[(first, last), ...] covered intervals as ints, in address order."""
+        with self._lock:
+            return sorted(self._starts.items())
+
+    def ranges(self):
+        """["a.b.c.d-e.f.g.h" or single "a.b.c.d", ...] in address order."""
+        out = []
+        for first, last in self.spans():
+            a = str(ipaddress.IPv4Address(first))
+            out.append(a if first == last else f"{a}-{ipaddress.IPv4Address(last)}")
+        return out
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+host_store.py
+
+Compact table of merged scan results (devices grouped by MAC).
+
+merge_and_dedupe() used to build an OrderedDict of {"mac": str, "ips": set()} dicts,
+and every consumer then looked the vendor and "mobile" flag up again per entry.
+HostStore keeps the same information in flat array columns instead:
+
+  rows     one per IP        ip (uint32), device (uint32)
+  devices  one per MAC       mac (uint64, NO_MAC for ping-only hosts),
+           (or ping-only IP) vendor (uint32 index into an interned name table),
+                             size (live rows)
+
+with dict indexes ip -> row and mac -> device. Vendor names are resolved once per
+device and interned; the mobile flag is derived once per distinct vendor name.
+Device records are only materialised (as __slots__ objects) when iterated.
+
+Usage:
+  from host_store import HostStore
+  store = HostStore(vendor_lookup=safe_vendor_lookup).merge(arp_map, ping_list)
+  store.device_for_ip("192.168.1.10")   # Device(mac=..., ips=[...], vendor=..., mobile=...)
+  store.to_json()                       # [{"mac", "ips", "vendor", "mobile", "ping_only"}, ...]
+"""
+
+import array
+import socket
+
+from vendor_index import mac_to_int
+
+NO_MAC = 1 << 48  # outside the 48-bit MAC space
+PING_ONLY_VENDOR = "Unknown (ping-only)"
+MOBILE_VENDOR_KEYWORDS = ("apple", "samsung", "xiaomi", "huawei", "oneplus", "pixel", "realme", "vivo")
+
+def ip_to_int(ip):
+    return ip if isinstance(ip, int) else int.from_bytes(socket.inet_aton(ip), "big")
+
+def _mac_int(mac):
+    if isinstance(mac, str) and len(mac) == 17 and mac[2] == ":":
+        try:
+            return int(mac.replace(":", ""), 16)  # already normalised: skip the regex in mac_to_int
+        except ValueError:
+            pass
+    return mac_to_int(mac)
+
+def int_to_ip(value):
+    return socket.inet_ntoa(value.to_bytes(4, "big"))
+
+def int_to_mac(value):
+    return value.to_bytes(6, "big").hex(":")
+
+def is_mobile_vendor(vendor):
+    vendor = vendor.lower()
+    return any(k in vendor for k in MOBILE_VENDOR_KEYWORDS)
+
+class Device:
+    """One merged device, built on demand from the store's columns."""
+    __slots__ = ("mac", "ips", "vendor", "mobile")
+
+    def __init__(self, mac, ips, vendor, mobile):
+        self.mac = mac
+        self.ips = ips
+        self.vendor = vendor
+        self.mobile = mobile
+
+    @property
+    def ping_only(self):
+        return self.mac is None
+
+    def to_json(self):
+        return {"mac": self.mac, "ips": self.ips, "vendor": self.vendor, "mobile": self.mobile, "ping_only": self.mac is None}
+
+    def __repr__(self):
+        return f"Device(mac={self.mac!r}, ips={self.ips!r}, vendor={self.vendor!r}, mobile={self.mobile!r})"
+
+class HostStore:
+    """
+    Array-backed replacement for the merge_and_dedupe() OrderedDict.
+    Devices keep their insertion order (ARP / MAC-bearing hosts first when built with merge()).
+    `vendor_lookup(mac)` names the vendor of each new MAC (default: "Unknown").
+    """
+
+    def __init__(self, vendor_lookup=None):
+        self.vendor_lookup = vendor_lookup or (lambda mac: "Unknown")
+        self._row_ip = array.array("I")
+        self._row_dev = array.array("I")
+        self._dev_mac = array.array("Q")
+        self._dev_vendor = array.array("I")
+        self._dev_size = array.array("I")
+        self._ip_row = {}
+        self._mac_dev = {}
+        self._vendors = [PING_ONLY_VENDOR]
+        self._vendor_ids = {PING_ONLY_VENDOR: 0}
+        self._vendor_mobile = bytearray(b"\x00")
+        self._live = 0
+
+    def __len__(self):
+        """Number of devices (not IPs)."""
+        return self._live
+
+    # ---------- Building ----------
+    def _vendor_id(self, name):
+        name = name or "Unknown"
+        vid = self._vendor_ids.get(name)
+        if vid is None:
+            vid = len(self._vendors)
+            self._vendors.append(name)
+            self._vendor_ids[name] = vid
+            self._vendor_mobile.append(is_mobile_vendor(name))
+        return vid
+
+    def _new_device(self, mac_int):
+        dev = len(self._dev_mac)
+        self._dev_mac.append(mac_int)
+        if mac_int == NO_MAC:
+            self._dev_vendor.append(0)
+        else:
+            try:
+                vendor = self.vendor_lookup(int_to_mac(mac_int))
+            except Exception:
+                vendor = "Unknown"
+            self._dev_vendor.append(self._vendor_id(vendor))
+            self._mac_dev[mac_int] = dev
+        self._dev_size.append(0)
+        return dev
+
+    def _place(self, ip_int, dev):
+        row = self._ip_row.get(ip_int)
+        if row is None:
+            self._ip_row[ip_int] = len(self._row_ip)
+            self._row_ip.append(ip_int)
+            self._row_dev.append(dev)
+        else:
+            old = self._row_dev[row]
+            if old == dev:
+                return
+            self._dev_size[old] -= 1
+            if self._dev_size[old] == 0:
+                self._live -= 1
+            self._row_dev[row] = dev
+        if self._dev_size[dev] == 0:
+            self._live += 1
+        self._dev_size[dev] += 1
+
+    def add(self, ip, mac=None):
+        """
+        Record one host. With a MAC the ip joins (or moves to) that MAC's device;
+        without one it becomes a ping-only device unless the ip is already known.
+        """
+        ip_int = ip_to_int(ip)
+        mac_int = _mac_int(mac) if mac else None
+        if mac_int is None:
+            if ip_int in self._ip_row:
+                return
+            dev = self._new_device(NO_MAC)
+        else:
+            dev = self._mac_dev.get(mac_int)
+            if dev is None:
+                dev = self._new_device(mac_int)
+        self._place(ip_int, dev)
+
+    def merge(self, arp_map=None, ping_list=()):
+        """Bulk add: arp_map (ip -> mac) first, then the ping-only ips. Returns self."""
+        for ip, mac in (arp_map or {}).items():
+            self.add(ip, mac)
+        for ip in ping_list:
+            self.add(ip)
+        return self
+
+    # ---------- Reading ----------
+    def _device(self, dev, ip_ints):
+        mac_int = self._dev_mac[dev]
+        vid = self._dev_vendor[dev]
+        return Device(None if mac_int == NO_MAC else int_to_mac(mac_int),
+                      [int_to_ip(v) for v in sorted(ip_ints)],
+                      self._vendors[vid], bool(self._vendor_mobile[vid]))
+
+    def _members(self):
+        members = {}
+        for ip_int, dev in zip(self._row_ip, self._row_dev):
+            members.setdefault(dev, []).append(ip_int)
+        return members
+
+    def _rows_of(self, dev):
+        return [ip_int for ip_int, d in zip(self._row_ip, self._row_dev) if d == dev]
+
+    def devices(self):
+        """Yield a Device per non-empty device, in insertion order."""
+        members = self._members()
+        for dev in sorted(members):
+            yield self._device(dev, members[dev])
+
+    def device_for_ip(self, ip):
+        row = self._ip_row.get(ip_to_int(ip))
+        if row is None:
+            return None
+        dev = self._row_dev[row]
+        return self._device(dev, self._rows_of(dev))
+
+    def device_for_mac(self, mac):
+        mac_int = _mac_int(mac)
+        dev = self._mac_dev.get(mac_int) if mac_int is not None else None
+        if dev is None or self._dev_size[dev] == 0:
+            return None
+        return self._device(dev, self._rows_of(dev))
+
+    def __contains__(self, ip):
+        return ip_to_int(ip) in self._ip_row
+
+    def to_json(self):
+        """JSON-ready device list ({"mac", "ips", "vendor", "mobile", "ping_only"}) straight from the columns."""
+        members = self._members()
+        vendors, mobile, dev_mac, dev_vendor = self._vendors, self._vendor_mobile, self._dev_mac, self._dev_vendor
+        out = []
+        for dev in sorted(members):
+            mac_int = dev_mac[dev]
+            vid = dev_vendor[dev]
+            ips = [int_to_ip(v) for v in sorted(members[dev])]
+            if mac_int == NO_MAC:
+                out.append({"mac": None, "ips": ips, "vendor": PING_ONLY_VENDOR, "mobile": False, "ping_only": True})
+            else:
+                out.append({"mac": int_to_mac(mac_int), "ips": ips, "vendor": vendors[vid],
+                            "mobile": bool(mobile[vid]), "ping_only": False})
+        return out
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+icmp_engine.py
+
+Batched ICMP echo sweeps from a single socket (no per-host `ping` processes).
+
+Socket selection:
+  1. raw ICMP socket (root / CAP_NET_RAW / Windows Administrator)
+  2. unprivileged SOCK_DGRAM ICMP socket (Linux with net.ipv4.ping_group_range, macOS)
+If neither can be opened, icmp_sweep() returns None and callers fall back to
+the subprocess `ping` path.
+
+Replies are matched by identifier/sequence and source address, so hundreds of
+echo requests can be in flight on one socket at once. Every request (retries
+included) gets its own sequence number, so a late reply is timed against the
+request it answers.
+
+This is the only copy: backend/visualizer-script and the agent
+(agent/functions/network_scan.py, bundled via the .spec files) import it from here.
+
+Usage:
+  from icmp_engine import icmp_sweep
+  alive = icmp_sweep(["192.168.1.1", "192.168.1.20"], timeout=0.5)   # {ip: rtt_seconds} or None
+"""
+
+import errno
+import itertools
+import os
+import platform
+import select
+import socket
+import struct
+import time
+
+ICMP_ECHO_REPLY = 0
+ICMP_ECHO_REQUEST = 8
+_PAYLOAD = b"nvt-icmp-sweep\x00\x00"  # 16 bytes, keeps packets small but non-empty
+_ENGINE_IDS = itertools.count()       # distinct identifiers for engines in one process
+
+# ---------- Packet helpers ----------
+def icmp_checksum(data):
+    """Internet checksum (RFC 1071) of a bytes object."""
+    if len(data) % 2:
+        data += b"\x00"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+def build_echo_request(ident, seq, payload=_PAYLOAD):
+    """Return an ICMP echo request packet (header + payload) with a valid checksum."""
+    header = struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, 0, ident & 0xFFFF, seq & 0xFFFF)
+    csum = icmp_checksum(header + payload)
+    header = struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, csum, ident & 0xFFFF, seq & 0xFFFF)
+    return header + payload
+
+def parse_echo_reply(data):
+    """
+    Parse a received datagram into (type, code, ident, seq).
+    Raw sockets (and macOS DGRAM sockets) deliver the IPv4 header first; Linux DGRAM
+    sockets deliver the bare ICMP message. An ICMP reply never starts with 0x4_,
+    so the version nibble tells the two apart.
+    Returns None if the datagram is too short.
+    """
+    if len(data) >= 20 and (data[0] >> 4) == 4:
+        data = data[(data[0] & 0x0F) * 4:]
+    if len(data) < 8:
+        return None
+    icmp_type, code, _csum, ident, seq = struct.unpack("!BBHHH", data[:8])
+    return icmp_type, code, ident, seq
+
+# ---------- Socket selection ----------
+def open_icmp_socket(source_ip=None):
+    """
+    Open the best available ICMP socket.
+    Returns (sock, kind) where kind is "raw" or "dgram", or (None, None) if no
+    ICMP socket is permitted for this process.
+    """
+    for kind, sock_type in (("raw", socket.SOCK_RAW), ("dgram", socket.SOCK_DGRAM)):
+        try:
+            s = socket.socket(socket.AF_INET, sock_type, socket.IPPROTO_ICMP)
+        except (PermissionError, OSError):
+            continue
+        try:
+            s.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+        except Exception:
+            pass
+        try:
+            # Windows raw sockets only receive once bound to a local address.
+            if source_ip or platform.system().lower() == "windows":
+                s.bind((source_ip or "", 0))
+        except Exception:
+            pass
+        s.setblocking(False)
+        return s, kind
+    return None, None
+
+def icmp_available():
+    """Return True if this process can open any ICMP socket."""
+    s, _kind = open_icmp_socket()
+    if s is None:
+        return False
+    s.close()
+    return True
+
+# ---------- Engine ----------
+class IcmpEngine:
+    """
+    Send echo requests to many targets from one socket and collect replies.
+
+    Every raw socket sees every echo reply, so each engine gets its own identifier
+    (PID plus a per-process counter) and ignores replies to other engines' sweeps,
+    e.g. concurrent scans of several networks or daemon jobs. For DGRAM sockets the
+    kernel rewrites it to the socket's local port and filters replies for us, so
+    only the sequence number and source address are checked.
+
+    If `rtt` is given (any object with update(seconds) and timeout(), e.g.
+    timing.RttEstimator) every reply feeds it and the post-send wait follows its
+    current timeout instead of the fixed one.
+
+    If `pacer` is given (rate_limit.RateScheduler or anything with take() and
+    congestion()) each echo request waits for a token, and kernel send-buffer
+    exhaustion is reported back to it.
+    """
+
+    def __init__(self, timeout=0.5, retries=1, send_interval=0.0, source_ip=None, rtt=None, pacer=None):
+        self.timeout = timeout
+        self.rtt = rtt
+        self.pacer = pacer
+        self.retries = max(0, int(retries))
+        self.send_interval = max(0.0, send_interval)
+        self.source_ip = source_ip
+        self.sock = None
+        self.kind = None
+        self.ident = (os.getpid() + next(_ENGINE_IDS)) & 0xFFFF
+        self._seq = 0
+
+    def open(self):
+        """Open the ICMP socket; returns False if none is available."""
+        if self.sock is None:
+            self.sock, self.kind = open_icmp_socket(self.source_ip)
+        return self.sock is not None
+
+    def close(self):
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except Exception:
+                pass
+        self.sock = None
+        self.kind = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def _next_seq(self):
+        self._seq = (self._seq + 1) & 0xFFFF
+        return self._seq
+
+    def _drain(self, sent, pending, alive, wait):
+        """
+        Read every queued reply (waiting up to `wait` seconds for the first one).
+        `sent` maps (ip, seq) -> send time of every request of the sweep, so a reply to
+        an earlier round still counts, timed against its own request.
+        """
+        try:
+            ready, _, _ = select.select([self.sock], [], [], max(0.0, wait))
+        except (OSError, ValueError):
+            return
+        if not ready:
+            return
+        while True:
+            try:
+                data, addr = self.sock.recvfrom(2048)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                return
+            now = time.monotonic()
+            parsed = parse_echo_reply(data)
+            if not parsed:
+                continue
+            icmp_type, _code, ident, seq = parsed
+            if icmp_type != ICMP_ECHO_REPLY:
+                continue
+            if self.kind == "raw" and ident != self.ident:
+                continue
+            src = addr[0]
+            sent_at = sent.pop((src, seq), None)
+            if sent_at is None or src in alive:
+                continue
+            alive[src] = now - sent_at
+            pending.discard(src)
+            if self.rtt is not None:
+                self.rtt.update(alive[src])
+
+    def _send(self, ip, seq):
+        """
+        Send one echo request; returns its send time (taken after any pacer wait, so
+        rate limiting is not counted as RTT), or None if the kernel did not take it.
+        """
+        packet = build_echo_request(self.ident, seq)
+        if self.pacer is not None:
+            self.pacer.take()
+        for _ in range(50):
+            try:
+                sent_at = time.monotonic()
+                self.sock.sendto(packet, (ip, 0))
+                return sent_at
+            except (BlockingIOError, InterruptedError):
+                self._congested()
+            except OSError as e:
+                if e.errno in (errno.ENOBUFS, errno.EAGAIN):
+                    self._congested()
+                    continue
+                # unreachable / no route / broadcast not permitted: treat as no answer
+                return None
+        return None
+
+    def _congested(self):
+        if self.pacer is not None:
+            self.pacer.congestion()
+        time.sleep(0.001)
+
+    def sweep(self, ips):
+        """
+        Ping every ip in `ips`. Returns {ip: rtt_seconds} for hosts that replied.
+        Raises RuntimeError if no ICMP socket could be opened.
+        """
+        if not self.open():
+            raise RuntimeError("no ICMP socket available (need raw socket privileges or ping_group_range)")
+        targets = list(dict.fromkeys(str(ip) for ip in ips))
+        alive = {}
+        sent = {}
+        todo = targets
+        for _round in range(self.retries + 1):
+            pending = set()
+            for ip in todo:
+                if ip in alive:
+                    continue
+                seq = self._next_seq()
+                sent_at = self._send(ip, seq)
+                if sent_at is None:
+                    continue
+                sent[(ip, seq)] = sent_at
+                pending.add(ip)
+                # pick up early replies so the receive buffer never overflows
+                self._drain(sent, pending, alive, self.send_interval)
+            last_send = time.monotonic()
+            while pending:
+                wait = self.rtt.timeout() if self.rtt is not None else self.timeout
+                remaining = last_send + wait - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._drain(sent, pending, alive, remaining)
+            todo = [ip for ip in targets if ip not in alive]
+            if not todo:
+                break
+        return alive
+
+def icmp_sweep(ips, timeout=0.5, retries=1, send_interval=0.0, source_ip=None, rtt=None, pacer=None):
+    """
+    Convenience wrapper: ping all `ips` from one socket (optionally adapting the
+    reply wait to an RTT estimator and pacing sends through a rate scheduler, see IcmpEngine).
+    Returns {ip: rtt_seconds} for responders, or None if no ICMP socket is available
+    (so the caller can fall back to subprocess pings).
+    """
+    engine = IcmpEngine(timeout=timeout, retries=retries, send_interval=send_interval, source_ip=source_ip, rtt=rtt, pacer=pacer)
+    if not engine.open():
+        return None
+    try:
+        return engine.sweep(ips)
+    except Exception:
+        return None
+    finally:
+        engine.close()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+lazy_import.py
+
+Deferred imports for the scanner entry points, plus a per-module import-cost log.
+
+Scanners are spawned as a fresh interpreter for every scan, so importing scapy,
+asyncio or mac_vendor_lookup up front is paid even by runs that never send an
+ARP frame or start an event loop. lazy_module() returns a stand-in that imports
+the real module on first attribute access; timed_import() imports right away.
+Both record how long each import took so `--import-profile` can print it.
+
+Usage:
+  from lazy_import import lazy_module, timed_import, print_import_profile
+  scapy = lazy_module("scapy.all", hint="pip install scapy")
+  scapy.srp(...)              # scapy.all is imported here, on first use
+  print_import_profile()      # module / phase / milliseconds table on stderr
+"""
+
+import importlib
+import os
+import sys
+import threading
+import time
+
+# (module name, "startup" | "lazy", seconds) in load order
+IMPORT_TIMES = []
+# first use may happen on several threads at once (e.g. one scan per interface);
+# only one of them may run the import, the others must not see a half-initialised module
+_LOAD_LOCK = threading.RLock()
+
+def timed_import(name, phase="startup"):
+    """Import `name` now and record the cost. Already-loaded modules cost nothing and are not logged."""
+    if name in sys.modules:
+        return sys.modules[name]
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    IMPORT_TIMES.append((name, phase, time.perf_counter() - start))
+    return module
+
+class LazyModule:
+    """Module proxy that imports `name` the first time one of its attributes is used."""
+
+    def __init__(self, name, hint=None):
+        self.__dict__["_name"] = name
+        self.__dict__["_hint"] = hint
+        self.__dict__["_module"] = None
+
+    def _load(self):
+        module = self.__dict__["_module"]
+        if module is None:
+            with _LOAD_LOCK:
+                module = self.__dict__["_module"]
+                if module is None:
+                    try:
+                        module = timed_import(self._name, phase="lazy")
+                    except Exception as e:
+                        hint = f" Install with: {self._hint}" if self._hint else ""
+                        raise ImportError(f"{self._name} required for this operation.{hint} ({e})") from e
+                    self.__dict__["_module"] = module
+        return module
+
+    def available(self):
+        """True if the module can be imported (imports it)."""
+        try:
+            self._load()
+            return True
+        except ImportError:
+            return False
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+def lazy_module(name, hint=None):
+    return LazyModule(name, hint=hint)
+
+def print_import_profile(out=None):
+    """Print the recorded imports (slowest first) to `out` (default: stderr, so JSON stdout stays clean)."""
+    out = out or sys.stderr
+    rows = sorted(IMPORT_TIMES, key=lambda r: r[2], reverse=True)
+    print("\n[*] Import profile (module / phase / ms):", file=out)
+    for name, phase, seconds in rows:
+        print("    {:<28} {:<8} {:>9.1f}".format(name, phase, seconds * 1000), file=out)
+    total = sum(r[2] for r in rows)
+    print("    {:<28} {:<8} {:>9.1f}".format("total", "", total * 1000), file=out)
+    try:
+        # wall time since the interpreter started (Linux), to put the import cost in context
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        elapsed = uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+        print("    {:<28} {:<8} {:>9.1f}".format("process wall time", "", elapsed * 1000), file=out)
+    except Exception:
+        pass
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+neighbors.py
+
+Read the operating system's IPv4 neighbour (ARP) cache.
+
+The kernel already knows the MAC of every host this machine talked to recently,
+including hosts an unprivileged ping sweep just reached. Reading that table
+costs no packets and needs no privileges, so scans use it to
+  - fill in MACs (and thereby vendors) for hosts that would otherwise be "ping-only",
+  - treat entries the kernel confirmed moments ago as likely alive and probe them first,
+  - skip ARP for hosts whose entry is still fresh.
+
+Sources, best first:
+  Linux    netlink RTM_GETNEIGH (carries the NUD state), then /proc/net/arp
+  others   `arp -an` (macOS/BSD) / `arp -a` (Windows)
+
+Usage:
+  from neighbors import read_neighbors
+  read_neighbors("192.168.1.0/24")   # {ip: {"mac": ..., "state": "reachable"|"stale"|..., "iface": ...}}
+  python neighbors.py 192.168.1.0/24
+"""
+
+import ipaddress
+import json
+import platform
+import re
+import socket
+import struct
+import subprocess
+import sys
+
+# NUD_* states from linux/neighbour.h
+NUD_STATES = {
+    0x01: "incomplete", 0x02: "reachable", 0x04: "stale", 0x08: "delay",
+    0x10: "probe", 0x20: "failed", 0x40: "noarp", 0x80: "permanent",
+}
+# states where the kernel saw the host within the last few seconds (or it is static)
+FRESH_STATES = ("reachable", "delay", "probe", "permanent")
+
+_RTM_NEWNEIGH = 28
+_RTM_GETNEIGH = 30
+_NLM_F_REQUEST = 0x1
+_NLM_F_DUMP = 0x300
+_NLMSG_DONE = 3
+_NLMSG_ERROR = 2
+_NDA_DST = 1
+_NDA_LLADDR = 2
+_NLMSG_HDR = struct.Struct("=IHHII")
+_NDMSG = struct.Struct("=BxxxiHBB")
+_RTATTR = struct.Struct("=HH")
+
+_MAC_RE = re.compile(r"([0-9a-fA-F]{1,2}[:-]){5}[0-9a-fA-F]{1,2}")
+_IP_RE = re.compile(r"\(?(\d{1,3}(?:\.\d{1,3}){3})\)?")
+
+def _norm_mac(mac):
+    parts = re.split(r"[:-]", mac)
+    mac = ":".join(p.zfill(2).lower() for p in parts)
+    if mac == "00:00:00:00:00:00" or int(mac[:2], 16) & 1:  # unset, broadcast or multicast
+        return None
+    return mac
+
+# ---------- Linux ----------
+def _read_netlink():
+    """Dump the IPv4 neighbour table over rtnetlink; None if netlink is unavailable."""
+    if not hasattr(socket, "AF_NETLINK"):
+        return None
+    try:
+        s = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE)
+    except OSError:
+        return None
+    table = {}
+    try:
+        s.settimeout(1.0)
+        body = _NDMSG.pack(socket.AF_INET, 0, 0, 0, 0)
+        s.send(_NLMSG_HDR.pack(_NLMSG_HDR.size + len(body), _RTM_GETNEIGH, _NLM_F_REQUEST | _NLM_F_DUMP, 1, 0) + body)
+        names = dict((idx, name) for idx, name in socket.if_nameindex())
+        while True:
+            data = s.recv(1 << 16)
+            offset = 0
+            while offset + _NLMSG_HDR.size <= len(data):
+                length, msg_type, _flags, _seq, _pid = _NLMSG_HDR.unpack_from(data, offset)
+                if length < _NLMSG_HDR.size:
+                    return table
+                if msg_type == _NLMSG_DONE:
+                    return table
+                if msg_type == _NLMSG_ERROR:
+                    return None
+                if msg_type == _RTM_NEWNEIGH:
+                    _parse_neigh(data[offset + _NLMSG_HDR.size:offset + length], names, table)
+                offset += (length + 3) & ~3
+    except OSError:
+        return table or None
+    finally:
+        s.close()
+
+def _parse_neigh(msg, names, table):
+    if len(msg) < _NDMSG.size:
+        return
+    family, ifindex, state, _flags, _type = _NDMSG.unpack_from(msg, 0)
+    if family != socket.AF_INET:
+        return
+    ip = mac = None
+    pos = _NDMSG.size
+    while pos + _RTATTR.size <= len(msg):
+        rta_len, rta_type = _RTATTR.unpack_from(msg, pos)
+        if rta_len < _RTATTR.size:
+            break
+        value = msg[pos + _RTATTR.size:pos + rta_len]
+        if rta_type == _NDA_DST and len(value) == 4:
+            ip = socket.inet_ntoa(value)
+        elif rta_type == _NDA_LLADDR and len(value) == 6:
+            mac = _norm_mac(value.hex(":"))
+        pos += (rta_len + 3) & ~3
+    if ip and mac:
+        table[ip] = {"mac": mac, "state": NUD_STATES.get(state, "unknown"), "iface": names.get(ifindex)}
+
+def _read_proc():
+    """Parse /proc/net/arp (complete entries only; no freshness information)."""
+    table = {}
+    try:
+        with open("/proc/net/arp") as f:
+            next(f, None)
+            for line in f:
+                fields = line.split()
+                if len(fields) < 6 or not int(fields[2], 16) & 0x2:  # ATF_COM
+                    continue
+                mac = _norm_mac(fields[3])
+                if mac:
+                    table[fields[0]] = {"mac": mac, "state": "unknown", "iface": fields[5]}
+    except (OSError, ValueError):
+        return None
+    return table
+
+# ---------- macOS / BSD / Windows ----------
+def _read_arp_command():
+    cmd = ["arp", "-a"] if platform.system().lower() == "windows" else ["arp", "-an"]
+    try:
+        out = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, timeout=3,
+                             text=True, errors="replace").stdout
+    except Exception:
+        return None
+    table = {}
+    for line in out.splitlines():
+        ip_match = _IP_RE.search(line)
+        mac_match = _MAC_RE.search(line)
+        if not ip_match or not mac_match:
+            continue
+        mac = _norm_mac(mac_match.group(0))
+        if mac:
+            state = "permanent" if ("permanent" in line or "static" in line) else "unknown"
+            table[ip_match.group(1)] = {"mac": mac, "state": state, "iface": None}
+    return table
+
+def read_neighbors(network_cidr=None):
+    """
+    {ip: {"mac", "state", "iface"}} from the OS neighbour cache, optionally limited
+    to `network_cidr`. Never raises; returns {} when no source is readable.
+    """
+    table = None
+    if platform.system().lower() == "linux":
+        table = _read_netlink()
+        if table is None:
+            table = _read_proc()
+    if table is None:
+        table = _read_arp_command() or {}
+    if network_cidr:
+        try:
+            net = ipaddress.IPv4Network(str(network_cidr), strict=False)
+            table = {ip: e for ip, e in table.items() if ipaddress.IPv4Address(ip) in net}
+        except ValueError:
+            pass
+    return table
+
+def fresh(table):
+    """Entries the kernel confirmed recently: likely alive right now."""
+    return {ip: e for ip, e in table.items() if e["state"] in FRESH_STATES}
+
+def macs_for(ips, table):
+    """ip -> mac for every ip in `ips` the neighbour table knows."""
+    return {ip: table[ip]["mac"] for ip in ips if ip in table}
+
+if __name__ == "__main__":
+    print(json.dumps(read_neighbors(sys.argv[1] if len(sys.argv) > 1 else None), indent=2))
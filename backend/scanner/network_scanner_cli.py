@@ -7,42 +7,95 @@ Usage:
   python network_scanner_cli.py --auto     # same as default (kept for backward compatibility)
   python network_scanner_cli.py --network 192.168.1.0/24
   python network_scanner_cli.py --update-vendors  # refresh mac-vendor DB first
+  python network_scanner_cli.py --update-vendors oui.csv mam.csv oui36.csv   # compile the OUI index from IEEE files
   python network_scanner_cli.py --no-arp   # ping-only
   python network_scanner_cli.py --list-ifaces
   python network_scanner_cli.py --iface <iface-name>
   python network_scanner_cli.py --json
+  python network_scanner_cli.py --icmp-backend subprocess   # fork `ping` per host (old behaviour)
+  python network_scanner_cli.py --timing fast               # adaptive timeouts: paranoid | normal | fast
+  python network_scanner_cli.py --max-rate 500 --burst 32   # pace every probe type to 500 packets/s
+  python network_scanner_cli.py --import-profile            # print per-module import cost on exit (stderr)
+  python network_scanner_cli.py --passive 30                # listen to ARP/DHCP/mDNS/SSDP/NetBIOS first, probe only the gaps
+  python network_scanner_cli.py --pcap capture.pcap --passive-only --network 192.168.1.0/24
+  python network_scanner_cli.py --no-history                 # do not order probes by (or record) past liveness
+  python network_scanner_cli.py --network 10.0.0.0/16 --shards 8   # ARP + discovery in 8 worker processes
+  python network_scanner_cli.py --targets-file scope.txt --exclude-file carve-outs.txt --order random
+
+Heavy modules (scapy, asyncio, concurrent.futures, mac_vendor_lookup) are imported
+only by the phase that needs them (see lazy_import.py), so --no-arp, --list-ifaces
+and error paths start without loading scapy.
 """
 
 import argparse
+import atexit
+import errno
 import ipaddress
+import itertools
 import platform
+import queue
 import re
+import selectors
 import socket
 import sys
 import os
+import threading
 import json
-from collections import OrderedDict
-from concurrent.futures import ThreadPoolExecutor, as_completed
 import time
 
-# network / iface detection
-try:
-    import netifaces
-except Exception:
-    sys.exit("netifaces required. Install with: pip install netifaces")
+# deferred / timed imports (stdlib only; lives next to this file)
+from lazy_import import lazy_module, print_import_profile
 
-# scapy (required for ARP)
-try:
-    from scapy.all import ARP, Ether, srp, conf, sr1, ICMP, get_if_list, UDP, IP, send, sr
-except Exception:
-    sys.exit("scapy required. Install with: pip install scapy")
+# network / iface detection (imported on first use, so importing the helpers does not need it;
+# main() still refuses to start without it)
+netifaces = lazy_module("netifaces", hint="pip install netifaces")
 
-# mac vendor lookup (optional)
+# scapy (required for ARP only; imported on first use)
+scapy = lazy_module("scapy.all", hint="pip install scapy")
+
+# only the asyncio discovery mode / the thread-pool sweep need these
+asyncio = lazy_module("asyncio")
+concurrent_futures = lazy_module("concurrent.futures")
+
+# batched ICMP engine (stdlib only; lives next to this file)
 try:
-    from mac_vendor_lookup import MacLookup
-    MACLOOKUP_AVAILABLE = True
+    from icmp_engine import icmp_sweep
+    ICMP_ENGINE_AVAILABLE = True
 except Exception:
-    MACLOOKUP_AVAILABLE = False
+    ICMP_ENGINE_AVAILABLE = False
+
+# multiplexed SSDP/mDNS prober (stdlib only; lives next to this file)
+from udp_multiplex import SSDP_MSEARCH, MDNS_QUERY, udp_sweep, udp_multicast_discover
+
+# adaptive probe timeouts (stdlib only; lives next to this file)
+from timing import TIMING_TEMPLATES, DEFAULT_TIMING, make_estimator
+
+# shared packet-rate scheduler (stdlib only; lives next to this file)
+from rate_limit import RateScheduler
+
+# passive discovery from broadcast traffic (scapy loaded lazily; lives next to this file)
+from passive import passive_listen
+
+# OS neighbour (ARP) cache reader (stdlib only; lives next to this file)
+from neighbors import read_neighbors, fresh, macs_for
+
+# memory-mapped OUI index (stdlib only; lives next to this file)
+from vendor_index import get_index, build_index, DEFAULT_INDEX_PATH
+
+# compact array-backed result table (stdlib only; lives next to this file)
+from host_store import HostStore
+
+# history / heuristic target ordering (stdlib only; lives next to this file)
+from priority import HostHistory, Prioritizer, DEFAULT_HISTORY_PATH
+
+# interval-set scan scopes / exclusions (stdlib only; lives next to this file)
+from target_set import TargetSet, hosts_of
+
+# multi-process sharded ARP + discovery (only imported with --shards; lives next to this file)
+shard = lazy_module("shard")
+
+# mac vendor lookup (optional; only imported when no OUI index has been built)
+mac_vendor_lookup = lazy_module("mac_vendor_lookup", hint="pip install mac-vendor-lookup")
 
 # ---------- Vendor lookup helpers ----------
 _mac_lookup = None
@@ -71,25 +124,134 @@ def normalize_mac(mac):
     return mac.lower()
 
 def safe_vendor_lookup(mac):
-    """Return vendor string or 'Unknown' and never raise. Uses an in-memory cache."""
+    """
+    Return vendor string or 'Unknown' and never raise. Uses an in-memory cache.
+    Prefers the mmap OUI index (vendor_index.py); mac_vendor_lookup is only loaded
+    when no index has been built.
+    """
     mac_n = normalize_mac(mac)
     if not mac_n:
         return "Unknown"
     if mac_n in _vendor_cache:
         return _vendor_cache[mac_n]
     vendor = "Unknown"
-    if MACLOOKUP_AVAILABLE:
+    index = get_index()
+    if index is not None:
+        try:
+            vendor = index.lookup(mac_n) or "Unknown"
+        except Exception:
+            vendor = "Unknown"
+    elif mac_vendor_lookup.available():
         global _mac_lookup
         try:
             if _mac_lookup is None:
-                _mac_lookup = MacLookup()
+                _mac_lookup = mac_vendor_lookup.MacLookup()
             vendor = _mac_lookup.lookup(mac_n)
         except Exception:
             vendor = "Unknown"
     _vendor_cache[mac_n] = vendor
     return vendor
 
+MACLOOKUP_CACHE = os.path.join(os.path.expanduser("~"), ".cache", "mac-vendors.txt")
+
+def update_vendor_db(sources=None):
+    """
+    Rebuild the OUI index. With registry files, compile those; otherwise refresh the
+    mac-vendor-lookup download and compile its cache file.
+    """
+    if not sources:
+        if not mac_vendor_lookup.available():
+            print("[!] mac-vendor-lookup not installed. Install with: pip install mac-vendor-lookup")
+            print("[!] Or pass IEEE registry files: --update-vendors oui.csv mam.csv oui36.csv")
+            return
+        print("[*] Updating mac vendor DB (this may take a moment)...")
+        try:
+            mac_vendor_lookup.MacLookup().update_vendors()
+            print("[+] Vendor DB updated.")
+        except Exception as e:
+            print("[!] update_vendors failed:", e)
+            return
+        if not os.path.exists(MACLOOKUP_CACHE):
+            return
+        sources = [MACLOOKUP_CACHE]
+    try:
+        count = build_index(sources)
+        print(f"[+] OUI index: {count} prefixes -> {DEFAULT_INDEX_PATH}")
+    except Exception as e:
+        print("[!] Building OUI index failed:", e)
+
 # ---------- Interface & network detection ----------
+IGNORED_NETWORKS = TargetSet([
+    "127.0.0.0/8",     # loopback
+    "169.254.0.0/16",  # link-local
+    "192.168.56.0/24", # VirtualBox host-only
+    "10.0.75.0/24",    # Windows NAT / older VirtualBox
+    "172.17.0.0/16",   # docker default bridge
+    "192.168.57.0/24", # some VM nets
+    "192.168.60.0/24", # example other vm nets
+])
+
+def _is_ignored_ip(ip):
+    return ip in IGNORED_NETWORKS
+
+def default_gateway():
+    """(gateway_ip, iface_name) of the IPv4 default route, or (None, None)."""
+    try:
+        gw_entry = netifaces.gateways().get(netifaces.AF_INET)
+        if isinstance(gw_entry, list) and gw_entry:
+            return gw_entry[0][0], gw_entry[0][1]
+        if isinstance(gw_entry, tuple) and len(gw_entry) >= 2:
+            return gw_entry[0], gw_entry[1]
+    except Exception:
+        pass
+    return None, None
+
+def _default_gateway_iface():
+    return default_gateway()[1]
+
+def _iface_networks():
+    """Yield (iface_name, ip, netmask, network_cidr) for every IPv4 address on every interface."""
+    for iface in netifaces.interfaces():
+        try:
+            addrs = netifaces.ifaddresses(iface)
+        except Exception:
+            continue
+        for entry in addrs.get(netifaces.AF_INET, []):
+            ip = entry.get("addr")
+            netmask = entry.get("netmask")
+            if not ip or not netmask:
+                continue
+            try:
+                network = ipaddress.IPv4Network(f"{ip}/{netmask}", strict=False)
+            except Exception:
+                continue
+            yield iface, ip, netmask, str(network)
+
+def enumerate_targets():
+    """
+    Every eligible (iface_name, ip, netmask, network_cidr) - the same rules as
+    auto_select_iface_and_network(), but all of them: one entry per network,
+    default-gateway interface first.
+    """
+    gw_iface = _default_gateway_iface()
+    targets = {}
+    for iface, ip, netmask, network in _iface_networks():
+        if _is_ignored_ip(ip) or network in targets:
+            continue
+        targets[network] = (iface, ip, netmask, network)
+    return sorted(targets.values(), key=lambda t: t[0] != gw_iface)
+
+def iface_for_network(network_cidr):
+    """(iface_name, ip, netmask) of the local address inside `network_cidr`, or (None, None, None)."""
+    try:
+        net = ipaddress.IPv4Network(network_cidr, strict=False)
+    except ValueError:
+        return None, None, None
+    for iface, ip, netmask, _network in _iface_networks():
+        if ipaddress.IPv4Address(ip) in net:
+            return iface, ip, netmask
+    return None, None, None
+
 def auto_select_iface_and_network():
     """
     Return (iface_name, ip, netmask, network_cidr) for the best LAN interface.
@@ -100,20 +262,9 @@ def auto_select_iface_and_network():
       4. Fall back to first valid candidate found.
     Returns (None, None, None, None) if no valid interface found.
     """
-    ignore_prefixes = (
-        "127.",        # loopback
-        "169.254.",    # link-local
-        "192.168.56.", # VirtualBox host-only
-        "10.0.75.",    # Windows NAT / older VirtualBox
-        "172.17.",     # docker default bridge
-        "192.168.57.", # some VM nets
-        "192.168.60.", # example other vm nets
-    )
     prefer_name_prefixes = ("wlan", "wifi", "eth", "en", "ethernet", "wi-fi", "wi_fi", "wl")
     candidates = []
-
-    def is_ignored_ip(ip):
-        return any(ip.startswith(p) for p in ignore_prefixes)
+    is_ignored_ip = _is_ignored_ip
 
     # 1) Try default gateway interface (best guess)
     try:
@@ -158,8 +309,6 @@ def auto_select_iface_and_network():
                 continue
             if is_ignored_ip(ip):
                 continue
-            if ip.startswith("127.") or ip.startswith("169.254."):
-                continue
             try:
                 network = ipaddress.IPv4Network(f"{ip}/{netmask}", strict=False)
             except Exception:
@@ -174,8 +323,8 @@ def auto_select_iface_and_network():
     return None, None, None, None
 
 def list_interfaces():
-    """Return a friendly list of interfaces available (netifaces + Scapy names)."""
-    scapy_ifaces = get_if_list()
+    """Return a friendly list of interfaces available (netifaces + Scapy names; no Scapy names if it is missing)."""
+    scapy_ifaces = scapy.get_if_list() if scapy.available() else []
     infos = []
     for iface in netifaces.interfaces():
         addrs = netifaces.ifaddresses(iface)
@@ -198,84 +347,236 @@ def _attempt_bind_iface(iface_name):
     """
     if not iface_name:
         return None
-    scapy_list = get_if_list()
+    scapy_list = scapy.get_if_list()
     for s in scapy_list:
         if s == iface_name:
             try:
-                conf.iface = s
+                scapy.conf.iface = s
                 return s
             except Exception:
                 pass
     for s in scapy_list:
         if iface_name.lower() in s.lower() or s.lower() in iface_name.lower():
             try:
-                conf.iface = s
+                scapy.conf.iface = s
                 return s
             except Exception:
                 pass
     try:
-        conf.iface = iface_name
+        scapy.conf.iface = iface_name
         return iface_name
     except Exception:
         return None
 
 # ---------- ARP scan ----------
-def arp_scan(network_cidr, iface=None, timeout=2):
-    """Perform ARP scan, return dict ip->mac (mac normalized)."""
+ARP_WINDOW = 256       # requests sent back-to-back before draining replies
+ARP_RETRIES = 2        # extra rounds for addresses that stayed silent
+ARP_WINDOW_WAIT = 0.02 # reply drain between windows (seconds)
+ARP_MIN_WAIT = 0.3     # shortest reply wait after a round (LAN replies take milliseconds)
+_ARP_PDST = slice(38, 42)  # target IP in an Ethernet II + ARP frame
+
+def arp_stream(network_cidr, iface=None, timeout=2, pacer=None, window=ARP_WINDOW, retries=ARP_RETRIES, exclude=None,
+               deadline=None, coverage=None, targets=None, scope=None):
+    """
+    Windowed ARP sweep that yields (ip, mac) as replies arrive.
+
+    Scapy builds one request frame (so source MAC/IP follow the route to the
+    subnet); each request is that frame with the target address patched in, sent
+    one window at a time from one reused L2 socket. Targets are a
+    target_set.TargetSet streamed window by window, and neither a packet list nor
+    an address list is materialized, so a /16 is fine. A background sniffer
+    collects replies meanwhile. Addresses that stayed silent get up to `retries`
+    further rounds. Each round waits timeout / (retries + 1), but at least
+    ARP_MIN_WAIT, after its last request, so the total reply wait stays close to the
+    old single-shot srp().
+    `pacer` (rate_limit.RateScheduler) gates every request; addresses in `exclude`
+    (e.g. already seen passively; a set or a TargetSet) are not asked and
+    only hosts inside `scope` (a TargetSet) are. `targets` (addresses or a TargetSet,
+    e.g. one shard of the network, see shard.py) replaces the hosts of network_cidr.
+    With a `deadline` (deadline.Deadline) no window or retry round starts unless the
+    shortest reply wait still fits, and waits shrink to what is left; `coverage` (deadline.Coverage) gets every address whose
+    first request was sent and waited out, and is marked stopped if the sweep was cut.
+    """
+    hosts = hosts_of(network_cidr) if targets is None else TargetSet.of(targets)
+    if scope is not None:
+        hosts &= scope
+    if isinstance(exclude, TargetSet):
+        hosts -= exclude
+        exclude = None
+    if not hosts:
+        return
+    skip = exclude or ()
+    replies = queue.Queue()
+    found = {}
+
+    def on_reply(pkt):
+        arp = pkt[scapy.ARP]
+        if arp.op == 2 and arp.psrc in hosts and arp.psrc not in skip:
+            replies.put((arp.psrc, normalize_mac(arp.hwsrc)))
+
+    def drain(wait):
+        deadline = time.monotonic() + wait
+        while True:
+            try:
+                ip, mac = replies.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                return
+            if ip not in found:
+                found[ip] = mac
+                yield ip, mac
+
+    started = threading.Event()
+    sniffer = scapy.AsyncSniffer(iface=iface, store=False, prn=on_reply,
+                                 lfilter=lambda p: scapy.ARP in p, started_callback=started.set)
+    sniffer.start()
+    started.wait(1.0)
+    sock = scapy.conf.L2socket(iface=iface) if iface else scapy.conf.L2socket()
+    frame = bytearray(bytes(scapy.Ether(dst="ff:ff:ff:ff:ff:ff") / scapy.ARP(pdst=hosts.at(0))))
+    round_wait = max(ARP_MIN_WAIT, timeout / (retries + 1))
+    total = len(hosts)
+    asked = total  # leading addresses of `hosts` the first round got through
+    try:
+        for _round in range(retries + 1):
+            # retry rounds walk the same leading addresses again, skipping the ones that answered
+            stream = iter(hosts) if _round == 0 else itertools.islice(iter(hosts), asked)
+            sent = 0
+            for chunk in _chunks(stream, window):
+                if deadline is not None and not deadline.allows(ARP_MIN_WAIT):
+                    break
+                for ip in chunk:
+                    if ip in found or ip in skip:
+                        continue
+                    if pacer is not None:
+                        pacer.take()
+                    frame[_ARP_PDST] = socket.inet_aton(ip)
+                    sock.send(bytes(frame))
+                sent += len(chunk)
+                yield from drain(ARP_WINDOW_WAIT)
+            if not sent:
+                if _round == 0 and coverage is not None:
+                    coverage.stopped = True
+                break
+            yield from drain(round_wait if deadline is None else max(ARP_MIN_WAIT, min(round_wait, deadline.remaining())))
+            if _round == 0:
+                asked = sent
+                if coverage is not None:
+                    # skipped addresses were never asked; covering them is the caller's call
+                    coverage.update(ip for ip in itertools.islice(iter(hosts), asked) if ip not in skip)
+                    coverage.stopped = asked < total
+            if all(ip in found or ip in skip for ip in itertools.islice(iter(hosts), asked)):
+                break
+    finally:
+        try:
+            sock.close()
+        except Exception:
+            pass
+        try:
+            sniffer.stop()
+        except Exception:
+            pass
+
+def arp_scan(network_cidr, iface=None, timeout=2, pacer=None, window=ARP_WINDOW, retries=ARP_RETRIES, on_reply=None, exclude=None,
+             deadline=None, coverage=None, scope=None):
+    """
+    Perform ARP scan, return dict ip->mac (mac normalized).
+    Runs arp_stream(); on_reply(ip, mac) is called for each host as it answers.
+    `deadline` / `coverage` / `scope` are passed through (see arp_stream()).
+    """
     print(f"[*] Attempting ARP scan on {network_cidr} (iface={iface}) ...")
-    packet = Ether(dst="ff:ff:ff:ff:ff:ff") / ARP(pdst=str(network_cidr))
-    kwargs = {"timeout": timeout, "verbose": False}
     actual_iface = None
     if iface:
         try:
             actual_iface = _attempt_bind_iface(iface)
-            if actual_iface:
-                kwargs["iface"] = actual_iface
         except Exception:
             pass
+    result = {}
     try:
-        answered = srp(packet, **kwargs)[0]
+        for ip, mac in arp_stream(network_cidr, iface=actual_iface, timeout=timeout, pacer=pacer,
+                                  window=window, retries=retries, exclude=exclude, deadline=deadline, coverage=coverage,
+                                  scope=scope):
+            result[ip] = mac
+            if on_reply is not None:
+                on_reply(ip, mac)
+    except ImportError:
+        raise
     except Exception as e:
-        raise RuntimeError(f"ARP srp error: {e}")
-    result = {}
-    for sent, received in answered:
-        ip = received.psrc
-        mac = normalize_mac(getattr(received, "hwsrc", None))
-        result[ip] = mac
+        raise RuntimeError(f"ARP scan error: {e}")
     return result
 
 # ---------- TCP connect fallback (no root required) ----------
-def tcp_connect_check(ip, ports=(80, 443, 8080, 8008, 554, 22, 5353), timeout=0.4):
+DEFAULT_TCP_PORTS = (80, 443, 8080, 8008, 554, 22, 5353)
+_CONNECT_PENDING = {errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY, 10035}  # 10035 = WSAEWOULDBLOCK
+_CONNECT_REFUSED = {errno.ECONNREFUSED, 10061}                                 # 10061 = WSAECONNREFUSED
+
+def tcp_probe(ip, ports=DEFAULT_TCP_PORTS, timeout=0.4, pacer=None, rtt=None):
     """
-    Try TCP connect to a list of common ports. Return True if any port connects.
-    Uses connect_ex with a short timeout; this works without raw sockets / root.
+    Start non-blocking connects to every port at once and wait (at most `timeout`)
+    for the first answer. A SYN-ACK ("open") or a RST ("closed") both prove the
+    host is up; the remaining sockets are closed as soon as one port answers.
+    The host's SYNs draw len(ports) tokens from `pacer` up front (so waiting for
+    tokens never inflates the measured RTT); the answer time
+    of the winning port is fed to `rtt` (timing.RttEstimator) if given.
+    Returns (port, "open"|"closed") or None if nothing answered.
     """
-    for port in ports:
-        try:
-            s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            s.settimeout(max(0.05, timeout))
-            ret = s.connect_ex((ip, port))
-            s.close()
-            if ret == 0:
-                return True
-        except Exception:
-            pass
-    return False
+    sel = selectors.DefaultSelector()
+    socks = []
+    if pacer is not None and ports:
+        pacer.take(len(ports))
+    try:
+        for port in ports:
+            try:
+                s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            except OSError:
+                break  # out of descriptors; probe what we have
+            socks.append(s)
+            s.setblocking(False)
+            sent_at = time.monotonic()
+            err = s.connect_ex((ip, port))
+            if err == 0:
+                return port, "open"
+            if err in _CONNECT_REFUSED:
+                return port, "closed"
+            if err in _CONNECT_PENDING:
+                sel.register(s, selectors.EVENT_WRITE, (port, sent_at))
+        deadline = time.monotonic() + max(0.05, timeout)
+        while sel.get_map():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            for key, _events in sel.select(remaining):
+                err = key.fileobj.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                sel.unregister(key.fileobj)
+                port, sent_at = key.data
+                if err == 0 or err in _CONNECT_REFUSED:
+                    if rtt is not None:
+                        rtt.update(time.monotonic() - sent_at)
+                    return port, "open" if err == 0 else "closed"
+        return None
+    except Exception:
+        return None
+    finally:
+        sel.close()
+        for s in socks:
+            try:
+                s.close()
+            except Exception:
+                pass
 
-# ---------- UDP probes (SSDP m-search & simple mDNS query) ----------
+def tcp_connect_check(ip, ports=DEFAULT_TCP_PORTS, timeout=0.4):
+    """
+    Return True if any of the TCP ports answers (SYN-ACK or RST) within one timeout.
+    Works without raw sockets / root. See tcp_probe() for the answering port.
+    """
+    return tcp_probe(ip, ports=ports, timeout=timeout) is not None
+
+# ---------- UDP probes (SSDP m-search & mDNS query) ----------
+# Single-host probes; sweeps use the shared-socket multiplexer in udp_multiplex.py.
 def udp_ssdp_probe(ip, timeout=0.6):
     """
     Send an SSDP M-SEARCH to the target IP:1900 and wait for UDP replies.
     Returns True if any response received.
     """
-    msg = "\r\n".join([
-        'M-SEARCH * HTTP/1.1',
-        'HOST:239.255.255.250:1900',
-        'MAN:"ssdp:discover"',
-        'MX:1',
-        'ST:ssdp:all',
-        '', ''
-    ]).encode('utf-8')
+    msg = SSDP_MSEARCH
     try:
         s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         s.settimeout(timeout)
@@ -294,13 +595,10 @@ def udp_ssdp_probe(ip, timeout=0.6):
 
 def udp_mdns_probe(ip, timeout=0.6):
     """
-    Send a very small UDP packet to 5353 asking for any response.
-    Some devices reply to mDNS queries or to a simple datagram.
-    This is a best-effort; not a fully formatted DNS-SD query.
+    Send a DNS-SD service enumeration query (unicast) to the target IP:5353.
+    Returns True if any response received.
     """
-    # A proper mDNS query would require building DNS query bytes.
-    # Many devices respond to an empty payload probe or to a simple query string.
-    probe_payload = b'\x00' * 12  # minimal payload; best-effort
+    probe_payload = MDNS_QUERY
     try:
         s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         s.settimeout(timeout)
@@ -331,121 +629,722 @@ def udp_probe(ip, timeout=0.6):
     return False
 
 # ---------- Ping (ICMP) ----------
-def ping_host(ip, timeout=1):
-    """Ping a single host; returns True if ping responds. Cross-platform wrapper."""
+def ping_command(ip, timeout=1):
+    """Return the platform `ping` argv for a single echo request to ip."""
     param = "-n" if platform.system().lower() == "windows" else "-c"
     if platform.system().lower() == "windows":
-        cmd = ["ping", param, "1", "-w", str(int(timeout*1000)), ip]
-    else:
-        # Use -W with int seconds on Linux; on macOS -W semantics differ but this is best-effort.
-        cmd = ["ping", param, "1", "-W", str(max(1, int(timeout))), ip]
+        return ["ping", param, "1", "-w", str(int(timeout*1000)), ip]
+    # Use -W with int seconds on Linux; on macOS -W semantics differ but this is best-effort.
+    return ["ping", param, "1", "-W", str(max(1, int(timeout))), ip]
+
+PING_SPAWN_GRACE = 0.25  # allowance for process start-up on top of the probe timeout
+
+def ping_host(ip, timeout=1):
+    """
+    Ping a single host; returns True if ping responds. Cross-platform wrapper.
+    `ping -W` only takes whole seconds on Linux, so the process is killed once
+    `timeout` (plus start-up grace) has elapsed rather than waiting a full second.
+    """
+    cmd = ping_command(ip, timeout)
     import subprocess
     try:
-        res = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        res = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                             timeout=timeout + PING_SPAWN_GRACE)
         return res.returncode == 0
     except Exception:
         return False
 
 # ---------- Enhanced host discovery (ICMP -> TCP -> UDP fallback) ----------
-def ping_sweep(network_cidr, max_workers=200, timeout=0.5, tcp_ports=None, udp_probe_enabled=True):
+ICMP_BACKENDS = ("auto", "socket", "subprocess")
+
+def icmp_batch(ips, timeout=0.5, backend="auto", rtt=None, pacer=None, retries=None):
+    """
+    Ping all ips from one ICMP socket (see icmp_engine.py). If `rtt` (timing.RttEstimator)
+    is given, replies train it and the reply wait follows its timeout; `retries`
+    overrides its retry count.
+    Returns {ip: rtt} for responders, or None when the subprocess `ping` fallback
+    should be used instead (backend="subprocess" or no ICMP socket available).
+    """
+    if backend == "subprocess" or not ICMP_ENGINE_AVAILABLE:
+        if backend == "socket":
+            print("[!] ICMP engine unavailable; falling back to subprocess ping.")
+        return None
+    if retries is None:
+        retries = rtt.retries if rtt is not None else 1
+    alive = icmp_sweep(ips, timeout=timeout, retries=retries, rtt=rtt, pacer=pacer)
+    if alive is None:
+        print("[!] No ICMP socket permitted; falling back to subprocess ping.")
+    return alive
+
+def udp_stage(ips, timeout=0.6, multicast=False, pacer=None, accept=None):
+    """
+    UDP discovery for every ip at once from shared sockets (see udp_multiplex.py).
+    multicast=True sends one M-SEARCH / one mDNS query to the multicast groups instead
+    of one packet per target. Returns {ip: "ssdp"|"mdns"} restricted to `ips`
+    (or, for multicast, to the addresses the `accept(ip)` predicate allows).
+    """
+    if multicast:
+        if accept is None:
+            targets = set(ips)
+            if not targets:
+                return {}
+            accept = targets.__contains__
+        return udp_multicast_discover(timeout=timeout, accept=accept, pacer=pacer)
+    if not ips:
+        return {}
+    return udp_sweep(ips, timeout=timeout, pacer=pacer)
+
+SWEEP_CHUNK = 1024  # addresses pulled from the target generator (and ICMP-swept) per batch
+
+def sweep_targets(network_cidr, exclude=None, first=None, start=None, scope=None, order="address", seed=None):
+    """
+    Lazily yield the host addresses of `network_cidr` as strings: the ones in `first`
+    that lie inside the network come first, addresses in `exclude` never. With a
+    `scope` (target_set.TargetSet) only hosts inside it are swept. The rest follow in
+    address order from `start` (wrapping around; default: the first host), or with
+    order="random" in a permutation fixed by `seed`.
+    Nothing proportional to the network size is materialised.
+    """
+    hosts = hosts_of(network_cidr)
+    if scope is not None:
+        hosts &= scope
+    if isinstance(exclude, TargetSet):
+        hosts -= exclude
+        exclude = ()
+    exclude = exclude or ()
+    head = [ip for ip in dict.fromkeys(first or ()) if ip in hosts and ip not in exclude]
+    yield from head
+    head = set(head)
+    for ip in (hosts.permutation(seed) if order == "random" else hosts.iter(start)):
+        if ip not in exclude and ip not in head:
+            yield ip
+
+def _chunks(iterable, size):
+    it = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+def _check_host(ip, rtt, tcp_ports, pacer=None, ping_first=False, budget=None):
+    """Subprocess ping (if `ping_first`) then TCP probe one host; returns its detail dict or None."""
+    if budget is not None:
+        with budget:
+            return _check_host(ip, rtt, tcp_ports, pacer=pacer, ping_first=ping_first)
+    if ping_first:
+        try:
+            if pacer is not None:
+                pacer.take()
+            if ping_host(ip, timeout=rtt.timeout()):
+                return {"probe": "icmp"}
+        except Exception:
+            pass
+    try:
+        answer = tcp_probe(ip, ports=tcp_ports, timeout=rtt.timeout(), pacer=pacer, rtt=rtt)
+        if answer:
+            return {"probe": "tcp", "port": answer[0], "state": answer[1]}
+    except Exception:
+        pass
+    return None
+
+def discovery_stream(targets, rtt, max_workers=200, tcp_ports=DEFAULT_TCP_PORTS, udp_probe_enabled=True,
+                     icmp_backend="auto", udp_multicast=False, pacer=None, budget=None, in_scope=None,
+                     chunk_size=SWEEP_CHUNK, deadline=None, coverage=None, hot=None):
+    """
+    Thread-pool host discovery over the iterable `targets`, yielding (ip, detail) as hosts answer.
+    Addresses are pulled from `targets` chunk_size at a time and ICMP-swept as one batch;
+    the silent ones are fed to max_workers TCP checks with at most 2 * max_workers
+    submitted but unfinished, and UDP runs per chunk of still-silent hosts. Memory
+    therefore stays flat however large the range, and the first hosts are reported
+    while the rest of the range has not even been generated.
+    `in_scope(ip)` limits which multicast UDP responders count (default: any).
+    With a `deadline` (deadline.Deadline) no ICMP batch, TCP check or UDP round starts
+    unless its timeout still fits; checks already running finish. `coverage`
+    (deadline.Coverage) gets each address once all its enabled probes are done.
+    With a `hot(ip)` predicate (priority.Prioritizer.is_hot), chunks without a hot
+    address are ICMP-swept once, without retries.
+    """
+    window = max(1, max_workers) * 2
+    icmp_ok = icmp_backend != "subprocess"
+    found = set()
+    udp_todo = []
+    pending = {}
+    finished = queue.Queue()  # futures land here as they complete (O(1), unlike wait() over the window)
+    udp_pending = udp_probe_enabled and not udp_multicast
+
+    def covered(ip):
+        if coverage is not None:
+            coverage.add(ip)
+
+    def fits(cost):
+        if deadline is None or deadline.allows(cost):
+            return True
+        if coverage is not None:
+            coverage.stopped = True
+        return False
+
+    def completed(block):
+        done = []
+        if block and pending:
+            done.append(finished.get())
+        while True:
+            try:
+                done.append(finished.get_nowait())
+            except queue.Empty:
+                break
+        for fut in done:
+            ip = pending.pop(fut)
+            try:
+                detail = fut.result()
+            except Exception:
+                detail = None
+            if detail:
+                found.add(ip)
+                covered(ip)
+                yield ip, detail
+            elif udp_pending:
+                udp_todo.append(ip)
+            else:
+                covered(ip)
+
+    def udp_flush():
+        if fits(rtt.udp_timeout()):
+            answers = udp_stage(udp_todo, timeout=rtt.udp_timeout(), pacer=pacer)
+            for ip in udp_todo:
+                covered(ip)
+                if ip in answers:
+                    found.add(ip)
+                    yield ip, {"probe": "udp", "service": answers[ip]}
+        udp_todo.clear()
+
+    exe = concurrent_futures.ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        for chunk in _chunks(targets, chunk_size):
+            retries = 0 if hot is not None and not any(hot(ip) for ip in chunk) else rtt.retries
+            if not fits(rtt.timeout() * (retries + 1)):
+                break
+            icmp_alive = icmp_batch(chunk, timeout=rtt.timeout(), backend=icmp_backend, rtt=rtt, pacer=pacer,
+                                    retries=retries) if icmp_ok else None
+            if icmp_alive is None:
+                icmp_ok = False  # no ICMP socket: every host gets a subprocess ping instead
+            else:
+                for ip in chunk:
+                    if ip in icmp_alive:
+                        found.add(ip)
+                        covered(ip)
+                        yield ip, {"probe": "icmp", "rtt": icmp_alive[ip]}
+                chunk = [ip for ip in chunk if ip not in icmp_alive]
+            cut = False
+            for ip in chunk:
+                while len(pending) >= window:
+                    yield from completed(block=True)
+                # a subprocess ping (no ICMP socket) and the TCP connect each wait up to one timeout
+                if not fits(rtt.timeout() * (1 if icmp_ok else 2)):
+                    cut = True
+                    break
+                fut = exe.submit(_check_host, ip, rtt, tcp_ports, pacer, not icmp_ok, budget)
+                pending[fut] = ip
+                fut.add_done_callback(finished.put)
+            yield from completed(block=False)
+            if cut:
+                break
+            if len(udp_todo) >= chunk_size:
+                yield from udp_flush()
+        while pending:
+            yield from completed(block=True)
+        if udp_todo:
+            yield from udp_flush()
+        if udp_probe_enabled and udp_multicast and fits(rtt.udp_timeout()):
+            accept = lambda ip: ip not in found and (in_scope is None or in_scope(ip))
+            for ip, proto in udp_stage((), timeout=rtt.udp_timeout(), multicast=True, pacer=pacer, accept=accept).items():
+                found.add(ip)
+                yield ip, {"probe": "udp", "service": proto}
+    finally:
+        for fut in pending:
+            fut.cancel()
+        exe.shutdown(wait=True)
+
+def ping_sweep(network_cidr, max_workers=200, timeout=None, tcp_ports=None, udp_probe_enabled=True, icmp_backend="auto",
+               mode="threads", max_in_flight=512, stage_deadlines=None, details=None, udp_multicast=False,
+               timing=DEFAULT_TIMING, pacer=None, on_alive=None, exclude=None, first=None, budget=None,
+               deadline=None, coverage=None, start=None, hot=None, scope=None, order="address", seed=None):
     """
     Host discovery:
-      1) ICMP ping
+      1) ICMP ping (one batched socket sweep; per-host `ping` subprocess as fallback)
       2) TCP connect to common ports (fast, non-root)
-      3) UDP probes (SSDP/mDNS) if enabled (may require router to allow)
+      3) UDP probes (SSDP/mDNS) if enabled, multiplexed over shared sockets (may require router to allow)
+    Targets are generated lazily and handled SWEEP_CHUNK addresses at a time, so a /16
+    costs no more memory than a /22 (see discovery_stream()).
+    mode="threads" checks each host on a pool of max_workers threads;
+    mode="asyncio" runs the stages as tasks on one event loop (see async_discovery()).
+    Probe timeouts adapt to measured RTTs (see timing.py): `timing` is a template
+    name or an RttEstimator shared across scans; `timeout` overrides the initial value.
+    `pacer` (rate_limit.RateScheduler) paces every ICMP/TCP/UDP packet of the sweep.
+    If `details` is a dict it is filled with ip -> how the host answered
+    ({"probe": "icmp", "rtt": ...} / {"probe": "tcp", "port": 22, "state": "closed"} / {"probe": "udp", "service": "mdns"}).
+    on_alive(ip, detail), if given, is called (from the calling thread / event loop)
+    as soon as each host is confirmed, so callers can stream results.
+    Addresses in `exclude` (already known, e.g. from passive discovery) are not probed;
+    addresses in `first` (e.g. from the neighbour table, or priority.Prioritizer.hot())
+    are probed before the rest, which is swept from `start` onwards (wrapping around),
+    or in random order with order="random" (see sweep_targets()); only addresses in
+    `scope` (a target_set.TargetSet) are probed at all.
+    `hot(ip)` marks the addresses that keep full ICMP retries (default: all).
+    `budget` (a threading.Semaphore) caps concurrent host checks across sweeps
+    running side by side (see scan_targets()).
+    `deadline` / `coverage` (deadline.py) stop new probes when time runs out and record
+    which addresses were fully probed (see discovery_stream()).
     Returns list of ips that appear alive.
     """
     print(f"[*] Running enhanced host discovery on {network_cidr} ...")
     if tcp_ports is None:
-        tcp_ports = (80, 443, 8080, 8008, 554, 22, 5353)
+        tcp_ports = DEFAULT_TCP_PORTS
+    if details is None:
+        details = {}
 
-    alive = []
+    rtt = make_estimator(timing, initial_timeout=timeout)
     net = ipaddress.IPv4Network(network_cidr, strict=False)
-    ips = [str(ip) for ip in net.hosts()]
+    targets = sweep_targets(net, exclude=exclude, first=first, start=start, scope=scope, order=order, seed=seed)
+    in_scope = lambda ip: (ipaddress.IPv4Address(ip) in net and not (exclude and ip in exclude)
+                           and (scope is None or ip in scope))
 
-    def check(ip):
-        try:
-            if ping_host(ip, timeout=timeout):
-                return ip
-        except Exception:
-            pass
+    if mode == "asyncio":
+        alive = asyncio.run(async_discovery(
+            targets, tcp_ports=tcp_ports, udp_probe_enabled=udp_probe_enabled,
+            icmp_backend=icmp_backend, max_in_flight=max_in_flight, stage_deadlines=stage_deadlines,
+            details=details, udp_multicast=udp_multicast, timing=rtt, pacer=pacer, on_alive=on_alive,
+            in_scope=in_scope, deadline=deadline, coverage=coverage, hot=hot,
+        ))
+        _print_timing(rtt)
+        return alive
+
+    alive = []
+    for ip, detail in discovery_stream(targets, rtt, max_workers=max_workers, tcp_ports=tcp_ports,
+                                       udp_probe_enabled=udp_probe_enabled, icmp_backend=icmp_backend,
+                                       udp_multicast=udp_multicast, pacer=pacer, budget=budget, in_scope=in_scope,
+                                       deadline=deadline, coverage=coverage, hot=hot):
+        alive.append(ip)
+        details[ip] = detail
+        if on_alive is not None:
+            on_alive(ip, detail)
+    _print_timing(rtt)
+    return alive
+
+def _print_timing(rtt):
+    snap = rtt.snapshot()
+    if snap["samples"]:
+        print(f"[*] Timing: srtt={snap['srtt'] * 1000:.1f}ms rttvar={snap['rttvar'] * 1000:.1f}ms "
+              f"-> probe timeout {rtt.timeout() * 1000:.0f}ms ({snap['samples']} samples)")
+
+# ---------- asyncio discovery pipeline ----------
+DISCOVERY_MODES = ("threads", "asyncio")
+DISCOVERY_STAGES = ("icmp", "tcp", "udp")
+
+def parse_stage_deadlines(text):
+    """Parse 'icmp=2,tcp=5,udp=3' (seconds) into a dict; unknown stages are ignored."""
+    deadlines = {}
+    for part in (text or "").split(","):
+        if "=" not in part:
+            continue
+        stage, value = part.split("=", 1)
+        stage = stage.strip().lower()
+        if stage not in DISCOVERY_STAGES:
+            continue
         try:
-            if tcp_connect_check(ip, ports=tcp_ports, timeout=timeout):
-                return ip
-        except Exception:
+            deadlines[stage] = float(value)
+        except ValueError:
             pass
-        if udp_probe_enabled:
+    return deadlines
+
+async def _async_ping(ip, timeout, pacer=None):
+    """Run one `ping` subprocess without blocking the event loop (killed after `timeout`)."""
+    import subprocess
+    if pacer is not None:
+        await pacer.take_async()
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *ping_command(ip, timeout), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    except Exception:
+        return False
+    try:
+        return (await asyncio.wait_for(proc.wait(), timeout + PING_SPAWN_GRACE)) == 0
+    except asyncio.TimeoutError:
+        return False
+    finally:
+        if proc.returncode is None:
             try:
-                if udp_probe(ip, timeout=timeout):
-                    return ip
+                proc.kill()
             except Exception:
                 pass
+
+async def _async_tcp_connect(ip, port, pacer=None, rtt=None):
+    """Return (port, "open"|"closed") once the connect is answered; raise on anything else."""
+    if pacer is not None:
+        await pacer.take_async()
+    sent_at = time.monotonic()
+    try:
+        _reader, writer = await asyncio.open_connection(ip, port)
+        state = "open"
+    except ConnectionRefusedError:
+        writer = None
+        state = "closed"
+    if rtt is not None:
+        rtt.update(time.monotonic() - sent_at)
+    if writer is not None:
+        writer.close()
+    return port, state
+
+async def _async_tcp_probe(ip, ports, rtt, pacer=None):
+    """
+    asyncio equivalent of tcp_probe: connect to all ports at once, first answer wins.
+    Waits rtt.timeout(); the winning connect feeds its answer time back into the estimator.
+    """
+    tasks = {asyncio.ensure_future(_async_tcp_connect(ip, port, pacer, rtt)) for port in ports}
+    deadline = time.monotonic() + max(0.05, rtt.timeout())
+    try:
+        while tasks:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            done, tasks = await asyncio.wait(tasks, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            for t in done:
+                if not t.cancelled() and t.exception() is None:
+                    return t.result()
         return None
+    finally:
+        for t in tasks:
+            t.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
 
-    with ThreadPoolExecutor(max_workers=max_workers) as exe:
-        futures = {exe.submit(check, ip): ip for ip in ips}
-        for fut in as_completed(futures):
-            ip = futures[fut]
+async def _run_stage(ips, probe, limit, deadline=None, on_result=None):
+    """
+    Run probe(ip) for every ip, never more than the shared `limit` semaphore allows
+    at once. Probes still running when `deadline` seconds elapse are cancelled.
+    on_result(ip, result) is called as each truthy result arrives.
+    Returns {ip: probe result} for the probes that returned something truthy, in input order.
+    """
+    async def one(ip):
+        async with limit:
             try:
-                res = fut.result()
-                if res:
-                    alive.append(res)
+                result = await probe(ip)
             except Exception:
-                pass
+                return None
+        if result and on_result is not None:
+            on_result(ip, result)
+        return result
+
+    tasks = [asyncio.ensure_future(one(ip)) for ip in ips]
+    if not tasks:
+        return {}
+    _done, pending = await asyncio.wait(tasks, timeout=deadline)
+    for t in pending:
+        t.cancel()
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+    return {ip: t.result() for ip, t in zip(ips, tasks) if not t.cancelled() and t.exception() is None and t.result()}
+
+async def async_discovery(ips, timeout=None, tcp_ports=None, udp_probe_enabled=True, icmp_backend="auto",
+                          max_in_flight=512, stage_deadlines=None, details=None, udp_multicast=False,
+                          timing=DEFAULT_TIMING, pacer=None, on_alive=None, in_scope=None, chunk_size=SWEEP_CHUNK,
+                          deadline=None, coverage=None, hot=None):
+    """
+    asyncio host discovery: ICMP, then TCP for the silent hosts, then UDP for the rest.
+    Every probe of every stage shares one in-flight limit (keep it below the process
+    fd limit); stage_deadlines maps "icmp"/"tcp"/"udp" to a wall-clock budget in seconds.
+    `ips` may be any iterable (e.g. sweep_targets()); it is consumed chunk_size addresses
+    at a time, so tasks exist only for the current chunk and stage deadlines apply per chunk.
+    `details`, `timing`, `pacer` and `on_alive` behave as in ping_sweep();
+    `in_scope`, `deadline`, `coverage` and `hot` as in discovery_stream(); a chunk still running
+    when the deadline arrives is cancelled and counts as not covered.
+    Returns list of ips that appear alive.
+    """
+    rtt = make_estimator(timing, initial_timeout=timeout)
+    if tcp_ports is None:
+        tcp_ports = DEFAULT_TCP_PORTS
+    if details is None:
+        details = {}
+    deadlines = stage_deadlines or {}
+    limit = asyncio.Semaphore(max(1, int(max_in_flight)))
+
+    def record(ip, detail):
+        details[ip] = detail
+        if on_alive is not None:
+            on_alive(ip, detail)
+
+    async def one_chunk(ips):
+        nonlocal icmp_backend
+        # The batched ICMP engine owns a single socket; run it off-loop so TCP/UDP tasks are not blocked.
+        icmp_alive = None
+        if icmp_backend != "subprocess":
+            retries = 0 if hot is not None and not any(hot(ip) for ip in ips) else rtt.retries
+            icmp_alive = await asyncio.to_thread(icmp_batch, ips, rtt.timeout(), icmp_backend, rtt, pacer, retries)
+            if icmp_alive is None:
+                icmp_backend = "subprocess"  # no ICMP socket: later chunks go straight to subprocess pings
+        if icmp_alive is not None:
+            alive = [ip for ip in ips if ip in icmp_alive]
+            for ip in alive:
+                record(ip, {"probe": "icmp", "rtt": icmp_alive[ip]})
+        else:
+            alive = list(await _run_stage(ips, lambda ip: _async_ping(ip, rtt.timeout(), pacer), limit, deadlines.get("icmp"),
+                                          on_result=lambda ip, _ok: record(ip, {"probe": "icmp"})))
+
+        found = set(alive)
+        remaining = [ip for ip in ips if ip not in found]
+        tcp_alive = await _run_stage(remaining, lambda ip: _async_tcp_probe(ip, tcp_ports, rtt, pacer), limit, deadlines.get("tcp"),
+                                     on_result=lambda ip, answer: record(ip, {"probe": "tcp", "port": answer[0], "state": answer[1]}))
+        alive.extend(tcp_alive)
+
+        if udp_probe_enabled and not udp_multicast:
+            found.update(tcp_alive)
+            remaining = [ip for ip in remaining if ip not in found]
+            # UDP is already one shared-socket stage; its deadline just caps the reply window.
+            udp_alive = await asyncio.to_thread(udp_stage, remaining, udp_timeout(), False, pacer)
+            for ip in remaining:
+                if ip in udp_alive:
+                    alive.append(ip)
+                    record(ip, {"probe": "udp", "service": udp_alive[ip]})
+        return alive
+
+    def udp_timeout():
+        return min(rtt.udp_timeout(), deadlines["udp"]) if "udp" in deadlines else rtt.udp_timeout()
+
+    def fits(cost):
+        if deadline is None or deadline.allows(cost):
+            return True
+        if coverage is not None:
+            coverage.stopped = True
+        return False
+
+    alive = []
+    for chunk in _chunks(ips, chunk_size):
+        if not fits(rtt.timeout() * (rtt.retries + 1)):
+            break
+        if deadline is None or not deadline.limited:
+            alive.extend(await one_chunk(chunk))
+        else:
+            try:
+                alive.extend(await asyncio.wait_for(one_chunk(chunk), timeout=deadline.remaining()))
+            except asyncio.TimeoutError:
+                alive.extend(ip for ip in chunk if ip in details)  # reported before the cut
+                if coverage is not None:
+                    coverage.stopped = True
+                break
+        if coverage is not None:
+            coverage.update(chunk)
+
+    if udp_probe_enabled and udp_multicast and fits(udp_timeout()):
+        found = set(alive)
+        accept = lambda ip: ip not in found and (in_scope is None or in_scope(ip))
+        udp_alive = await asyncio.to_thread(udp_stage, (), udp_timeout(), True, pacer, accept)
+        for ip, proto in udp_alive.items():
+            alive.append(ip)
+            record(ip, {"probe": "udp", "service": proto})
     return alive
 
 # ---------- Merge & dedupe ----------
 def merge_and_dedupe(arp_map, ping_list):
     """
-    Merge arp_map (ip->mac) and ping_list (ips) into OrderedDict keyed by mac or 'ping-only:ip'
-    Returns OrderedDict { key -> {mac:..., ips:set(...) } }
-    """
-    mac_map = OrderedDict()
-    # ARP entries first
-    for ip, mac in arp_map.items():
-        key = mac or f"unknown-mac:{ip}"
-        if key not in mac_map:
-            mac_map[key] = {"mac": mac, "ips": set()}
-        mac_map[key]["ips"].add(ip)
-    # Ping-only entries
-    for ip in ping_list:
-        if ip in arp_map:
-            continue
-        key = f"ping-only:{ip}"
-        if key not in mac_map:
-            mac_map[key] = {"mac": None, "ips": set()}
-        mac_map[key]["ips"].add(ip)
-    return mac_map
+    Merge arp_map (ip->mac) and ping_list (ips) into a HostStore (see host_store.py):
+    one device per MAC, one ping-only device per IP without a MAC.
+    """
+    return HostStore(vendor_lookup=safe_vendor_lookup).merge(arp_map, ping_list)
 
 def print_results(mac_map):
     print("\nDetected devices (unique by MAC / ping-only):\n")
     header = "{:<22} {:<20} {:<30} {:<8}".format("IP(s)", "MAC", "Vendor", "Mobile")
     print(header)
     print("-" * len(header))
-    for entry in mac_map.values():
-        mac = entry["mac"]
-        ips = ", ".join(sorted(entry["ips"]))
-        if mac:
-            vendor = safe_vendor_lookup(mac)
-            mobile = "YES" if any(k in vendor.lower() for k in ["apple", "samsung", "xiaomi", "huawei", "oneplus", "pixel", "realme", "vivo"]) else ""
-            print("{:<22} {:<20} {:<30} {:<8}".format(ips, mac, vendor, mobile))
-        else:
-            print("{:<22} {:<20} {:<30} {:<8}".format(ips, "-", "Unknown (ping-only)", ""))
-
-def results_to_json(mac_map):
-    """Convert mac_map structure to JSON-friendly list."""
-    out = []
-    for entry in mac_map.values():
-        mac = entry["mac"]
-        ips = sorted(entry["ips"])
-        if mac:
-            vendor = safe_vendor_lookup(mac)
-            mobile = any(k in vendor.lower() for k in ["apple", "samsung", "xiaomi", "huawei", "oneplus", "pixel", "realme", "vivo"])
-            out.append({"mac": mac, "ips": ips, "vendor": vendor, "mobile": mobile, "ping_only": False})
+    for device in mac_map.devices():
+        ips = ", ".join(device.ips)
+        if device.mac:
+            print("{:<22} {:<20} {:<30} {:<8}".format(ips, device.mac, device.vendor, "YES" if device.mobile else ""))
         else:
-            out.append({"mac": None, "ips": ips, "vendor": "Unknown (ping-only)", "mobile": False, "ping_only": True})
+            print("{:<22} {:<20} {:<30} {:<8}".format(ips, "-", device.vendor, ""))
+
+def results_to_json(mac_map, details=None, target=None):
+    """
+    Convert a HostStore (from merge_and_dedupe) to a JSON-friendly list.
+    If `details` (from ping_sweep) is given, entries found by host discovery get a "probe" field.
+    `target` ({"iface", "network"}) is copied into every entry of a multi-network scan.
+    """
+    out = mac_map.to_json()
+    for item in out:
+        if details:
+            probe = next((details[ip] for ip in item["ips"] if ip in details), None)
+            if probe:
+                item["probe"] = probe
+                if probe.get("hostname"):
+                    item["hostname"] = probe["hostname"]
+        if target:
+            item.update(target)
     return out
 
+# ---------- Per-target scan ----------
+def scan_target(network_cidr, iface, args, tcp_ports=None, pacer=None, budget=None, max_in_flight=None):
+    """
+    Passive / neighbour / ARP / ping discovery of one network, as configured by the
+    parsed command-line `args`. Only addresses in args.scope (a target_set.TargetSet,
+    None = the whole network) and not in args.excluded are probed or reported.
+    Returns (mac_map, details).
+    """
+    arp_map = {}
+    ping_list = []
+    details = {}
+    scope = args.scope
+    excluded = args.excluded
+    net = ipaddress.IPv4Network(network_cidr, strict=False)
+
+    def wanted(addr):
+        return ipaddress.IPv4Address(addr) in net and addr not in excluded and (scope is None or addr in scope)
+
+    passive_seen = {}
+    replayed = {}      # hosts from a replayed capture: probed first, reported only if they answer now
+    replayed_macs = {}
+    if args.passive or args.pcap:
+        print(f"[*] Passive discovery on {network_cidr} " + (f"(replaying {args.pcap})" if args.pcap else f"for {args.passive:g}s") + " ...")
+        try:
+            table = passive_listen(iface=iface, duration=args.passive, pcap=args.pcap,
+                                   accept=wanted)
+            if args.pcap and not args.passive_only:
+                # a capture can be old: what it shows is a hint to verify, not proof the host is here now
+                replayed, replayed_macs = table.snapshot(), table.macs()
+                print(f"[+] Capture replay saw {len(replayed)} hosts on {network_cidr}; probing them first.")
+            else:
+                passive_seen = table.snapshot()
+                arp_map.update(table.macs())
+                for addr, host in passive_seen.items():
+                    details[addr] = {"probe": "passive", "sources": host["sources"], "hostname": host["hostname"]}
+                print(f"[+] Passive discovery saw {len(passive_seen)} hosts on {network_cidr}.")
+        except Exception as e:
+            print("[!] Passive discovery error:", e)
+
+    # The OS neighbour cache: fresh entries count as alive and skip ARP, every entry is probed first.
+    neighbors = {addr: entry for addr, entry in read_neighbors(network_cidr).items() if wanted(addr)}
+    if neighbors:
+        for addr, entry in fresh(neighbors).items():
+            arp_map.setdefault(addr, entry["mac"])
+            details.setdefault(addr, {"probe": "neighbor", "state": entry["state"]})
+        print(f"[*] Neighbour table ({network_cidr}): {len(neighbors)} entries ({len(fresh(neighbors))} fresh).")
+    known = set(passive_seen) | set(fresh(neighbors))
+    # Carve-outs are whole ranges: skip them as intervals instead of testing every address.
+    arp_skip = TargetSet(known) | excluded if excluded else known
+    sweep_skip = TargetSet(passive_seen) | excluded if excluded else passive_seen
+    # ARP only reaches the local subnet; a scope may reach well beyond it.
+    arp_scope = scope
+    if scope is not None:
+        _iface, local_ip, local_mask = iface_for_network(network_cidr)
+        arp_scope = scope & f"{local_ip}/{local_mask}" if local_ip else TargetSet()
+
+    # Gateway, infrastructure addresses, neighbours and past sightings are probed first (see priority.py).
+    prio = Prioritizer(network_cidr, history=None if args.no_history else HostHistory(args.history),
+                       gateway=default_gateway()[0], neighbors=neighbors)
+    first = list(dict.fromkeys([*replayed, *prio.hot()]))
+    is_hot = lambda addr: addr in replayed or prio.is_hot(addr)
+
+    if args.passive_only:
+        print("[*] Active probes skipped (passive-only mode).")
+    elif args.shards > 1:
+        # ARP and discovery split across worker processes; merged below like the in-process results
+        if iface:
+            _attempt_bind_iface(iface)
+        try:
+            shard_arp, ping_list, shard_details = shard.run_shards(
+                network_cidr, args.shards, iface=iface, arp=not args.no_arp,
+                arp_timeout=TIMING_TEMPLATES[args.timing]["arp_timeout"], arp_window=max(1, args.arp_window),
+                arp_retries=max(0, args.arp_retries), arp_exclude=arp_skip, max_workers=args.max_workers,
+                tcp_ports=tcp_ports, udp_probes=args.udp_probes, icmp_backend=args.icmp_backend,
+                udp_multicast=args.udp_multicast, timing=args.timing, max_rate=args.max_rate, burst=args.burst,
+                exclude=sweep_skip, first=first, scope=scope, arp_scope=arp_scope,
+                order=args.order, seed=args.seed)
+            arp_map.update(shard_arp)
+            details.update(shard_details)
+        except Exception as e:
+            print("[!] Sharded scan error:", e)
+            ping_list = []
+    elif arp_scope is not None and not arp_scope and not args.no_arp:
+        print(f"[*] ARP scan skipped (no scope address on a local subnet of {network_cidr}).")
+    elif not args.no_arp:
+        try:
+            # attempt to bind scapy to interface if provided - improves ARP reliability on Windows
+            if iface:
+                _attempt_bind_iface(iface)
+            arp_map.update(arp_scan(network_cidr, iface=iface, timeout=TIMING_TEMPLATES[args.timing]["arp_timeout"], pacer=pacer,
+                                    window=max(1, args.arp_window), retries=max(0, args.arp_retries), exclude=arp_skip,
+                                    scope=arp_scope))
+            if not arp_map:
+                print(f"[!] ARP scan of {network_cidr} returned no results (will run enhanced host discovery).")
+        except Exception as e:
+            print("[!] ARP scan error:", e)
+    else:
+        print("[*] ARP scan skipped (ping-only mode).")
+
+    if not args.passive_only and args.shards <= 1:
+        try:
+            ping_list = ping_sweep(network_cidr, max_workers=args.max_workers, tcp_ports=tcp_ports,
+                                   udp_probe_enabled=args.udp_probes, icmp_backend=args.icmp_backend, mode=args.discovery,
+                                   max_in_flight=max_in_flight or args.max_in_flight,
+                                   stage_deadlines=parse_stage_deadlines(args.stage_deadlines), details=details,
+                                   udp_multicast=args.udp_multicast, timing=args.timing, pacer=pacer,
+                                   exclude=sweep_skip, first=first, start=prio.cold_start(), hot=is_hot,
+                                   budget=budget, scope=scope, order=args.order, seed=args.seed)
+        except Exception as e:
+            print("[!] Host discovery error:", e)
+            ping_list = []
+    ping_list = list(passive_seen) + ping_list
+    # Replayed hosts that answered keep the MAC / hostname the capture had for them.
+    alive = set(arp_map) | set(ping_list)
+    for addr, host in replayed.items():
+        if addr in alive:
+            if addr in replayed_macs:
+                arp_map.setdefault(addr, replayed_macs[addr])
+            if host["hostname"]:
+                details.setdefault(addr, {})["hostname"] = host["hostname"]
+    if not args.passive_only:
+        prio.finish(set(arp_map) | set(ping_list))
+
+    # Pinging made the kernel resolve MACs for hosts ARP could not reach (e.g. unprivileged runs).
+    for addr, mac in macs_for(ping_list, read_neighbors(network_cidr)).items():
+        arp_map.setdefault(addr, mac)
+
+    return merge_and_dedupe(arp_map, ping_list), details
+
+def scan_targets(targets, args, tcp_ports=None):
+    """
+    Scan every (iface, ip, netmask, network_cidr) in `targets` concurrently and return
+    their (mac_map, details) results in the same order.
+    All targets share one packet-rate budget (a single RateScheduler) and one worker
+    budget: --max-workers host checks and --max-in-flight asyncio probes in total,
+    not per target, so adding interfaces does not multiply the load on the host.
+    A target whose scan raises gets an empty result (HostStore(), {}).
+    """
+    pacer = RateScheduler(max_rate=args.max_rate, min_rate=args.min_rate, burst=args.burst)
+    if len(targets) == 1:
+        iface, _ip, _netmask, network_cidr = targets[0]
+        try:
+            return [scan_target(network_cidr, iface, args, tcp_ports=tcp_ports, pacer=pacer)]
+        except Exception as e:
+            print(f"[!] Scan of {network_cidr} failed:", e)
+            return [(HostStore(), {})]
+
+    budget = threading.BoundedSemaphore(max(1, args.max_workers))
+    max_in_flight = max(16, args.max_in_flight // len(targets))
+    results = [(HostStore(), {}) for _ in targets]
+    with concurrent_futures.ThreadPoolExecutor(max_workers=len(targets)) as exe:
+        futures = {
+            exe.submit(scan_target, network_cidr, iface, args, tcp_ports=tcp_ports, pacer=pacer,
+                       budget=budget, max_in_flight=max_in_flight): n
+            for n, (iface, _ip, _netmask, network_cidr) in enumerate(targets)
+        }
+        for fut in concurrent_futures.as_completed(futures):
+            n = futures[fut]
+            try:
+                results[n] = fut.result()
+            except Exception as e:
+                print(f"[!] Scan of {targets[n][3]} failed:", e)
+    return results
+
 # ---------- Privilege check ----------
 def check_privileges():
     """Return (is_elevated:bool, message:str)."""
@@ -470,29 +1369,64 @@ def check_privileges():
 def main():
     p = argparse.ArgumentParser(description="Safe network scanner with robust vendor lookup and TCP/UDP fallbacks")
     p.add_argument("--auto", action="store_true", help="auto-select interface (default behavior)")
-    p.add_argument("--network", type=str, help="explicit network CIDR (overrides auto-detect)")
-    p.add_argument("--update-vendors", action="store_true", help="update local mac-vendor DB before scanning (requires internet)")
+    p.add_argument("--network", type=str, action="append",
+                   help="explicit network CIDR (overrides auto-detect); repeat or comma-separate to scan several networks concurrently")
+    p.add_argument("--all-ifaces", action="store_true", help="scan the networks of every eligible interface concurrently")
+    p.add_argument("--targets", type=str, action="append", metavar="SPEC",
+                   help="scan scope: addresses, CIDRs or ranges (a.b.c.d-e.f.g.h), comma-separated, repeatable; "
+                        "without --network/--all-ifaces it is scanned as one target, otherwise it limits them")
+    p.add_argument("--targets-file", type=str, action="append", metavar="PATH", help="read scope entries from a file (repeatable, # comments)")
+    p.add_argument("--exclude", type=str, action="append", metavar="SPEC", help="addresses, CIDRs or ranges never probed or reported (repeatable)")
+    p.add_argument("--exclude-file", type=str, action="append", metavar="PATH", help="read exclusions from a file (repeatable, # comments)")
+    p.add_argument("--order", choices=("address", "random"), default="address",
+                   help="order of the discovery sweep after the prioritised addresses (random: a permutation, nothing materialised)")
+    p.add_argument("--seed", type=int, help="seed for --order random (default: a new permutation every run)")
+    p.add_argument("--update-vendors", nargs="*", metavar="REGISTRY_FILE",
+                   help="update local mac-vendor DB before scanning (requires internet); with IEEE oui/mam/oui36 files, compile them into the OUI index instead")
     p.add_argument("--no-arp", action="store_true", help="skip ARP scan (ping-only)")
     p.add_argument("--iface", type=str, help="force interface name (netifaces name or scapy name)")
     p.add_argument("--json", action="store_true", help="output results in JSON format")
     p.add_argument("--list-ifaces", action="store_true", help="list detected interfaces (netifaces names + scapy matches) and exit")
     p.add_argument("--udp-probes", action="store_true", help="enable UDP SSDP/mDNS probes (may require privileges and network support)")
+    p.add_argument("--udp-multicast", action="store_true", help="send UDP probes once to the SSDP/mDNS multicast groups instead of to every host")
     p.add_argument("--tcp-ports", type=str, help="comma-separated TCP ports for fallback (e.g. 80,443,22)")
+    p.add_argument("--icmp-backend", choices=ICMP_BACKENDS, default="auto",
+                   help="ICMP probe backend: batched socket engine, per-host ping subprocess, or auto (socket with subprocess fallback)")
+    p.add_argument("--timing", choices=sorted(TIMING_TEMPLATES), default=DEFAULT_TIMING,
+                   help="probe timing template; timeouts then adapt to measured round-trip times")
+    p.add_argument("--max-rate", type=float, help="max packets/second across all probe types (default: unlimited)")
+    p.add_argument("--min-rate", type=float, help="packets/second floor when backing off from local send congestion (needs --max-rate)")
+    p.add_argument("--burst", type=int, help="max packets sent back-to-back under --max-rate (default: ~50 ms worth)")
+    p.add_argument("--discovery", choices=DISCOVERY_MODES, default="threads",
+                   help="host discovery engine: thread pool (default) or a single asyncio event loop")
+    p.add_argument("--max-workers", type=int, default=200, help="thread discovery: max concurrent host checks, shared by all scanned networks")
+    p.add_argument("--max-in-flight", type=int, default=512, help="asyncio discovery: max probes in flight across all stages (and all scanned networks)")
+    p.add_argument("--stage-deadlines", type=str, help="asyncio discovery: per-stage budgets in seconds, e.g. icmp=2,tcp=5,udp=3")
+    p.add_argument("--arp-window", type=int, default=ARP_WINDOW, help="ARP requests sent per window before draining replies")
+    p.add_argument("--arp-retries", type=int, default=ARP_RETRIES, help="extra ARP rounds for addresses that did not answer")
+    p.add_argument("--passive", type=float, metavar="SECONDS", help="listen to ARP/DHCP/mDNS/SSDP/NetBIOS broadcasts for SECONDS before probing; probes then skip hosts already seen")
+    p.add_argument("--passive-only", action="store_true", help="no active probes at all (with --passive or --pcap)")
+    p.add_argument("--pcap", type=str, help="replay a capture file through the passive parser instead of listening live; "
+                        "its hosts are probed first and reported only if they answer (all of them with --passive-only)")
+    p.add_argument("--shards", type=int, default=1, metavar="N",
+                   help="split ARP + discovery of each network across N worker processes (rate/worker limits are shared)")
+    p.add_argument("--history", type=str, default=DEFAULT_HISTORY_PATH, metavar="PATH",
+                   help="liveness history file used to probe likely-alive hosts first (see priority.py)")
+    p.add_argument("--no-history", action="store_true", help="neither read nor update the liveness history")
+    p.add_argument("--import-profile", action="store_true", help="print how long each module import took (to stderr) on exit")
     args = p.parse_args()
 
+    if args.import_profile:
+        atexit.register(print_import_profile)
+
+    if not netifaces.available():
+        sys.exit("netifaces required. Install with: pip install netifaces")
+
     is_elevated, msg = check_privileges()
     print(msg)
 
-    if args.update_vendors:
-        if not MACLOOKUP_AVAILABLE:
-            print("[!] mac-vendor-lookup not installed. Install with: pip install mac-vendor-lookup")
-        else:
-            print("[*] Updating mac vendor DB (this may take a moment)...")
-            try:
-                MacLookup().update_vendors()
-                print("[+] Vendor DB updated.")
-            except Exception as e:
-                print("[!] update_vendors failed:", e)
+    if args.update_vendors is not None:
+        update_vendor_db(args.update_vendors)
 
     if args.list_ifaces:
         infos = list_interfaces()
@@ -503,13 +1437,45 @@ def main():
             ))
         return
 
-    iface = None; ip = None; netmask = None; network_cidr = None
-    if args.iface:
-        iface = args.iface
+    try:
+        args.scope = None
+        if args.targets or args.targets_file:
+            args.scope = TargetSet(args.targets or ())
+            for path in args.targets_file or ():
+                args.scope |= TargetSet.from_file(path)
+        args.excluded = TargetSet(args.exclude or ())
+        for path in args.exclude_file or ():
+            args.excluded |= TargetSet.from_file(path)
+    except (OSError, ValueError) as e:
+        print(f"[!] Bad target list: {e}")
+        return
+    if args.scope is not None:
+        args.scope -= args.excluded
+        if not args.scope:
+            print("[!] Scan scope is empty after exclusions.")
+            return
+        print(f"[*] Scan scope: {len(args.scope)} addresses in {len(args.scope.ranges())} ranges")
 
+    targets = []
     if args.network:
-        network_cidr = args.network
-        print(f"Using explicit network: {network_cidr}")
+        for network_cidr in (n.strip() for value in args.network for n in value.split(",")):
+            if not network_cidr:
+                continue
+            iface, ip, netmask = iface_for_network(network_cidr)
+            targets.append((args.iface or iface, ip, netmask, network_cidr))
+            print(f"Using explicit network: {network_cidr}" + (f" (interface {iface})" if iface else ""))
+    elif args.scope is not None and not args.all_ifaces:
+        network_cidr = str(args.scope.enclosing_network())
+        iface, ip, netmask = iface_for_network(network_cidr)
+        targets.append((args.iface or iface, ip, netmask, network_cidr))
+        print(f"Scanning scope within {network_cidr}" + (f" (interface {iface})" if iface else ""))
+    elif args.all_ifaces:
+        targets = enumerate_targets()
+        if not targets:
+            print("[!] No eligible interfaces found. Provide --network explicitly.")
+            return
+        for iface, ip, netmask, network_cidr in targets:
+            print(f"Interface: {iface}  IP: {ip}  Netmask: {netmask}  Network: {network_cidr}")
     else:
         iface, ip, netmask, network_cidr = auto_select_iface_and_network()
         if not network_cidr:
@@ -517,6 +1483,13 @@ def main():
             return
         print(f"Interface chosen: {iface}  IP: {ip}  Netmask: {netmask}")
         print(f"Detected network: {network_cidr}")
+        targets.append((args.iface or iface, ip, netmask, network_cidr))
+
+    if args.scope is not None:
+        targets = [t for t in targets if hosts_of(t[3]) & args.scope]
+        if not targets:
+            print("[!] No selected network overlaps the scan scope.")
+            return
 
     tcp_ports = None
     if args.tcp_ports:
@@ -525,35 +1498,19 @@ def main():
         except Exception:
             tcp_ports = None
 
-    arp_map = {}
-    ping_list = []
-
-    if not args.no_arp:
-        try:
-            # attempt to bind scapy to interface if provided - improves ARP reliability on Windows
-            if iface:
-                _attempt_bind_iface(iface)
-            arp_map = arp_scan(network_cidr, iface=iface, timeout=2)
-            if not arp_map:
-                print("[!] ARP scan returned no results (will run enhanced host discovery).")
-        except Exception as e:
-            print("[!] ARP scan error:", e)
-    else:
-        print("[*] ARP scan skipped (ping-only mode).")
-
-    try:
-        ping_list = ping_sweep(network_cidr, tcp_ports=tcp_ports, udp_probe_enabled=args.udp_probes)
-    except Exception as e:
-        print("[!] Host discovery error:", e)
-        ping_list = []
-
-    mac_map = merge_and_dedupe(arp_map, ping_list)
+    results = scan_targets(targets, args, tcp_ports=tcp_ports)
 
     if args.json:
-        out = results_to_json(mac_map)
+        out = []
+        for (iface, _ip, _netmask, network_cidr), (mac_map, details) in zip(targets, results):
+            target = {"iface": iface, "network": network_cidr} if len(targets) > 1 else None
+            out.extend(results_to_json(mac_map, details=details, target=target))
         print(json.dumps(out, indent=2))
     else:
-        print_results(mac_map)
+        for (iface, _ip, _netmask, network_cidr), (mac_map, _details) in zip(targets, results):
+            if len(targets) > 1:
+                print(f"\n== {network_cidr} on {iface or '-'} ==")
+            print_results(mac_map)
 
 if __name__ == "__main__":
     main()
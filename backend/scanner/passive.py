@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+passive.py
+
+Passive host discovery: build an IP / MAC / hostname table from the broadcast
+and multicast chatter every LAN carries, without sending a single probe.
+
+  ARP       sender IP + MAC of requests, replies and gratuitous ARP
+  DHCP      client MAC, requested / assigned IP and the host-name option
+  mDNS      responder IP + MAC, hostname from A records it announces (*.local)
+  SSDP      NOTIFY / M-SEARCH sender IP + MAC
+  NetBIOS   name-service registrations (UDP 137) and datagram source names (UDP 138)
+
+Live capture needs the same privileges as the ARP scan (scapy sniff); replaying a
+pcap file does not, which is how the parser is exercised offline.
+
+Usage:
+  from passive import passive_listen
+  table = passive_listen(iface="eth0", duration=30)           # live
+  table = passive_listen(pcap="capture.pcap")                  # replay
+  python passive.py --pcap capture.pcap                        # print the table as JSON
+  python passive.py --iface eth0 --duration 60
+"""
+
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import time
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+if SCRIPT_DIR not in sys.path:
+    sys.path.insert(0, SCRIPT_DIR)
+
+from lazy_import import lazy_module
+
+scapy = lazy_module("scapy.all", hint="pip install scapy")
+
+BPF_FILTER = "arp or (udp and (port 67 or port 68 or port 137 or port 138 or port 1900 or port 5353))"
+_NBNS_NAME_OPCODES = (5, 8, 9)  # registration, refresh (RFC 1002 uses both 8 and 9)
+
+# ---------- Packet parsing ----------
+def _mac(value):
+    if isinstance(value, bytes):
+        value = value[:6].hex(":")
+    return str(value).lower() if value else None
+
+def _text(value):
+    if isinstance(value, bytes):
+        value = value.decode("utf-8", errors="replace")
+    return str(value).strip().strip("\x00") if value else None
+
+def _netbios_name(data, offset):
+    """Decode a first-level encoded NetBIOS name (length byte 32 + 32 chars) at `offset`."""
+    if len(data) < offset + 33 or data[offset] != 32:
+        return None
+    raw = data[offset + 1:offset + 33]
+    try:
+        name = bytes(((raw[i] - 0x41) << 4) | (raw[i + 1] - 0x41) for i in range(0, 32, 2))
+    except ValueError:
+        return None
+    name = name[:15].decode("ascii", errors="replace").strip()
+    return name if name and name.isprintable() and not name.startswith("\x01") else None
+
+def _dns_records(section):
+    """Resource records of a scapy DNS section (a list in newer scapy, a DNSRR chain in older)."""
+    if section is None:
+        return []
+    if isinstance(section, list):
+        return section
+    records = []
+    while section is not None and section.__class__.__name__.startswith("DNSRR"):
+        records.append(section)
+        section = section.payload if section.payload else None
+    return records
+
+def observations(pkt):
+    """List of {"ip", "mac", "hostname", "source"} sightings in one packet (possibly empty)."""
+    found = []
+    ether_src = _mac(pkt[scapy.Ether].src) if scapy.Ether in pkt else None
+
+    if scapy.ARP in pkt:
+        arp = pkt[scapy.ARP]
+        if arp.op in (1, 2) and arp.psrc and arp.psrc != "0.0.0.0":
+            found.append({"ip": arp.psrc, "mac": _mac(arp.hwsrc), "hostname": None, "source": "arp"})
+        return found
+
+    if scapy.IP not in pkt or scapy.UDP not in pkt:
+        return found
+    ip_src = pkt[scapy.IP].src
+    udp = pkt[scapy.UDP]
+    ports = (udp.sport, udp.dport)
+
+    if scapy.BOOTP in pkt and (67 in ports or 68 in ports):
+        bootp = pkt[scapy.BOOTP]
+        options = {}
+        if scapy.DHCP in pkt:
+            for opt in pkt[scapy.DHCP].options:
+                if isinstance(opt, tuple) and len(opt) >= 2:
+                    options[opt[0]] = opt[1]
+        msg_type = options.get("message-type")
+        mac = _mac(bootp.chaddr)
+        hostname = _text(options.get("hostname"))
+        if bootp.op == 1:  # client -> server
+            ip = options.get("requested_addr") or (bootp.ciaddr if bootp.ciaddr != "0.0.0.0" else None)
+            found.append({"ip": ip, "mac": mac, "hostname": hostname, "source": "dhcp"})
+        elif msg_type == 5 and bootp.yiaddr != "0.0.0.0":  # DHCPACK
+            found.append({"ip": bootp.yiaddr, "mac": mac, "hostname": hostname, "source": "dhcp"})
+        return found
+
+    if ip_src == "0.0.0.0":
+        return found
+
+    if udp.sport == 5353 or udp.dport == 5353:
+        hostname = None
+        if scapy.DNS in pkt:
+            for rr in _dns_records(pkt[scapy.DNS].an) + _dns_records(pkt[scapy.DNS].ar):
+                if getattr(rr, "type", None) == 1 and str(getattr(rr, "rdata", "")) == ip_src:
+                    hostname = _text(rr.rrname).rstrip(".")
+                    if hostname.endswith(".local"):
+                        hostname = hostname[:-6]
+                    break
+        found.append({"ip": ip_src, "mac": ether_src, "hostname": hostname, "source": "mdns"})
+    elif udp.sport == 1900 or udp.dport == 1900:
+        found.append({"ip": ip_src, "mac": ether_src, "hostname": None, "source": "ssdp"})
+    elif udp.sport == 137 or udp.dport == 137:
+        data = bytes(udp.payload)
+        hostname = None
+        if len(data) >= 12:
+            opcode = (int.from_bytes(data[2:4], "big") >> 11) & 0xF
+            if opcode in _NBNS_NAME_OPCODES:
+                hostname = _netbios_name(data, 12)
+        found.append({"ip": ip_src, "mac": ether_src, "hostname": hostname, "source": "netbios"})
+    elif udp.sport == 138 or udp.dport == 138:
+        data = bytes(udp.payload)
+        hostname = _netbios_name(data, 14) if len(data) >= 14 and data[0] in (0x10, 0x11, 0x12) else None
+        found.append({"ip": ip_src, "mac": ether_src, "hostname": hostname, "source": "netbios"})
+    return found
+
+# ---------- Host table ----------
+class PassiveTable:
+    """
+    IP -> {"mac", "hostname", "sources", "first_seen", "last_seen"} built from observations.
+    DHCP DISCOVERs carry a hostname before the client has an address; those names
+    are parked by MAC and attached once the MAC shows up with an IP.
+    """
+
+    def __init__(self, accept=None):
+        self.accept = accept or (lambda ip: True)
+        self.hosts = {}
+        self.names_by_mac = {}
+        self._lock = threading.Lock()
+
+    def update(self, obs, when=None):
+        """Apply one observation; returns a join/change event dict or None."""
+        when = when or time.time()
+        ip, mac, hostname = obs.get("ip"), obs.get("mac"), obs.get("hostname")
+        with self._lock:
+            if mac and hostname:
+                self.names_by_mac[mac] = hostname
+            if not ip or not self.accept(ip):
+                return None
+            hostname = hostname or (self.names_by_mac.get(mac) if mac else None)
+            entry = self.hosts.get(ip)
+            if entry is None:
+                entry = {"mac": mac, "hostname": hostname, "sources": {obs["source"]}, "first_seen": when, "last_seen": when}
+                self.hosts[ip] = entry
+                return {"type": "join", "ip": ip, **self._public(entry)}
+            entry["last_seen"] = max(entry["last_seen"], when)
+            entry["sources"].add(obs["source"])
+            changed = False
+            if mac and mac != entry["mac"]:
+                entry["mac"] = mac
+                changed = True
+            if hostname and hostname != entry["hostname"]:
+                entry["hostname"] = hostname
+                changed = True
+            return {"type": "change", "ip": ip, **self._public(entry)} if changed else None
+
+    @staticmethod
+    def _public(entry):
+        return {"mac": entry["mac"], "hostname": entry["hostname"], "sources": sorted(entry["sources"]),
+                "first_seen": entry["first_seen"], "last_seen": entry["last_seen"]}
+
+    def snapshot(self):
+        with self._lock:
+            return {ip: self._public(e) for ip, e in self.hosts.items()}
+
+    def last_seen(self):
+        """ip -> time.time() of the latest sighting (moves on every repeat, unlike the events)."""
+        with self._lock:
+            return {ip: e["last_seen"] for ip, e in self.hosts.items()}
+
+    def macs(self):
+        """ip -> mac for hosts whose MAC is known (the arp_scan() result shape)."""
+        with self._lock:
+            return {ip: e["mac"] for ip, e in self.hosts.items() if e["mac"]}
+
+# ---------- Capture ----------
+def passive_listen(iface=None, duration=None, pcap=None, accept=None, on_event=None, table=None, stop=None):
+    """
+    Feed packets into a PassiveTable and return it.
+    pcap: replay this capture file instead of sniffing live.
+    duration: live capture length in seconds (None = until `stop` is set).
+    on_event(event) is called for every join/change as it happens.
+    """
+    table = table if table is not None else PassiveTable(accept=accept)
+
+    def handle(pkt):
+        try:
+            sightings = observations(pkt)
+        except Exception:
+            return
+        when = float(getattr(pkt, "time", 0) or 0) or None
+        for obs in sightings:
+            event = table.update(obs, when=when)
+            if event and on_event is not None:
+                on_event(event)
+
+    if pcap:
+        with scapy.PcapReader(pcap) as reader:
+            for pkt in reader:
+                handle(pkt)
+        return table
+
+    kwargs = {"prn": handle, "store": False, "timeout": duration}
+    if iface:
+        kwargs["iface"] = iface
+    if stop is not None:
+        kwargs["stop_filter"] = lambda _pkt: stop.is_set()
+    try:
+        scapy.sniff(filter=BPF_FILTER, **kwargs)
+    except ImportError:
+        raise
+    except Exception:
+        # no BPF compiler (libpcap/tcpdump) available: filter in Python instead
+        kwargs["lfilter"] = lambda p: scapy.ARP in p or scapy.UDP in p
+        scapy.sniff(**kwargs)
+    return table
+
+class PassiveListener:
+    """Background passive_listen() whose join/change events are read from a queue."""
+
+    def __init__(self, iface=None, accept=None):
+        self.events = queue.Queue()
+        self.table = PassiveTable(accept=accept)
+        self.iface = iface
+        self.error = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="passive-listener", daemon=True)
+
+    def _run(self):
+        try:
+            passive_listen(iface=self.iface, table=self.table, on_event=self.events.put, stop=self._stop)
+        except Exception as e:
+            self.error = e
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+def main():
+    ap = argparse.ArgumentParser(description="Passive host discovery from ARP/DHCP/mDNS/SSDP/NetBIOS broadcasts")
+    ap.add_argument("--pcap", type=str, help="replay a capture file instead of sniffing")
+    ap.add_argument("--iface", type=str, help="interface to sniff on (default: scapy's default)")
+    ap.add_argument("--duration", type=float, default=30.0, help="live capture length in seconds")
+    ap.add_argument("--events", action="store_true", help="print join/change events as NDJSON instead of the final table")
+    args = ap.parse_args()
+
+    on_event = (lambda e: print(json.dumps(e), flush=True)) if args.events else None
+    table = passive_listen(iface=args.iface, duration=args.duration, pcap=args.pcap, on_event=on_event)
+    if not args.events:
+        print(json.dumps(table.snapshot(), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+priority.py
+
+Target prioritisation for host discovery.
+
+A plain sweep gives every address the same effort in address order, so on a
+sparse /20 the few live hosts are found only as the sweep happens to reach
+them, and a deadline-bound scan (deadline.py) spends its budget on empty space.
+Prioritizer scores each address from
+  - liveness history    when it last answered and how often (decays with a one-day half-life),
+  - the default gateway and infrastructure addresses (first / last hosts of the network),
+  - the OS neighbour table (fresh entries above stale ones),
+and hands ping_sweep() the scored ("hot") addresses best first. The never-seen
+("cold") rest is swept afterwards with lower effort (no ICMP retries), starting
+where the previous cut-short scan of the network stopped (ping_sweep() walks the
+range from that cursor and wraps around), so successive partial scans spread over
+the whole range instead of re-probing its start.
+
+History is a small JSON state file ($SCAN_HISTORY_PATH, default
+~/.cache/nvt-scans/history.json): per network, ip -> [last_seen, times_seen]
+plus the cold-sweep cursor. Entries unseen for HISTORY_TTL are dropped.
+
+Usage:
+  from priority import HostHistory, Prioritizer
+  prio = Prioritizer("192.168.1.0/24", history=HostHistory(), gateway="192.168.1.1", neighbors=read_neighbors(...))
+  ping_sweep(net, first=prio.hot(), start=prio.cold_start(), hot=prio.is_hot, coverage=cov)
+  prio.finish(alive_ips, coverage=cov)   # record liveness + the next cursor, save the state file
+  python priority.py 192.168.1.0/24      # print the scored addresses
+"""
+
+import ipaddress
+import json
+import os
+import sys
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: concurrent writers may drop each other's updates
+    fcntl = None
+
+DEFAULT_HISTORY_PATH = os.environ.get("SCAN_HISTORY_PATH") or os.path.join(
+    os.path.expanduser("~"), ".cache", "nvt-scans", "history.json")
+HISTORY_HALF_LIFE = 24 * 3600.0   # seconds for a sighting's weight to halve
+HISTORY_TTL = 30 * 24 * 3600.0    # sightings older than this are forgotten
+HISTORY_MAX_HOSTS = 65536         # per network, most recently seen kept
+
+SCORE_GATEWAY = 100.0
+SCORE_NEIGHBOR_FRESH = 80.0
+SCORE_NEIGHBOR = 40.0
+SCORE_SEEN = 70.0                 # a sighting just now; decays with HISTORY_HALF_LIFE
+SCORE_PER_SIGHTING = 3.0          # per time seen, up to SIGHTINGS_CAP
+SIGHTINGS_CAP = 10
+SCORE_INFRA = 15.0                # first / last two hosts: routers, APs, DNS
+
+_NEIGHBOR_FRESH = ("reachable", "delay", "probe", "permanent")
+_NEIGHBOR_DEAD = ("failed", "incomplete")
+
+class HostHistory:
+    """On-disk liveness history: network -> {"hosts": {ip: [last_seen, times_seen]}, "cursor": ip|None}."""
+
+    def __init__(self, path=DEFAULT_HISTORY_PATH):
+        self.path = path
+        self.networks = self._read()
+        self._dirty = set()
+
+    def _read(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _entry(self, network):
+        return self.networks.setdefault(str(network), {"hosts": {}, "cursor": None})
+
+    def hosts(self, network):
+        return self.networks.get(str(network), {}).get("hosts", {})
+
+    def cursor(self, network):
+        return self.networks.get(str(network), {}).get("cursor")
+
+    def set_cursor(self, network, ip):
+        self._entry(network)["cursor"] = ip
+        self._dirty.add(str(network))
+
+    def record(self, network, alive, when=None):
+        """Count one sighting for every ip in `alive`; forget hosts unseen for HISTORY_TTL."""
+        when = when or time.time()
+        hosts = self._entry(network)["hosts"]
+        for ip in alive:
+            seen = hosts.get(ip)
+            hosts[ip] = [when, (seen[1] if seen else 0) + 1]
+        for ip in [ip for ip, (last, _n) in hosts.items() if when - last > HISTORY_TTL]:
+            del hosts[ip]
+        if len(hosts) > HISTORY_MAX_HOSTS:
+            keep = sorted(hosts.items(), key=lambda kv: kv[1][0], reverse=True)[:HISTORY_MAX_HOSTS]
+            self._entry(network)["hosts"] = dict(keep)
+        self._dirty.add(str(network))
+
+    def save(self):
+        """Write the networks changed here over the current file (other networks are left as they are)."""
+        if not self._dirty:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path + ".lock", "a+") as lock:
+                if fcntl is not None:
+                    fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+                merged = self._read()
+                for network in self._dirty:
+                    merged[network] = self.networks[network]
+                tmp_path = self.path + ".tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(merged, f, separators=(",", ":"))
+                os.replace(tmp_path, self.path)
+            self._dirty.clear()
+        except OSError as e:
+            print(f"[!] Could not save scan history: {e}")
+
+class Prioritizer:
+    """Scores the addresses of one network and splits them into a hot list and a cold sweep."""
+
+    def __init__(self, network_cidr, history=None, gateway=None, neighbors=None, now=None):
+        self.net = ipaddress.IPv4Network(str(network_cidr), strict=False)
+        self.network = str(self.net)
+        self.history = history
+        self.now = now or time.time()
+        self.scores = {}
+        first, last = host_bounds(self.net)
+        infra = {first, first + 1, last, last - 1} if last - first >= 3 else set(range(first, last + 1))
+        for value in infra:
+            self._add(str(ipaddress.IPv4Address(value)), SCORE_INFRA)
+        if gateway:
+            self._add(gateway, SCORE_GATEWAY)
+        for ip, entry in (neighbors or {}).items():
+            state = entry.get("state") if isinstance(entry, dict) else None
+            if state in _NEIGHBOR_DEAD:
+                continue
+            self._add(ip, SCORE_NEIGHBOR_FRESH if state in _NEIGHBOR_FRESH else SCORE_NEIGHBOR)
+        if history is not None:
+            for ip, (last_seen, times) in history.hosts(self.network).items():
+                age = max(0.0, self.now - last_seen)
+                self._add(ip, SCORE_SEEN * 0.5 ** (age / HISTORY_HALF_LIFE)
+                          + SCORE_PER_SIGHTING * min(times, SIGHTINGS_CAP))
+
+    def _add(self, ip, points):
+        try:
+            if ipaddress.IPv4Address(ip) not in self.net:
+                return
+        except ValueError:
+            return
+        self.scores[ip] = self.scores.get(ip, 0.0) + points
+
+    def score(self, ip):
+        return self.scores.get(ip, 0.0)
+
+    def hot(self):
+        """Scored addresses, best first (ties in address order)."""
+        return sorted(self.scores, key=lambda ip: (-self.scores[ip], ipaddress.IPv4Address(ip)))
+
+    def is_hot(self, ip):
+        return ip in self.scores
+
+    def cold_start(self):
+        """Address the cold sweep starts from (where the last cut-short scan stopped), or None."""
+        cursor = self.history.cursor(self.network) if self.history is not None else None
+        try:
+            return cursor if cursor and ipaddress.IPv4Address(cursor) in self.net else None
+        except ValueError:
+            return None
+
+    def next_cursor(self, coverage):
+        """
+        Where the next cold sweep should start given this scan's `coverage`
+        (deadline.Coverage): just past the furthest cold address covered, counting
+        from the current start. None when the sweep was not cut short.
+        """
+        if coverage is None or not coverage.stopped:
+            return None
+        first, last = host_bounds(self.net)
+        size = last - first + 1
+        start = self.cold_start()
+        start = int(ipaddress.IPv4Address(start)) if start else first
+        best = None
+        for lo, hi in coverage.spans():
+            # spans made only of hot addresses were probed before the cold sweep began
+            if hi - lo < len(self.scores) and all(str(ipaddress.IPv4Address(v)) in self.scores for v in range(lo, hi + 1)):
+                continue
+            offset = (min(hi, last) - start) % size
+            if best is None or offset > best:
+                best = offset
+        if best is None:
+            return self.cold_start()
+        return str(ipaddress.IPv4Address(first + (start - first + best + 1) % size))
+
+    def finish(self, alive, coverage=None, save=True):
+        """Record this scan's live hosts and cold-sweep progress in the history (and save it)."""
+        if self.history is None:
+            return
+        self.history.record(self.network, alive, when=time.time())
+        self.history.set_cursor(self.network, self.next_cursor(coverage))
+        if save:
+            self.history.save()
+
+def host_bounds(net):
+    """(first, last) usable host address of `net` as ints (the whole range for /31 and /32)."""
+    lo, hi = int(net.network_address), int(net.broadcast_address)
+    if net.prefixlen < 31:
+        lo, hi = lo + 1, hi - 1
+    return lo, hi
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        sys.exit("usage: python priority.py <network_cidr> [gateway]")
+    prio = Prioritizer(sys.argv[1], history=HostHistory(), gateway=sys.argv[2] if len(sys.argv) > 2 else None)
+    print(json.dumps({"cold_start": prio.cold_start(), "hot": [[ip, round(prio.score(ip), 1)] for ip in prio.hot()]}, indent=2))
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+rate_limit.py
+
+Token-bucket packet-rate scheduler shared by every probe type of a scan
+(ARP, ICMP, TCP SYN via connect(), UDP).
+
+  max_rate  packets/second ceiling (None = unlimited, the bucket is a no-op)
+  burst     bucket capacity: how many packets may leave back-to-back
+  min_rate  floor for congestion back-off
+
+Senders call take() (threads) or await take_async() (asyncio) before each
+packet. Callers reserve tokens under a lock and sleep outside it, so many
+threads share one rate fairly. When a sender sees local congestion
+(ENOBUFS / EAGAIN from the kernel) it calls congestion(): the current rate
+halves, but never below min_rate, then climbs back towards max_rate by a
+small step on every packet.
+
+Usage:
+  from rate_limit import RateScheduler
+  pacer = RateScheduler(max_rate=2000, burst=64)
+  pacer.take()           # blocks until one packet may be sent
+"""
+
+import threading
+import time
+
+class RateScheduler:
+    """Thread-safe token bucket with AIMD back-off between min_rate and max_rate."""
+
+    def __init__(self, max_rate=None, min_rate=None, burst=None):
+        self.max_rate = float(max_rate) if max_rate else None
+        self.min_rate = float(min_rate) if min_rate else None
+        if self.max_rate and self.min_rate and self.min_rate > self.max_rate:
+            self.min_rate = self.max_rate
+        if burst is None and self.max_rate:
+            burst = max(1, int(self.max_rate / 20))  # ~50 ms worth of packets
+        self.burst = max(1, int(burst or 1))
+        self.rate = self.max_rate
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.sent = 0
+        self._lock = threading.Lock()
+
+    @property
+    def limited(self):
+        return self.rate is not None
+
+    def interval(self):
+        """Seconds between packets at the current rate (0.0 if unlimited)."""
+        return 1.0 / self.rate if self.rate else 0.0
+
+    def reserve(self, n=1):
+        """Reserve n tokens and return how long the caller must wait before sending."""
+        with self._lock:
+            self.sent += n
+            if not self.rate:
+                return 0.0
+            now = time.monotonic()
+            self.tokens = min(float(self.burst), self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= n
+            # additive increase back towards max_rate after a back-off
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + n * max(1.0, self.max_rate / 1000))
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def take(self, n=1):
+        """Block until n packets may be sent."""
+        wait = self.reserve(n)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def take_async(self, n=1):
+        """asyncio variant of take()."""
+        import asyncio  # only asyncio discovery awaits; keep it out of the import path otherwise
+        wait = self.reserve(n)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def congestion(self):
+        """Multiplicative decrease after a local send failure (ENOBUFS etc.)."""
+        with self._lock:
+            if not self.rate:
+                return
+            floor = self.min_rate or 1.0
+            self.rate = max(floor, self.rate / 2)
+
+    def snapshot(self):
+        """JSON-friendly summary for logs."""
+        with self._lock:
+            return {"rate": self.rate, "max_rate": self.max_rate, "min_rate": self.min_rate,
+                    "burst": self.burst, "sent": self.sent}
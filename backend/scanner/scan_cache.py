@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+scan_cache.py
+
+Freshness-bounded scan result cache with cross-process single-flight.
+
+Results are stored per key - network, interface and scan options - as one JSON
+file each under $SCAN_CACHE_DIR (default ~/.cache/nvt-scans). While a scan runs
+it holds an exclusive lock on its key; another scanner process started for the
+same key blocks on that lock and then returns the result the first one stored
+instead of sweeping the same network a second time.
+
+Usage:
+  from scan_cache import ScanCache, cache_key
+  cache = ScanCache()
+  key = cache_key(network="192.168.1.0/24", iface="eth0", no_arp=False)
+  ok, payload, source, age = cache.run(key, scan, max_age=30)
+  # source: "cache" (younger than max_age), "joined" (finished by a concurrent scan) or "scan"
+  # scan() must return (ok, payload); only successful payloads are stored
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, the cache still works
+    fcntl = None
+
+DEFAULT_CACHE_DIR = os.environ.get("SCAN_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "nvt-scans")
+LOCK_POLL = 0.1  # seconds between attempts when lock() has a timeout
+
+def cache_key(**parts):
+    """Stable key for a scan target + options (None values are kept: None means auto)."""
+    raw = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:20]
+
+class ScanCache:
+    def __init__(self, directory=DEFAULT_CACHE_DIR):
+        self.directory = directory
+
+    def _path(self, key, suffix):
+        return os.path.join(self.directory, key + suffix)
+
+    def get(self, key, max_age=None, since=None):
+        """
+        (payload, age_seconds) for `key` if one is stored, no older than `max_age`
+        seconds and stored at or after the `since` timestamp; otherwise None.
+        """
+        try:
+            with open(self._path(key, ".json"), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        stored_at = entry.get("stored_at", 0)
+        age = max(0.0, time.time() - stored_at)
+        if max_age is not None and age > max_age:
+            return None
+        if since is not None and stored_at < since:
+            return None
+        return entry.get("payload"), age
+
+    def put(self, key, payload):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = self._path(key, ".json.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"stored_at": time.time(), "payload": payload}, f)
+            os.replace(tmp_path, self._path(key, ".json"))
+        except OSError:
+            pass
+
+    @contextlib.contextmanager
+    def lock(self, key, timeout=None):
+        """
+        Exclusive per-key lock shared by every process using the same cache directory.
+        With `timeout` (seconds) it gives up waiting after that long and yields False
+        (the caller proceeds unlocked); otherwise it yields True once held.
+        """
+        if fcntl is None:
+            yield True
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            f = open(self._path(key, ".lock"), "a+")
+        except OSError:
+            yield True
+            return
+        with f:
+            if timeout is None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            else:
+                give_up = time.monotonic() + timeout
+                while True:
+                    try:
+                        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        break
+                    except OSError:
+                        if time.monotonic() >= give_up:
+                            yield False
+                            return
+                        time.sleep(LOCK_POLL)
+            try:
+                yield True
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def run(self, key, scan, max_age=0, wait=None):
+        """
+        Serve `key` from the cache when it is at most `max_age` seconds old, join a
+        scan of the same key already running in another process, or call scan().
+        `wait` caps how long (seconds) to wait for that other scan before scanning anyway.
+        Partial payloads ({"partial": true}, cut short by a deadline) are not stored.
+        Returns (ok, payload, source, age).
+        """
+        if max_age:
+            hit = self.get(key, max_age=max_age)
+            if hit is not None:
+                return True, hit[0], "cache", hit[1]
+        asked_at = time.time()
+        with self.lock(key, timeout=wait):
+            hit = self.get(key, since=asked_at)
+            if hit is not None:
+                return True, hit[0], "joined", hit[1]
+            ok, payload = scan()
+            if ok and not payload.get("partial"):
+                self.put(key, payload)
+            return ok, payload, "scan", 0.0
@@ -3,20 +3,36 @@
 scan_to_json.py
 
 Wrapper around network_scanner_safe.py that prints exactly one JSON object to stdout.
-All scanner debug/human prints are captured and sent to stderr (so stdout remains pure JSON).
+All scanner debug/human prints go straight to stderr (so stdout remains pure JSON).
+
+With --stream, stdout is NDJSON instead: one line per event, flushed immediately.
+  {"type": "phase", "phase": "neighbors"|"arp"|"discovery", "status": "start"|"done", ...}
+  {"type": "device", "device": {...}}        as soon as each device is confirmed
+  {"type": "summary", "ok": true, "results": {"network": ..., "devices": [...]}}
+The summary line carries the same payload as the non-streaming output.
 
 Usage:
   python scan_to_json.py --auto --json
   python scan_to_json.py --network 192.168.1.0/24 --json
   python scan_to_json.py --no-arp --json
+  python scan_to_json.py --auto --stream
+  python scan_to_json.py --auto --import-profile   # per-module import cost on stderr after the scan
+  python scan_to_json.py --auto --max-age 30       # reuse a result at most 30 s old
+  python scan_to_json.py --auto --deadline 60      # return within 60 s, "partial": true if cut short
+
+Runs for the same network/interface/options never sweep in parallel: a second run
+waits for the one in progress and prints its result (see scan_cache.py). Results
+served that way, or from --max-age, carry "cached": {"source": "cache"|"joined", "age": s}.
 """
 
 import argparse
+import atexit
+import ipaddress
 import json
 import os
 import sys
+import time
 import traceback
-import io
 import contextlib
 
 # Ensure this script can import network_scanner_safe when run from anywhere.
@@ -27,11 +43,23 @@ if SCRIPT_DIR not in sys.path:
 try:
     from network_scanner_cli import (
         auto_select_iface_and_network,
+        default_gateway,
         arp_scan,
         ping_sweep,
         merge_and_dedupe,
         safe_vendor_lookup,
+        SWEEP_CHUNK,
+        netifaces,
     )
+    if not netifaces.available():
+        raise ImportError("netifaces required. Install with: pip install netifaces")
+    from timing import TIMING_TEMPLATES, DEFAULT_TIMING
+    from deadline import Deadline, Coverage, Phase, plan
+    from target_set import TargetSet
+    from priority import HostHistory, Prioritizer
+    from neighbors import read_neighbors, fresh, macs_for
+    from scan_cache import ScanCache, cache_key
+    from lazy_import import print_import_profile
 except Exception as e:
     # Can't import scanner module — print JSON error to stdout (so callers can parse)
     err = {"ok": False, "results": {"error": "Could not import network_scanner_safe", "detail": str(e)}}
@@ -39,41 +67,70 @@ except Exception as e:
     sys.exit(2)
 
 
+def build_device(mac, ips):
+    """
+    One JSON-serializable device object, built through the same HostStore as the
+    final summary so streamed records and build_results() always agree.
+    """
+    if mac:
+        store = merge_and_dedupe({ip: mac for ip in ips}, [])
+    else:
+        store = merge_and_dedupe({}, ips)
+    return build_results(store)[0]
+
+
 def build_results(mac_map):
-    """Turn the OrderedDict/mac_map into a JSON-serializable list of device objects."""
-    devices = []
-    for entry in mac_map.values():
-        mac = entry.get("mac")
-        ips = sorted(list(entry.get("ips", [])))
-        if mac:
-            vendor = safe_vendor_lookup(mac)
-            mobile = any(k in vendor.lower() for k in [
-                "apple", "samsung", "xiaomi", "huawei", "oneplus", "pixel", "realme", "vivo"
-            ])
-            devices.append({
-                "ips": ips,
-                "mac": mac,
-                "vendor": vendor,
-                "mobile": bool(mobile)
-            })
-        else:
-            devices.append({
-                "ips": ips,
-                "mac": None,
-                "vendor": "Unknown (ping-only)",
-                "mobile": False
-            })
-    return devices
-
-
-def run_scan(network_cidr=None, no_arp=False):
+    """Turn the HostStore from merge_and_dedupe into a JSON-serializable list of device objects."""
+    return [{"ips": d["ips"], "mac": d["mac"], "vendor": d["vendor"], "mobile": d["mobile"]} for d in mac_map.to_json()]
+
+
+class StreamWriter:
+    """Write NDJSON records to the real stdout, one flushed line each."""
+
+    def __init__(self, out):
+        self.out = out
+
+    def emit(self, record):
+        self.out.write(json.dumps(record) + "\n")
+        self.out.flush()
+
+    def phase(self, phase, status, **extra):
+        self.emit({"type": "phase", "phase": phase, "status": status, **extra})
+
+    def device(self, device):
+        self.emit({"type": "device", "device": device})
+
+
+# Rough per-phase cost model for --deadline planning (seconds / relative value per host).
+ARP_TIMEOUT = 2
+ARP_SEND_COST = 0.00005      # per request frame
+ARP_HOST_VALUE = 1.0         # liveness + MAC (and so vendor)
+DISCOVERY_HOST_VALUE = 0.5   # liveness only
+DISCOVERY_WORKERS = 200      # ping_sweep's default max_workers
+
+
+def _discovery_cost(hosts):
+    """Expected ping_sweep time for `hosts` mostly-silent addresses under the default timing template."""
+    template = TIMING_TEMPLATES[DEFAULT_TIMING]
+    wait = template["initial_timeout"]
+    udp = max(template["udp_min"], wait)
+    chunks = -(-hosts // SWEEP_CHUNK)
+    return chunks * (wait * (template["retries"] + 1) + udp) + hosts * wait / DISCOVERY_WORKERS
+
+
+def run_scan(network_cidr=None, no_arp=False, stream=None, iface=None, deadline=None):
     """
-    Run the scanner functions but capture their stdout so only JSON is printed to stdout.
+    Run the scanner functions with their stdout sent to stderr so only JSON is printed to stdout.
+    If `stream` (StreamWriter) is given, phase and device records are emitted as the scan runs.
+    `iface` skips interface detection when the caller already knows it (scanner_daemon.py).
+    `deadline` (seconds, or a deadline.Deadline) bounds the scan: phases run in order of
+    value per second, none starts a probe it cannot wait out, and the payload gains
+    "partial" plus the phases / address ranges that were completed (see deadline.py).
     Return (True, payload) on success, (False, error_obj) on failure.
     """
+    deadline = Deadline.of(deadline)
     try:
         # Auto-detect network & iface if not provided
-        iface = None
         ip = None
         netmask = None
         if not network_cidr:
@@ -85,38 +142,112 @@ def run_scan(network_cidr=None, no_arp=False):
         # Print the chosen interface to stderr (so it appears in logs but not in stdout JSON)
         print(f"[*] Using interface {iface} for ARP scan", file=sys.stderr)
 
-        # Capture any prints from arp_scan / ping_sweep (they print human-friendly logs).
         arp_map = {}
         ping_list = []
+        emitted = set()
+        status = {}    # phase -> "done" | "partial" | "skipped"
+        coverage = {}  # phase -> Coverage
 
-        # Use a StringIO buffer and redirect stdout while calling scanner functions.
-        buf = io.StringIO()
-        with contextlib.redirect_stdout(buf):
-            if not no_arp:
+        def on_alive(ip, _detail):
+            if stream is not None and ip not in emitted:
+                emitted.add(ip)
+                stream.device(build_device(arp_map.get(ip), [ip]))
+
+        # arp_scan / ping_sweep print human-friendly logs; send them straight to stderr.
+        with contextlib.redirect_stdout(sys.stderr):
+            # Hosts the kernel resolved moments ago are reported at once, skip ARP and are pinged first.
+            # Reading the table sends nothing, so it always runs first.
+            neighbors = read_neighbors(network_cidr)
+            recent = fresh(neighbors)
+            if stream is not None:
+                stream.phase("neighbors", "start")
+            for ip, entry in recent.items():
+                arp_map[ip] = entry["mac"]
+                if stream is not None:
+                    emitted.add(ip)
+                    stream.device(build_device(entry["mac"], [ip]))
+            status["neighbors"] = "done"
+            if stream is not None:
+                stream.phase("neighbors", "done", found=len(recent), entries=len(neighbors))
+
+            # Likely-alive addresses (gateway, neighbours, past sightings) are pinged first (see priority.py).
+            prio = Prioritizer(network_cidr, history=HostHistory(), gateway=default_gateway()[0], neighbors=neighbors)
+
+            def arp_phase(cov, budget):
+                def on_arp(ip, mac):
+                    arp_map[ip] = mac
+                    if stream is not None:
+                        emitted.add(ip)
+                        stream.device(build_device(mac, [ip]))
+
+                cov.update(recent)  # already resolved, so not asked again
                 try:
                     # Pass the detected iface to arp_scan to help Scapy bind on Windows.
-                    arp_map = arp_scan(network_cidr, iface=iface, timeout=2)
+                    arp_map.update(arp_scan(network_cidr, iface=iface, timeout=ARP_TIMEOUT, on_reply=on_arp,
+                                            exclude=TargetSet.of(recent), deadline=budget, coverage=cov))
+                except Exception as e:
+                    # Keep the replies collected so far and continue
+                    print(f"[!] ARP scan error: {e}")
+                    return None
+                return len(arp_map)
+
+            def discovery_phase(cov, budget):
+                nonlocal ping_list
+                try:
+                    ping_list = ping_sweep(network_cidr, on_alive=on_alive, first=prio.hot(), start=prio.cold_start(),
+                                           hot=prio.is_hot, max_workers=DISCOVERY_WORKERS, deadline=budget, coverage=cov)
                 except Exception as e:
-                    # Keep arp_map empty and continue; capture exception into stderr after redirect
-                    pass
+                    print(f"[!] Host discovery error: {e}")
+                    ping_list = []
+                    return None
+                return len(ping_list)
+
+            hosts = ipaddress.IPv4Network(network_cidr, strict=False).num_addresses
+            phases = []
+            if not no_arp:
+                phases.append(Phase("arp", ARP_TIMEOUT + hosts * ARP_SEND_COST, hosts * ARP_HOST_VALUE, arp_phase))
+            phases.append(Phase("discovery", _discovery_cost(hosts), hosts * DISCOVERY_HOST_VALUE, discovery_phase))
 
-            try:
-                ping_list = ping_sweep(network_cidr)
-            except Exception:
-                ping_list = []
+            planned = plan(phases, deadline)
+            for i, phase in enumerate(planned):
+                started = time.monotonic()
+                cov = coverage[phase.name] = Coverage()
+                if stream is not None:
+                    stream.phase(phase.name, "start")
+                # keep the estimated time of the phases still to come (or their share of what is left)
+                found = phase.run(cov, deadline.share(phase.cost, sum(p.cost for p in planned[i + 1:])))
+                if found is None:
+                    status[phase.name] = "failed"
+                elif not cov.stopped:
+                    status[phase.name] = "done"
+                else:
+                    status[phase.name] = "partial" if cov.count else "skipped"
+                    print(f"[!] Deadline: {phase.name} {status[phase.name]} after {deadline.elapsed():.1f}s "
+                          f"({cov.count} addresses covered)")
+                if stream is not None:
+                    extra = {} if status[phase.name] == "done" else {"result": status[phase.name], "covered": cov.ranges()}
+                    stream.phase(phase.name, "done", found=found or 0, elapsed=round(time.monotonic() - started, 3), **extra)
 
-        # Any captured text from scanner functions is in buf.getvalue(); send it to stderr for diagnostics
-        captured = buf.getvalue()
-        if captured:
-            # print captured debugging lines to stderr so backend logs can show them
-            for line in captured.splitlines():
-                print(line, file=sys.stderr)
+            prio.finish(set(arp_map) | set(ping_list), coverage=coverage.get("discovery"))
+
+        # Pinging made the kernel resolve MACs for hosts ARP missed (or could not run for)
+        for ip, mac in macs_for(ping_list, read_neighbors(network_cidr)).items():
+            arp_map.setdefault(ip, mac)
 
         # Merge results and convert to JSON-serializable structures
         mac_map = merge_and_dedupe(arp_map, ping_list)
         devices = build_results(mac_map)
 
-        return True, {"network": network_cidr, "devices": devices}
+        payload = {"network": network_cidr, "devices": devices}
+        if deadline.limited:
+            payload["partial"] = any(v in ("partial", "skipped") for v in status.values())
+            payload["completed"] = {
+                "phases": [name for name, v in status.items() if v == "done"],
+                "ranges": {name: cov.ranges() for name, cov in coverage.items()},
+            }
+            payload["phases"] = status
+            payload["elapsed"] = round(deadline.elapsed(), 3)
+        return True, payload
 
     except Exception as e:
         tb = traceback.format_exc()
@@ -130,17 +261,53 @@ def main():
     ap.add_argument("--no-arp", action="store_true", help="skip ARP (ping-only)")
     # --json exists for CLI familiarity; output is JSON-only by design
     ap.add_argument("--json", action="store_true", help="print JSON only (default behavior)")
+    ap.add_argument("--stream", action="store_true", help="print NDJSON: one line per device/phase as found, then a summary line")
+    ap.add_argument("--max-age", type=float, default=0, metavar="SECONDS",
+                    help="return the last result for this network/options if it is at most SECONDS old instead of scanning")
+    ap.add_argument("--deadline", type=float, default=None, metavar="SECONDS",
+                    help="finish within SECONDS: stop starting probes in time and return what was found (marked partial)")
+    ap.add_argument("--import-profile", action="store_true", help="print how long each module import took (to stderr) on exit")
     args = ap.parse_args()
 
+    if args.import_profile:
+        atexit.register(print_import_profile)
+
+    # the budget starts now, so detection and waiting on a concurrent scan count against it
+    deadline = Deadline(args.deadline)
+
     # Determine network_cidr: explicit overrides auto
     network_cidr = args.network if args.network else None
-    if args.auto and not network_cidr:
-        network_cidr = None  # run_scan will auto-detect
+    iface = None
+    if not network_cidr:
+        # resolved here (not in run_scan) so the cache key names the real network
+        with contextlib.redirect_stdout(sys.stderr):
+            iface, _ip, _netmask, network_cidr = auto_select_iface_and_network()
+
+    stream = StreamWriter(sys.stdout) if args.stream else None
+    cache = ScanCache()
+    key = cache_key(network=network_cidr, iface=iface, no_arp=bool(args.no_arp))
+    # concurrent runs for the same key wait for the one already scanning and share its result;
+    # under a deadline at most half the budget goes to waiting, the rest is left to scan ourselves
+    success, payload, source, age = cache.run(
+        key, lambda: run_scan(network_cidr=network_cidr, no_arp=args.no_arp, stream=stream, iface=iface, deadline=deadline),
+        max_age=args.max_age if network_cidr else 0,
+        wait=deadline.remaining() / 2 if deadline.limited else None)
+    cached = {"source": source, "age": round(age, 3)} if source != "scan" else None
 
-    success, payload = run_scan(network_cidr=network_cidr, no_arp=args.no_arp)
+    if stream is not None:
+        if cached:
+            for device in payload.get("devices", []):
+                stream.device(device)
+        summary = {"type": "summary", "ok": success, "results": payload}
+        if cached:
+            summary["cached"] = cached
+        stream.emit(summary)
+        sys.exit(0 if success else 1)
 
     if success:
         out = {"ok": True, "results": payload}
+        if cached:
+            out["cached"] = cached
         # stdout contains ONLY JSON
         print(json.dumps(out))
         sys.exit(0)
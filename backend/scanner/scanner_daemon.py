@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+"""
+scanner_daemon.py
+
+Resident scanner: one Python process that keeps the scan engine warm and serves
+scan requests over a Unix domain socket, instead of a new interpreter per scan.
+
+Protocol: newline-delimited JSON-RPC 2.0, one object per line in each direction.
+  {"jsonrpc": "2.0", "id": 1, "method": "scan", "params": {"network": "192.168.1.0/24", "no_arp": false, "stream": true, "max_age": 30}}
+  {"jsonrpc": "2.0", "id": 2, "method": "status"}
+  {"jsonrpc": "2.0", "id": 3, "method": "cancel", "params": {"scan_id": 4}}
+  {"jsonrpc": "2.0", "id": 4, "method": "subscribe"}
+
+  scan       run a scan and reply with {"scan_id", "network", "devices"} (the same
+             payload as scan_to_json.py). A request matching a queued or running
+             scan (same network / no_arp) joins it instead of scanning twice.
+             With "stream": true the scan's phase/device records are sent first as
+             {"method": "scan.event", "params": {"scan_id": ..., "network": ..., <record>}} notifications.
+             With "max_age": N a result at most N seconds old is returned at once
+             (marked "cached": {"source": "cache", "age": ...}) instead of scanning.
+             With "deadline": N the reply comes within about N seconds of the request,
+             marked "partial": true if the scan had to be cut (see deadline.py); a
+             joined scan ends at the earliest deadline of its callers.
+  status     engine state: running/queued scans, the cached interface and the most
+             recent device table per network ("network" param: include its devices).
+  cancel     cancel a scan; it stops at its next phase/device record and every
+             caller waiting on it gets a "scan cancelled" error.
+  subscribe  turn the connection into a feed of scan.event notifications for all scans.
+
+Warm state kept between calls: the auto-detected interface/network (refreshed
+every IFACE_TTL seconds), the vendor lookup cache in network_scanner_cli and the
+last device table per network.
+
+Usage:
+  python scanner_daemon.py                       # listens on $SCANNER_SOCKET or /tmp/nvt-scanner.sock
+  python scanner_daemon.py --socket /run/nvt/scanner.sock
+"""
+
+import argparse
+import ipaddress
+import itertools
+import json
+import os
+import queue
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+if SCRIPT_DIR not in sys.path:
+    sys.path.insert(0, SCRIPT_DIR)
+
+from scan_to_json import StreamWriter, run_scan
+from deadline import Deadline
+from network_scanner_cli import auto_select_iface_and_network
+
+DEFAULT_SOCKET = os.environ.get("SCANNER_SOCKET") or "/tmp/nvt-scanner.sock"
+IFACE_TTL = 60.0
+RECENT_LIMIT = 8
+
+# JSON-RPC error codes (-32000..-32099 are free for the application)
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+SCAN_FAILED = -32000
+SCAN_CANCELLED = -32001
+
+class RpcError(Exception):
+    def __init__(self, code, message, data=None):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.data = data
+
+class ScanCancelled(Exception):
+    pass
+
+# ---------- Scan jobs ----------
+class ScanJob:
+    """One scan: shared by every request that asked for the same network while it was pending."""
+
+    def __init__(self, scan_id, network, no_arp, deadline=None):
+        self.id = scan_id
+        self.network = network
+        self.no_arp = no_arp
+        self.deadline = Deadline(deadline)  # counts from submission, so queueing time is included
+        self.target = network  # resolved network once auto-detect has run
+        self.state = "queued"
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.cancelled = False
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+    def summary(self):
+        return {"scan_id": self.id, "network": self.network, "no_arp": self.no_arp, "state": self.state,
+                "created": self.created, "started": self.started, "finished": self.finished}
+
+class JobStream(StreamWriter):
+    """StreamWriter that publishes records to subscribers and aborts cancelled scans."""
+
+    def __init__(self, job, hub):
+        super().__init__(None)
+        self.job = job
+        self.hub = hub
+
+    def emit(self, record):
+        if self.job.cancelled:
+            raise ScanCancelled()
+        self.hub.publish({"scan_id": self.job.id, "network": self.job.target, **record})
+
+class Hub:
+    """Fan-out of scan.event notifications to subscriber queues."""
+
+    def __init__(self):
+        self.subscribers = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, scan_id=None):
+        q = queue.Queue()
+        with self._lock:
+            self.subscribers.append((scan_id, q))
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self.subscribers = [(sid, sq) for sid, sq in self.subscribers if sq is not q]
+
+    def publish(self, event):
+        with self._lock:
+            targets = [q for sid, q in self.subscribers if sid is None or sid == event.get("scan_id")]
+        for q in targets:
+            q.put(event)
+
+# ---------- Engine ----------
+class ScanEngine:
+    """Runs scans one at a time on a worker thread and keeps warm state between them."""
+
+    def __init__(self):
+        self.hub = Hub()
+        self.jobs = OrderedDict()          # scan_id -> ScanJob (queued/running)
+        self.recent = OrderedDict()        # network -> {"scan_id", "finished", "devices"}
+        self.iface = None                  # (iface, ip, netmask, network) from auto-detect
+        self.iface_at = 0.0
+        self.started = time.time()
+        self.scans_run = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        threading.Thread(target=self._worker, name="scan-engine", daemon=True).start()
+
+    def detect(self):
+        """Cached auto_select_iface_and_network(); re-detected after IFACE_TTL seconds."""
+        with self._lock:
+            if self.iface is None or not self.iface[3] or time.monotonic() - self.iface_at > IFACE_TTL:
+                self.iface = auto_select_iface_and_network()
+                self.iface_at = time.monotonic()
+            return self.iface
+
+    def submit(self, network=None, no_arp=False, deadline=None):
+        """Queue a scan, or return the pending one for the same target (pulling its deadline in if needed)."""
+        with self._lock:
+            for job in self.jobs.values():
+                if job.network == network and job.no_arp == no_arp and not job.cancelled:
+                    if deadline is not None:
+                        job.deadline.tighten(deadline)
+                    return job
+            job = ScanJob(next(self._ids), network, no_arp, deadline)
+            self.jobs[job.id] = job
+        self._queue.put(job)
+        return job
+
+    def cached(self, network=None, no_arp=False, max_age=0):
+        """The last result for this target/options if it finished at most `max_age` seconds ago, else None."""
+        if not network:
+            network = self.detect()[3]
+        with self._lock:
+            entry = self.recent.get(network)
+        if entry is None or entry["no_arp"] != no_arp:
+            return None
+        age = time.time() - entry["finished"]
+        if age > max_age:
+            return None
+        return {"scan_id": entry["scan_id"], "network": network, "devices": entry["devices"],
+                "cached": {"source": "cache", "age": round(age, 3)}}
+
+    def cancel(self, scan_id):
+        with self._lock:
+            job = self.jobs.get(scan_id)
+        if job is None:
+            return False
+        job.cancelled = True
+        job.error = RpcError(SCAN_CANCELLED, "scan cancelled")
+        job.done.set()  # release waiters now; the worker stops at the scan's next record
+        return True
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            if not job.cancelled:
+                self._run(job)
+            with self._lock:
+                self.jobs.pop(job.id, None)
+            job.state = "cancelled" if job.cancelled else job.state
+            job.finished = job.finished or time.time()
+            self.hub.publish({"scan_id": job.id, "type": "done", "state": job.state})
+            job.done.set()
+
+    def _run(self, job):
+        job.state = "running"
+        job.started = time.time()
+        iface = None
+        network = job.network
+        if not network:
+            iface, _ip, _netmask, network = self.detect()
+        elif self.iface and self.iface[3] == network:
+            iface = self.iface[0]
+        job.target = network
+        try:
+            ok, payload = run_scan(network_cidr=network, no_arp=job.no_arp, stream=JobStream(job, self.hub), iface=iface,
+                                   deadline=job.deadline)
+        except Exception as e:
+            ok, payload = False, {"error": "Unhandled exception during scan", "detail": str(e)}
+        job.finished = time.time()
+        if job.cancelled:
+            return
+        self.scans_run += 1
+        if not ok:
+            job.state = "failed"
+            job.error = RpcError(SCAN_FAILED, payload.get("error", "scan failed"), payload)
+            return
+        job.state = "done"
+        job.result = {"scan_id": job.id, **payload}
+        if payload.get("partial"):
+            return  # cut short by a deadline: not a result to serve as the network's latest table
+        with self._lock:
+            self.recent[payload["network"]] = {"scan_id": job.id, "finished": job.finished, "no_arp": job.no_arp,
+                                               "devices": payload["devices"]}
+            self.recent.move_to_end(payload["network"])
+            while len(self.recent) > RECENT_LIMIT:
+                self.recent.popitem(last=False)
+
+    def status(self, network=None):
+        with self._lock:
+            jobs = [job.summary() for job in self.jobs.values()]
+            recent = {net: {"scan_id": r["scan_id"], "finished": r["finished"], "devices": len(r["devices"])}
+                      for net, r in self.recent.items()}
+            if network in self.recent:
+                recent[network]["devices"] = self.recent[network]["devices"]
+            iface = self.iface
+        return {"uptime": round(time.time() - self.started, 3), "scans_run": self.scans_run, "jobs": jobs,
+                "interface": dict(zip(("iface", "ip", "netmask", "network"), iface)) if iface else None,
+                "recent": recent}
+
+# ---------- JSON-RPC server ----------
+def _params_network(params):
+    network = params.get("network")
+    if network is None:
+        return None
+    try:
+        return str(ipaddress.IPv4Network(str(network), strict=False))
+    except Exception:
+        raise RpcError(INVALID_PARAMS, f"invalid network: {network!r}")
+
+class RpcHandler(socketserver.StreamRequestHandler):
+    """One client connection: any number of requests, one per line."""
+
+    def send(self, obj):
+        self.wfile.write((json.dumps(obj) + "\n").encode("utf-8"))
+        self.wfile.flush()
+
+    def handle(self):
+        engine = self.server.engine
+        for raw in self.rfile:
+            if not raw.strip():
+                continue
+            req_id = None
+            try:
+                try:
+                    req = json.loads(raw)
+                except ValueError:
+                    raise RpcError(PARSE_ERROR, "parse error")
+                if not isinstance(req, dict) or not isinstance(req.get("method"), str):
+                    raise RpcError(INVALID_REQUEST, "invalid request")
+                req_id = req.get("id")
+                params = req.get("params") or {}
+                if not isinstance(params, dict):
+                    raise RpcError(INVALID_PARAMS, "params must be an object")
+                method = req["method"]
+                if method == "subscribe":
+                    self.send({"jsonrpc": "2.0", "id": req_id, "result": {"subscribed": True}})
+                    self.feed(engine.hub.subscribe(params.get("scan_id")))
+                    return
+                if method == "scan":
+                    result = self.scan(engine, params, req_id)
+                elif method == "status":
+                    result = engine.status(_params_network(params))
+                elif method == "cancel":
+                    if not isinstance(params.get("scan_id"), int):
+                        raise RpcError(INVALID_PARAMS, "scan_id (int) required")
+                    result = {"cancelled": engine.cancel(params["scan_id"])}
+                else:
+                    raise RpcError(METHOD_NOT_FOUND, f"method not found: {method}")
+                self.send({"jsonrpc": "2.0", "id": req_id, "result": result})
+            except RpcError as e:
+                error = {"code": e.code, "message": e.message}
+                if e.data is not None:
+                    error["data"] = e.data
+                self.send({"jsonrpc": "2.0", "id": req_id, "error": error})
+            except (BrokenPipeError, ConnectionResetError):
+                return
+
+    def scan(self, engine, params, req_id):
+        network = _params_network(params)
+        max_age = params.get("max_age") or 0
+        if not isinstance(max_age, (int, float)) or max_age < 0:
+            raise RpcError(INVALID_PARAMS, "max_age must be a non-negative number of seconds")
+        deadline = params.get("deadline")
+        if deadline is not None and (not isinstance(deadline, (int, float)) or deadline <= 0):
+            raise RpcError(INVALID_PARAMS, "deadline must be a positive number of seconds")
+        if max_age:
+            hit = engine.cached(network, bool(params.get("no_arp")), max_age)
+            if hit is not None:
+                return hit
+        job = engine.submit(network=network, no_arp=bool(params.get("no_arp")), deadline=deadline)
+        if params.get("stream"):
+            events = engine.hub.subscribe(job.id)
+            try:
+                self.send({"jsonrpc": "2.0", "method": "scan.queued", "params": job.summary()})
+                while True:
+                    try:
+                        event = events.get(timeout=0.5)
+                    except queue.Empty:
+                        if job.done.is_set():  # cancelled, or finished before we subscribed
+                            break
+                        continue
+                    if event.get("type") == "done":
+                        break
+                    self.send({"jsonrpc": "2.0", "method": "scan.event", "params": event})
+            finally:
+                engine.hub.unsubscribe(events)
+        job.done.wait()
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    def feed(self, events):
+        """Forward hub events until the client disconnects."""
+        try:
+            while True:
+                try:
+                    event = events.get(timeout=5.0)
+                except queue.Empty:
+                    self.send({"jsonrpc": "2.0", "method": "ping", "params": {"time": time.time()}})
+                    continue
+                self.send({"jsonrpc": "2.0", "method": "scan.event", "params": event})
+        except (BrokenPipeError, ConnectionResetError, OSError):
+            pass
+        finally:
+            self.server.engine.hub.unsubscribe(events)
+
+class ScannerServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path, engine):
+        self.engine = engine
+        super().__init__(path, RpcHandler)
+
+def _remove_stale_socket(path):
+    """Remove a leftover socket file; refuse to start if another daemon is answering on it."""
+    if not os.path.exists(path):
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+        sys.exit(f"[!] A scanner daemon is already listening on {path}")
+    except OSError:
+        os.unlink(path)
+    finally:
+        probe.close()
+
+def main():
+    ap = argparse.ArgumentParser(description="Resident network scanner with a JSON-RPC Unix socket API")
+    ap.add_argument("--socket", default=DEFAULT_SOCKET, help="Unix socket path (default: $SCANNER_SOCKET or /tmp/nvt-scanner.sock)")
+    ap.add_argument("--mode", type=lambda v: int(v, 8), default=0o660, help="socket file permissions, octal (default: 660)")
+    args = ap.parse_args()
+
+    if not hasattr(socket, "AF_UNIX"):
+        sys.exit("[!] Unix domain sockets are not available on this platform; use scan_to_json.py instead.")
+
+    _remove_stale_socket(args.socket)
+    engine = ScanEngine()
+    # the socket file is born with at most --mode permissions: no window in which any
+    # local user (e.g. in /tmp) can connect before the chmod below
+    old_umask = os.umask(0o777 & ~args.mode)
+    try:
+        server = ScannerServer(args.socket, engine)
+    finally:
+        os.umask(old_umask)
+    os.chmod(args.socket, args.mode)
+
+    def stop(_signum, _frame):
+        threading.Thread(target=server.shutdown, daemon=True).start()
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    print(f"[*] Scanner daemon listening on {args.socket}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        try:
+            os.unlink(args.socket)
+        except OSError:
+            pass
+        print("[*] Scanner daemon stopped.")
+
+if __name__ == "__main__":
+    main()
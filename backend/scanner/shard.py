@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+shard.py
+
+Multi-process sharded ARP + host discovery for very large ranges.
+
+In one process, building ARP frames, parsing replies and the discovery
+bookkeeping saturate a single core long before the network is the limit on a
+/16. Here the host range (or the part of it inside a target_set.TargetSet
+scope) is split into contiguous shards of equal size, one per worker process. Every worker has its own sockets (ARP sniffer + L2 socket, ICMP engine,
+TCP / UDP probes), its own RTT estimator and an equal share of the packet rate
+and worker budget. Workers stream (kind, ip, data) records back over a pipe; the
+merger in the calling process collects them and returns the same HostStore
+merge_and_dedupe() builds for an in-process scan.
+
+Workers are started with the "spawn" method so they never inherit the caller's
+threads (pacers, passive listeners) half-way through a lock.
+
+Usage:
+  from shard import sharded_scan
+  mac_map, details = sharded_scan("10.0.0.0/16", shards=8, iface="eth0", max_rate=20000)
+  python network_scanner_cli.py --network 10.0.0.0/16 --shards 8
+"""
+
+import ipaddress
+import multiprocessing
+import multiprocessing.connection
+import os
+import sys
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+if SCRIPT_DIR not in sys.path:
+    sys.path.insert(0, SCRIPT_DIR)
+
+from target_set import TargetSet, hosts_of
+
+def shard_parts(network_cidr, shards, scope=None):
+    """Split the hosts of `network_cidr` (limited to `scope`) into at most `shards` contiguous TargetSets."""
+    hosts = hosts_of(network_cidr)
+    if scope is not None:
+        hosts &= scope
+    return hosts.split(shards)
+
+def _part_hosts(part, first=(), order="address", seed=None):
+    """Addresses of `part` as strings: those in `first` (already limited to the part) first."""
+    yield from first
+    head = set(first)
+    for ip in (part.permutation(seed) if order == "random" else part):
+        if ip not in head:
+            yield ip
+
+def _shard_worker(spec, conn):
+    """Scan one part and send ("arp", ip, mac) / ("alive", ip, detail) records, then ("done", None, stats)."""
+    import network_scanner_cli as cli
+    from rate_limit import RateScheduler
+    from timing import make_estimator
+
+    sent = {"arp": 0, "alive": 0}
+
+    def send(kind, ip, data):
+        sent[kind] += 1
+        conn.send((kind, ip, data))
+
+    try:
+        part = spec["part"]
+        pacer = RateScheduler(max_rate=spec["max_rate"], burst=spec["burst"])
+        exclude = spec["exclude"]
+        sweep = part - exclude
+        first = [ip for ip in spec["first"] if ip in sweep]
+
+        if spec["arp"]:
+            iface = None
+            if spec["iface"]:
+                try:
+                    iface = cli._attempt_bind_iface(spec["iface"])
+                except Exception:
+                    pass
+            try:
+                for ip, mac in cli.arp_stream(spec["network"], iface=iface, timeout=spec["arp_timeout"], pacer=pacer,
+                                              window=spec["arp_window"], retries=spec["arp_retries"],
+                                              targets=part & spec["arp_scope"], exclude=spec["arp_exclude"]):
+                    send("arp", ip, mac)
+            except Exception as e:
+                conn.send(("error", None, f"ARP scan error: {e}"))
+
+        if spec["discovery"]:
+            net = ipaddress.IPv4Network(spec["network"], strict=False)
+            hot = set(first)
+            rtt = make_estimator(spec["timing"])
+            for ip, detail in cli.discovery_stream(
+                    _part_hosts(sweep, first, spec["order"], spec["seed"]), rtt, max_workers=spec["max_workers"], tcp_ports=tuple(spec["tcp_ports"]),
+                    udp_probe_enabled=spec["udp_probes"], icmp_backend=spec["icmp_backend"],
+                    udp_multicast=spec["udp_multicast"], pacer=pacer,
+                    in_scope=lambda addr: ipaddress.IPv4Address(addr) in net and addr not in exclude
+                    and (spec["scope"] is None or addr in spec["scope"]),
+                    hot=hot.__contains__ if spec["prioritize"] else None):
+                send("alive", ip, detail)
+        conn.send(("done", None, {"part": part.ranges(), **sent}))
+    except Exception as e:
+        conn.send(("error", None, f"shard {spec['part']!r} failed: {e}"))
+    finally:
+        conn.close()
+
+def run_shards(network_cidr, shards, iface=None, arp=True, discovery=True, arp_timeout=2, arp_window=None,
+               arp_retries=None, arp_exclude=(), max_workers=200, tcp_ports=None, udp_probes=True,
+               icmp_backend="auto", udp_multicast=False, timing=None, max_rate=None, burst=None,
+               exclude=(), first=(), scope=None, arp_scope=None, order="address", seed=None, on_record=None):
+    """
+    Run one worker process per shard of `network_cidr` and collect their records.
+    Only addresses in `scope` (a target_set.TargetSet, None = all) are probed, and ARP
+    only asks those in `arp_scope` (default: the same); `exclude` / `arp_exclude` may be
+    sets or TargetSets. order="random" sweeps each shard in a `seed`ed permutation.
+    `max_rate` / `burst` / `max_workers` are totals, divided evenly between workers;
+    multicast UDP discovery runs in the first shard only. `first` addresses are probed
+    first (and with full ICMP retries) within their shard.
+    on_record(kind, ip, data) is called in this process as each record arrives.
+    Returns (arp_map, ping_list, details).
+    """
+    import network_scanner_cli as cli
+
+    parts = shard_parts(network_cidr, shards, scope)
+    count = len(parts)
+    base = {
+        "network": str(network_cidr), "iface": iface, "arp": arp, "discovery": discovery,
+        "arp_timeout": arp_timeout, "arp_window": arp_window or cli.ARP_WINDOW,
+        "arp_retries": cli.ARP_RETRIES if arp_retries is None else arp_retries, "arp_exclude": TargetSet.of(arp_exclude),
+        "max_workers": max(1, max_workers // count), "tcp_ports": list(tcp_ports or cli.DEFAULT_TCP_PORTS),
+        "udp_probes": udp_probes, "icmp_backend": icmp_backend, "timing": timing or cli.DEFAULT_TIMING,
+        "max_rate": max_rate / count if max_rate else None,
+        "burst": max(1, burst // count) if burst else None,
+        "exclude": TargetSet.of(exclude), "first": list(first), "prioritize": bool(first),
+        "scope": scope, "arp_scope": hosts_of(network_cidr) if arp_scope is None else arp_scope,
+        "order": order, "seed": seed,
+    }
+    print(f"[*] Sharded scan of {network_cidr}: {count} worker processes")
+
+    ctx = multiprocessing.get_context("spawn")
+    conns = {}
+    procs = []
+    for n, part in enumerate(parts):
+        spec = dict(base, part=part, udp_multicast=udp_multicast and n == 0)
+        reader, writer = ctx.Pipe(duplex=False)
+        proc = ctx.Process(target=_shard_worker, args=(spec, writer), name=f"scan-shard-{n}", daemon=True)
+        proc.start()
+        writer.close()
+        conns[reader] = proc
+        procs.append(proc)
+
+    arp_map = {}
+    ping_list = []
+    details = {}
+    try:
+        while conns:
+            for reader in multiprocessing.connection.wait(list(conns)):
+                try:
+                    kind, ip, data = reader.recv()
+                except (EOFError, OSError):
+                    conns.pop(reader, None)
+                    continue
+                if kind == "arp":
+                    arp_map[ip] = data
+                elif kind == "alive":
+                    ping_list.append(ip)
+                    details[ip] = data
+                elif kind == "error":
+                    print(f"[!] {data}")
+                if on_record is not None and kind in ("arp", "alive"):
+                    on_record(kind, ip, data)
+    finally:
+        for proc in procs:
+            proc.join(timeout=5)
+            if proc.is_alive():
+                proc.terminate()
+    return arp_map, ping_list, details
+
+def sharded_scan(network_cidr, shards=None, **kwargs):
+    """
+    ARP + discovery of `network_cidr` across `shards` processes (default: one per CPU),
+    merged like an in-process scan. Returns (mac_map, details), mac_map being the
+    HostStore from merge_and_dedupe(). Keyword arguments as for run_shards().
+    """
+    import network_scanner_cli as cli
+    arp_map, ping_list, details = run_shards(network_cidr, shards or os.cpu_count() or 1, **kwargs)
+    return cli.merge_and_dedupe(arp_map, ping_list), details
@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""
+target_set.py
+
+IPv4 target sets as sorted, merged integer intervals.
+
+A scan scope of hundreds of ranges with carve-outs is a few hundred
+[first, last] pairs, however many addresses it spans, so it costs nothing to
+build, combine or test against:
+
+  TargetSet("10.0.0.0/8, 192.168.1.10-192.168.1.50, 172.16.0.1")
+  scope = TargetSet.from_file("scope.txt") - TargetSet.from_file("exclude.txt")
+  "10.1.2.3" in scope              # O(log ranges)
+  a | b, a & b, a - b              # union / intersection / difference
+  len(scope)                       # number of addresses
+
+Addresses are only produced when iterated, in address order (iter(start=...)
+wraps around from any address) or in a seeded random permutation that is
+computed per index (a Feistel network over the address count), so a shuffled
+/8 is never materialised. split(n) cuts a set into n near-equal parts (one per
+scan shard).
+
+Entry syntax (strings, lists of strings, files): "a.b.c.d", "a.b.c.d/nn",
+"a.b.c.d-e.f.g.h" or "a.b.c.d-h" (last octet); separated by commas, spaces or
+newlines; "#" starts a comment in files.
+
+Usage:
+  python target_set.py "10.0.0.0/22" --exclude "10.0.1.0/24" --random --limit 5
+"""
+
+import argparse
+import array
+import bisect
+import ipaddress
+import random
+import re
+import socket
+import sys
+
+_SPLIT_RE = re.compile(r"[\s,]+")
+
+def _aton(ip):
+    return int.from_bytes(socket.inet_aton(ip), "big") if ip.count(".") == 3 else int(ipaddress.IPv4Address(ip))
+
+def _ntoa(value):
+    return socket.inet_ntoa(value.to_bytes(4, "big"))
+
+def parse_entry(entry):
+    """(first, last) ints for one address / CIDR / range entry; raises ValueError if malformed."""
+    entry = entry.strip()
+    try:
+        if "/" in entry:
+            net = ipaddress.IPv4Network(entry, strict=False)
+            return int(net.network_address), int(net.broadcast_address)
+        if "-" in entry:
+            left, right = (part.strip() for part in entry.split("-", 1))
+            if "." not in right:
+                right = left.rsplit(".", 1)[0] + "." + right
+            first, last = _aton(left), _aton(right)
+            if first > last:
+                raise ValueError("range end before start")
+            return first, last
+        value = _aton(entry)
+        return value, value
+    except (OSError, ValueError) as e:
+        raise ValueError(f"invalid target {entry!r}: {e}")
+
+def _merge(pairs):
+    """Sorted, merged (first, last) list from arbitrary (possibly overlapping / adjacent) pairs."""
+    merged = []
+    for first, last in sorted(pairs):
+        if merged and first <= merged[-1][1] + 1:
+            if last > merged[-1][1]:
+                merged[-1][1] = last
+        else:
+            merged.append([first, last])
+    return merged
+
+class TargetSet:
+    """Immutable set of IPv4 addresses stored as disjoint, non-adjacent intervals."""
+
+    def __init__(self, entries=None):
+        pairs = []
+        if isinstance(entries, TargetSet):
+            pairs = list(entries.spans())
+        elif isinstance(entries, (ipaddress.IPv4Network, ipaddress.IPv4Address)):
+            pairs = [parse_entry(str(entries))]
+        elif isinstance(entries, str):
+            pairs = [parse_entry(e) for e in _SPLIT_RE.split(entries) if e]
+        elif entries is not None:
+            for item in entries:
+                if isinstance(item, tuple):
+                    pairs.append((int(item[0]), int(item[1])))
+                else:
+                    pairs.extend(parse_entry(e) for e in _SPLIT_RE.split(str(item)) if e)
+        self._set_spans(_merge(pairs))
+
+    def _set_spans(self, spans):
+        self._lo = array.array("I", (lo for lo, _hi in spans))
+        self._hi = array.array("I", (hi for _lo, hi in spans))
+        self._offsets = None
+
+    @classmethod
+    def _from_spans(cls, spans):
+        ts = cls.__new__(cls)
+        ts._set_spans(spans)
+        return ts
+
+    @classmethod
+    def of(cls, value):
+        """A TargetSet from a TargetSet (returned as is), a spec string, a network or an iterable of addresses."""
+        return value if isinstance(value, TargetSet) else cls(value)
+
+    @classmethod
+    def from_file(cls, path):
+        """Entries from a text file (one or more per line, "#" comments)."""
+        entries = []
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.split("#", 1)[0].strip()
+                if line:
+                    entries.append(line)
+        return cls(entries)
+
+    # ---------- Set algebra ----------
+    def spans(self):
+        """(first, last) int pairs in address order."""
+        return zip(self._lo, self._hi)
+
+    def __or__(self, other):
+        other = TargetSet.of(other)
+        return TargetSet._from_spans(_merge(list(self.spans()) + list(other.spans())))
+
+    def __and__(self, other):
+        other = TargetSet.of(other)
+        a, b = list(self.spans()), list(other.spans())
+        out = []
+        i = j = 0
+        while i < len(a) and j < len(b):
+            first = max(a[i][0], b[j][0])
+            last = min(a[i][1], b[j][1])
+            if first <= last:
+                out.append((first, last))
+            if a[i][1] < b[j][1]:
+                i += 1
+            else:
+                j += 1
+        return TargetSet._from_spans(out)
+
+    def __sub__(self, other):
+        other = TargetSet.of(other)
+        cut = list(other.spans())
+        out = []
+        j = 0
+        for first, last in self.spans():
+            while j < len(cut) and cut[j][1] < first:
+                j += 1
+            k = j
+            while k < len(cut) and cut[k][0] <= last:
+                if cut[k][0] > first:
+                    out.append((first, cut[k][0] - 1))
+                first = max(first, cut[k][1] + 1)
+                k += 1
+            if first <= last:
+                out.append((first, last))
+        return TargetSet._from_spans(out)
+
+    union = __or__
+    intersection = __and__
+    difference = __sub__
+
+    # ---------- Queries ----------
+    def __contains__(self, ip):
+        try:
+            value = ip if isinstance(ip, int) else _aton(str(ip))
+        except (OSError, ValueError):
+            return False
+        i = bisect.bisect_right(self._lo, value) - 1
+        return i >= 0 and value <= self._hi[i]
+
+    def _counts(self):
+        if self._offsets is None:
+            offsets = array.array("Q", [0])
+            total = 0
+            for first, last in self.spans():
+                total += last - first + 1
+                offsets.append(total)
+            self._offsets = offsets
+        return self._offsets
+
+    def __len__(self):
+        return self._counts()[-1]
+
+    def __bool__(self):
+        return len(self._lo) > 0
+
+    def __eq__(self, other):
+        return isinstance(other, TargetSet) and self._lo == other._lo and self._hi == other._hi
+
+    def __repr__(self):
+        shown = ", ".join(self.ranges()[:4])
+        more = f", ... ({len(self._lo)} ranges)" if len(self._lo) > 4 else ""
+        return f"TargetSet({shown}{more})"
+
+    def at(self, index):
+        """The index-th address (address order) as a string."""
+        offsets = self._counts()
+        if not 0 <= index < offsets[-1]:
+            raise IndexError("TargetSet index out of range")
+        i = bisect.bisect_right(offsets, index) - 1
+        return _ntoa(self._lo[i] + index - offsets[i])
+
+    def index(self, ip):
+        """Position of `ip` in address order (ValueError if not in the set)."""
+        value = _aton(str(ip))
+        i = bisect.bisect_right(self._lo, value) - 1
+        if i < 0 or value > self._hi[i]:
+            raise ValueError(f"{ip} not in TargetSet")
+        return self._counts()[i] + value - self._lo[i]
+
+    def ranges(self):
+        """["a.b.c.d-e.f.g.h" or single "a.b.c.d", ...] in address order."""
+        return [_ntoa(lo) if lo == hi else f"{_ntoa(lo)}-{_ntoa(hi)}" for lo, hi in self.spans()]
+
+    def cidrs(self):
+        """Minimal list of CIDR networks covering exactly this set."""
+        out = []
+        for lo, hi in self.spans():
+            out.extend(ipaddress.summarize_address_range(ipaddress.IPv4Address(lo), ipaddress.IPv4Address(hi)))
+        return out
+
+    def enclosing_network(self):
+        """Smallest single CIDR network containing every address (None if empty)."""
+        if not self:
+            return None
+        lo, hi = self._lo[0], self._hi[-1]
+        prefix = 32 - (lo ^ hi).bit_length()
+        return ipaddress.IPv4Network((lo >> (32 - prefix) << (32 - prefix), prefix))
+
+    # ---------- Streaming ----------
+    def __iter__(self):
+        return self.iter()
+
+    def iter(self, start=None):
+        """Addresses as strings in address order, beginning at `start` (if in the set) and wrapping around."""
+        begin = 0
+        if start is not None and start in self:
+            begin = self.index(start)
+        total = len(self)
+        yield from self._slice(begin, total)
+        yield from self._slice(0, begin)
+
+    def _slice(self, begin, end):
+        offsets = self._counts()
+        i = bisect.bisect_right(offsets, begin) - 1
+        pos = begin
+        while pos < end and i < len(self._lo):
+            first = self._lo[i] + pos - offsets[i]
+            last = min(self._hi[i], self._lo[i] + end - 1 - offsets[i])
+            for value in range(first, last + 1):
+                yield _ntoa(value)
+            pos = offsets[i + 1]
+            i += 1
+
+    def permutation(self, seed=None):
+        """
+        Every address exactly once in a pseudo-random order fixed by `seed`.
+        Indexes are permuted by a 4-round Feistel network on the next even power of
+        two (values beyond the set size are skipped), so memory stays constant.
+        """
+        total = len(self)
+        if not total:
+            return
+        bits = max(2, (total - 1).bit_length())
+        bits += bits & 1
+        half = bits // 2
+        mask = (1 << half) - 1
+        rng = random.Random(seed)
+        keys = [rng.getrandbits(32) for _ in range(4)]
+
+        def mix(x, key):
+            x = ((x ^ key) * 0x9E3779B1) & 0xFFFFFFFF
+            x ^= x >> 15
+            x = (x * 0x85EBCA77) & 0xFFFFFFFF
+            x ^= x >> 13
+            return x & mask
+
+        for i in range(1 << bits):
+            left, right = i >> half, i & mask
+            for key in keys:
+                left, right = right, left ^ mix(right, key)
+            index = (left << half) | right
+            if index < total:
+                yield self.at(index)
+
+    def split(self, parts):
+        """Up to `parts` disjoint TargetSets of near-equal size covering this set, in address order."""
+        total = len(self)
+        parts = max(1, min(int(parts), total or 1))
+        out = []
+        for n in range(parts):
+            begin, end = total * n // parts, total * (n + 1) // parts
+            out.append(self._index_range(begin, end))
+        return out
+
+    def _index_range(self, begin, end):
+        offsets = self._counts()
+        spans = []
+        i = bisect.bisect_right(offsets, begin) - 1
+        while begin < end and i < len(self._lo):
+            first = self._lo[i] + begin - offsets[i]
+            last = min(self._hi[i], self._lo[i] + end - 1 - offsets[i])
+            spans.append((first, last))
+            begin = offsets[i + 1]
+            i += 1
+        return TargetSet._from_spans(spans)
+
+    def __getstate__(self):
+        return {"lo": self._lo, "hi": self._hi}
+
+    def __setstate__(self, state):
+        self._lo, self._hi, self._offsets = state["lo"], state["hi"], None
+
+def hosts_of(network_cidr):
+    """TargetSet of the usable host addresses of a network (no network / broadcast address below /31)."""
+    net = ipaddress.IPv4Network(str(network_cidr), strict=False)
+    lo, hi = int(net.network_address), int(net.broadcast_address)
+    if net.prefixlen < 31:
+        lo, hi = lo + 1, hi - 1
+    return TargetSet._from_spans([(lo, hi)] if lo <= hi else [])
+
+def main():
+    ap = argparse.ArgumentParser(description="Expand / combine IPv4 target specs")
+    ap.add_argument("targets", nargs="*", help="addresses, CIDRs or ranges")
+    ap.add_argument("--file", action="append", default=[], help="read targets from a file (repeatable)")
+    ap.add_argument("--exclude", action="append", default=[], help="addresses, CIDRs or ranges to remove")
+    ap.add_argument("--exclude-file", action="append", default=[], help="read exclusions from a file (repeatable)")
+    ap.add_argument("--random", action="store_true", help="print in a random permutation")
+    ap.add_argument("--seed", type=int, help="permutation seed")
+    ap.add_argument("--limit", type=int, help="print at most this many addresses")
+    ap.add_argument("--ranges", action="store_true", help="print the merged ranges instead of addresses")
+    args = ap.parse_args()
+
+    try:
+        scope = TargetSet(args.targets)
+        for path in args.file:
+            scope |= TargetSet.from_file(path)
+        cut = TargetSet(args.exclude)
+        for path in args.exclude_file:
+            cut |= TargetSet.from_file(path)
+    except (OSError, ValueError) as e:
+        sys.exit(f"[!] {e}")
+    scope -= cut
+    print(f"[*] {len(scope)} addresses in {len(scope.ranges())} ranges", file=sys.stderr)
+    if args.ranges:
+        for r in scope.ranges():
+            print(r)
+        return
+    stream = scope.permutation(args.seed) if args.random else iter(scope)
+    for n, ip in enumerate(stream):
+        if args.limit is not None and n >= args.limit:
+            break
+        print(ip)
+
+if __name__ == "__main__":
+    main()
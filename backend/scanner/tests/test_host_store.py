@@ -0,0 +1,90 @@
+"""
+host_store: HostStore.merge() must group hosts exactly like the OrderedDict
+merge_and_dedupe() it replaced (reproduced below as `baseline`).
+
+Run from backend/scanner:  python -m unittest discover tests
+"""
+
+import os
+import sys
+import unittest
+from collections import OrderedDict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from host_store import HostStore, PING_ONLY_VENDOR
+
+VENDORS = {"aa:bb:cc": "Apple, Inc.", "00:00:0c": "Cisco Systems, Inc"}
+
+def vendor_lookup(mac):
+    return VENDORS.get(mac[:8], "Unknown")
+
+def baseline(arp_map, ping_list):
+    """The pre-HostStore merge_and_dedupe(), as (mac, sorted ips) pairs in order."""
+    mac_map = OrderedDict()
+    for ip, mac in arp_map.items():
+        key = mac or f"unknown-mac:{ip}"
+        if key not in mac_map:
+            mac_map[key] = {"mac": mac, "ips": set()}
+        mac_map[key]["ips"].add(ip)
+    for ip in ping_list:
+        if ip in arp_map:
+            continue
+        key = f"ping-only:{ip}"
+        if key not in mac_map:
+            mac_map[key] = {"mac": None, "ips": set()}
+        mac_map[key]["ips"].add(ip)
+    return [(e["mac"], sorted(e["ips"], key=lambda ip: tuple(map(int, ip.split("."))))) for e in mac_map.values()]
+
+def grouped(store):
+    return [(d["mac"], d["ips"]) for d in store.to_json()]
+
+class HostStoreMergeTest(unittest.TestCase):
+
+    def check(self, arp_map, ping_list):
+        store = HostStore(vendor_lookup=vendor_lookup).merge(arp_map, ping_list)
+        self.assertEqual(grouped(store), baseline(arp_map, ping_list))
+        return store
+
+    def test_ping_only_hosts(self):
+        store = self.check({}, ["192.168.1.30", "192.168.1.31"])
+        self.assertEqual(len(store), 2)
+        for device in store.to_json():
+            self.assertIsNone(device["mac"])
+            self.assertTrue(device["ping_only"])
+            self.assertEqual(device["vendor"], PING_ONLY_VENDOR)
+            self.assertFalse(device["mobile"])
+
+    def test_one_mac_on_several_ips_is_one_device(self):
+        arp_map = {"192.168.1.10": "aa:bb:cc:00:00:01", "192.168.1.2": "00:00:0c:00:00:02",
+                   "192.168.1.11": "aa:bb:cc:00:00:01"}
+        store = self.check(arp_map, [])
+        self.assertEqual(len(store), 2)
+        self.assertEqual(store.device_for_mac("aa:bb:cc:00:00:01").ips, ["192.168.1.10", "192.168.1.11"])
+        self.assertEqual(store.device_for_ip("192.168.1.11").mac, "aa:bb:cc:00:00:01")
+
+    def test_arp_entry_wins_over_ping_for_the_same_ip(self):
+        store = self.check({"192.168.1.10": "aa:bb:cc:00:00:01"}, ["192.168.1.10", "192.168.1.40"])
+        self.assertEqual(len(store), 2)
+        self.assertFalse(store.device_for_ip("192.168.1.10").ping_only)
+        self.assertTrue(store.device_for_ip("192.168.1.40").ping_only)
+
+    def test_vendor_fill_in(self):
+        store = self.check({"192.168.1.10": "aa:bb:cc:00:00:01", "192.168.1.2": "00:00:0c:00:00:02",
+                            "192.168.1.3": "12:34:56:00:00:03"}, ["192.168.1.40"])
+        by_mac = {d["mac"]: d for d in store.to_json()}
+        self.assertEqual(by_mac["aa:bb:cc:00:00:01"]["vendor"], "Apple, Inc.")
+        self.assertTrue(by_mac["aa:bb:cc:00:00:01"]["mobile"])
+        self.assertEqual(by_mac["00:00:0c:00:00:02"]["vendor"], "Cisco Systems, Inc")
+        self.assertFalse(by_mac["00:00:0c:00:00:02"]["mobile"])
+        self.assertEqual(by_mac["12:34:56:00:00:03"]["vendor"], "Unknown")
+        self.assertEqual(by_mac[None]["vendor"], PING_ONLY_VENDOR)
+
+    def test_failing_vendor_lookup_falls_back_to_unknown(self):
+        def broken(mac):
+            raise RuntimeError("vendor db missing")
+        store = HostStore(vendor_lookup=broken).merge({"192.168.1.10": "aa:bb:cc:00:00:01"}, [])
+        self.assertEqual(store.to_json()[0]["vendor"], "Unknown")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+"""
+scan_targets(): one failing network must not take the others (or the output) down.
+
+Run from backend/scanner:  python -m unittest discover tests
+"""
+
+import os
+import sys
+import types
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import network_scanner_cli as cli
+from host_store import HostStore
+
+ARGS = types.SimpleNamespace(max_rate=None, min_rate=None, burst=None, max_workers=4, max_in_flight=64)
+GOOD = ("eth0", "192.168.1.10", "255.255.255.0", "192.168.1.0/24")
+BAD = ("eth1", "10.0.0.10", "255.255.255.0", "10.0.0.0/24")
+
+def fake_scan_target(network_cidr, iface, args, **kwargs):
+    if network_cidr == BAD[3]:
+        raise OSError("interface went away")
+    store = HostStore().merge({"192.168.1.1": "aa:bb:cc:00:11:22"}, ["192.168.1.20"])
+    return store, {"192.168.1.20": {"probe": "icmp", "rtt": 0.001}}
+
+class ScanTargetsTest(unittest.TestCase):
+
+    def test_failing_target_gets_empty_host_store(self):
+        with mock.patch.object(cli, "scan_target", side_effect=fake_scan_target):
+            results = cli.scan_targets([GOOD, BAD], ARGS)
+        self.assertEqual(len(results), 2)
+        good_map, good_details = results[0]
+        bad_map, bad_details = results[1]
+        self.assertEqual(len(good_map), 2)
+        self.assertIn("192.168.1.20", good_details)
+        self.assertIsInstance(bad_map, HostStore)
+        self.assertEqual(bad_map.to_json(), [])
+        self.assertEqual(bad_details, {})
+
+    def test_results_render_like_main(self):
+        with mock.patch.object(cli, "scan_target", side_effect=fake_scan_target):
+            results = cli.scan_targets([BAD, GOOD], ARGS)
+        out = []
+        for (iface, _ip, _netmask, network_cidr), (mac_map, details) in zip([BAD, GOOD], results):
+            out.extend(cli.results_to_json(mac_map, details=details, target={"iface": iface, "network": network_cidr}))
+            list(mac_map.devices())
+        self.assertEqual(sorted(ip for d in out for ip in d["ips"]), ["192.168.1.1", "192.168.1.20"])
+
+    def test_single_failing_target(self):
+        with mock.patch.object(cli, "scan_target", side_effect=fake_scan_target):
+            results = cli.scan_targets([BAD], ARGS)
+        self.assertEqual(results[0][0].to_json(), [])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+"""
+target_set: interval algebra, split() and permutation() checked against plain Python sets.
+
+Run from backend/scanner:  python -m unittest discover tests
+"""
+
+import os
+import pickle
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from target_set import TargetSet, hosts_of
+
+def addresses(ts):
+    return set(ts)
+
+# (a, b) pairs whose ranges touch, overlap, nest or are disjoint
+CASES = [
+    ("10.0.0.0-10.0.0.9", "10.0.0.10-10.0.0.19"),            # adjacent
+    ("10.0.0.0-10.0.0.15", "10.0.0.8-10.0.0.31"),            # overlapping
+    ("10.0.0.0/24", "10.0.0.64/26"),                         # nested
+    ("10.0.0.1, 10.0.0.3, 10.0.0.5", "10.0.0.2-10.0.0.4"),   # interleaved singles
+    ("10.0.0.0-10.0.0.4, 10.0.0.20-10.0.0.24", "10.0.0.5-10.0.0.19"),  # b fills the gap exactly
+    ("192.168.1.0/30", "10.0.0.0/30"),                       # disjoint
+    ("10.0.0.0/30", ""),                                     # empty operand
+]
+
+class TargetSetAlgebraTest(unittest.TestCase):
+
+    def test_operators_match_set_semantics(self):
+        for a_spec, b_spec in CASES:
+            a, b = TargetSet(a_spec), TargetSet(b_spec)
+            with self.subTest(a=a_spec, b=b_spec):
+                self.assertEqual(addresses(a | b), addresses(a) | addresses(b))
+                self.assertEqual(addresses(a & b), addresses(a) & addresses(b))
+                self.assertEqual(addresses(a - b), addresses(a) - addresses(b))
+                self.assertEqual(addresses(b - a), addresses(b) - addresses(a))
+                self.assertEqual(len(a | b), len(addresses(a) | addresses(b)))
+
+    def test_adjacent_ranges_merge_into_one_interval(self):
+        merged = TargetSet("10.0.0.0-10.0.0.9") | TargetSet("10.0.0.10-10.0.0.19")
+        self.assertEqual(merged.ranges(), ["10.0.0.0-10.0.0.19"])
+        self.assertEqual(TargetSet("10.0.0.5-10.0.0.9, 10.0.0.0-10.0.0.4").ranges(), ["10.0.0.0-10.0.0.9"])
+
+    def test_overlapping_ranges(self):
+        a, b = TargetSet("10.0.0.0-10.0.0.15"), TargetSet("10.0.0.8-10.0.0.31")
+        self.assertEqual((a | b).ranges(), ["10.0.0.0-10.0.0.31"])
+        self.assertEqual((a & b).ranges(), ["10.0.0.8-10.0.0.15"])
+        self.assertEqual((a - b).ranges(), ["10.0.0.0-10.0.0.7"])
+        self.assertEqual((TargetSet("10.0.0.0/24") - TargetSet("10.0.0.64/26")).ranges(),
+                         ["10.0.0.0-10.0.0.63", "10.0.0.128-10.0.0.255"])
+
+    def test_membership_index_and_at(self):
+        ts = TargetSet("10.0.0.1, 10.0.0.3, 10.0.0.10-10.0.0.12")
+        self.assertEqual(list(ts), ["10.0.0.1", "10.0.0.3", "10.0.0.10", "10.0.0.11", "10.0.0.12"])
+        for i, ip in enumerate(ts):
+            self.assertIn(ip, ts)
+            self.assertEqual(ts.at(i), ip)
+            self.assertEqual(ts.index(ip), i)
+        self.assertNotIn("10.0.0.2", ts)
+        with self.assertRaises(IndexError):
+            ts.at(len(ts))
+        with self.assertRaises(ValueError):
+            ts.index("10.0.0.2")
+
+    def test_iter_wraps_around_from_start(self):
+        ts = TargetSet("10.0.0.1-10.0.0.3, 10.0.0.7-10.0.0.8")
+        self.assertEqual(list(ts.iter("10.0.0.7")), ["10.0.0.7", "10.0.0.8", "10.0.0.1", "10.0.0.2", "10.0.0.3"])
+
+    def test_hosts_of_drops_network_and_broadcast(self):
+        self.assertEqual(hosts_of("192.168.1.0/30").ranges(), ["192.168.1.1-192.168.1.2"])
+        self.assertEqual(hosts_of("192.168.1.0/31").ranges(), ["192.168.1.0-192.168.1.1"])
+        self.assertEqual(len(hosts_of("10.0.0.0/16")), 65534)
+
+    def test_pickle_round_trip(self):
+        ts = TargetSet("10.0.0.0/28, 10.0.1.5")
+        clone = pickle.loads(pickle.dumps(ts))
+        self.assertEqual(clone, ts)
+        self.assertEqual(list(clone), list(ts))
+
+class TargetSetSplitTest(unittest.TestCase):
+
+    def check_split(self, ts, parts):
+        pieces = ts.split(parts)
+        self.assertEqual(len(pieces), max(1, min(parts, len(ts) or 1)))
+        seen = []
+        for piece in pieces:
+            seen.extend(piece)
+        # every address exactly once, shards in address order
+        self.assertEqual(seen, list(ts))
+        sizes = [len(p) for p in pieces]
+        self.assertLessEqual(max(sizes) - min(sizes), 1)
+        for x in range(len(pieces)):
+            for y in range(x + 1, len(pieces)):
+                self.assertFalse(pieces[x] & pieces[y])
+
+    def test_split_covers_the_set_exactly_once(self):
+        ts = TargetSet("10.0.0.0/27, 10.0.1.3, 10.0.2.10-10.0.2.20")
+        for parts in (1, 2, 3, 4, 7, 45):
+            with self.subTest(parts=parts):
+                self.check_split(ts, parts)
+
+    def test_split_into_more_parts_than_addresses(self):
+        ts = TargetSet("10.0.0.1-10.0.0.3")
+        self.assertEqual([list(p) for p in ts.split(10)], [["10.0.0.1"], ["10.0.0.2"], ["10.0.0.3"]])
+
+    def test_split_large_range(self):
+        self.check_split(hosts_of("10.0.0.0/20"), 6)
+
+class TargetSetPermutationTest(unittest.TestCase):
+
+    def test_permutation_is_a_bijection(self):
+        for spec in ("10.0.0.1", "10.0.0.1-10.0.0.2", "10.0.0.0/27, 10.0.1.3, 10.0.2.10-10.0.2.20", "10.0.0.0/22"):
+            ts = TargetSet(spec)
+            with self.subTest(spec=spec):
+                order = list(ts.permutation(seed=7))
+                self.assertEqual(len(order), len(ts))
+                self.assertEqual(sorted(order, key=ts.index), list(ts))
+
+    def test_permutation_is_stable_per_seed(self):
+        ts = hosts_of("10.0.0.0/24")
+        self.assertEqual(list(ts.permutation(seed=42)), list(ts.permutation(seed=42)))
+        # an equal set built another way (or unpickled in a shard worker) walks the same order
+        self.assertEqual(list(TargetSet("10.0.0.1-10.0.0.254").permutation(seed=42)), list(ts.permutation(seed=42)))
+
+    def test_seeds_give_different_orders(self):
+        ts = hosts_of("10.0.0.0/24")
+        orders = {tuple(ts.permutation(seed=seed)) for seed in range(5)}
+        self.assertEqual(len(orders), 5)
+        self.assertNotEqual(list(ts.permutation(seed=1)), list(ts))
+
+    def test_empty_set(self):
+        self.assertEqual(list(TargetSet().permutation(seed=1)), [])
+        self.assertEqual(TargetSet().split(3)[0].ranges(), [])
+
+if __name__ == "__main__":
+    unittest.main()
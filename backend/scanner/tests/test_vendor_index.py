@@ -0,0 +1,53 @@
+"""
+vendor_index: MA-L / MA-M / MA-S longest-prefix lookups over a tiny IEEE CSV fixture.
+
+Run from backend/scanner:  python -m unittest discover tests
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TESTS_DIR, ".."))
+
+from vendor_index import VendorIndex, build_index
+
+FIXTURES = os.path.join(TESTS_DIR, "fixtures")
+SOURCES = [os.path.join(FIXTURES, name) for name in ("oui.csv", "mam.csv", "oui36.csv")]
+
+class VendorIndexTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        path = os.path.join(cls.tmp.name, "oui.idx")
+        cls.count = build_index(SOURCES, out_path=path)
+        cls.index = VendorIndex(path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.index.close()
+        cls.tmp.cleanup()
+
+    def test_record_count(self):
+        self.assertEqual(self.count, 4)
+
+    def test_ma_s_wins_inside_its_36_bit_block(self):
+        self.assertEqual(self.index.lookup("00:1b:c5:00:10:01"), "Example Small Block GmbH")
+
+    def test_ma_m_wins_inside_its_28_bit_block(self):
+        self.assertEqual(self.index.lookup("00:1b:c5:00:20:01"), "Example Medium Block Ltd")
+        self.assertEqual(self.index.lookup("00-1B-C5-0F-FF-FF"), "Example Medium Block Ltd")
+
+    def test_ma_l_covers_the_rest_of_the_oui(self):
+        self.assertEqual(self.index.lookup("00:1b:c5:10:00:00"), "IEEE Registration Authority")
+        self.assertEqual(self.index.lookup("00000c123456"), "Cisco Systems, Inc")
+
+    def test_miss_and_invalid(self):
+        self.assertIsNone(self.index.lookup("12:34:56:78:9a:bc"))
+        self.assertIsNone(self.index.lookup("not-a-mac"))
+
+if __name__ == "__main__":
+    unittest.main()
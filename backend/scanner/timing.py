@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+timing.py
+
+Adaptive probe timeouts for host discovery, modelled on nmap's timing engine.
+
+RttEstimator keeps a smoothed RTT and RTT variance (RFC 6298 / nmap):
+    srtt   += (rtt - srtt) / 8
+    rttvar += (|rtt - srtt| - rttvar) / 4
+    timeout = srtt + 4 * rttvar       (clamped to [min_timeout, max_timeout])
+Until the first reply arrives the template's initial timeout is used, so a
+wired LAN answering in 1-2 ms quickly drops to min_timeout instead of waiting
+hundreds of milliseconds on every silent address.
+
+Usage:
+  from timing import make_estimator
+  rtt = make_estimator("fast")
+  rtt.update(0.0014)
+  rtt.timeout()        # -> seconds to wait for the next probe
+"""
+
+import threading
+
+# initial/min/max bound the ICMP/TCP reply wait, udp_min floors the UDP reply window
+# (services answer slower than the kernel), arp_timeout is the fixed ARP sweep wait.
+TIMING_TEMPLATES = {
+    "paranoid": {"initial_timeout": 2.0, "min_timeout": 0.5, "max_timeout": 5.0, "udp_min": 1.0, "arp_timeout": 4.0, "retries": 2},
+    "normal":   {"initial_timeout": 1.0, "min_timeout": 0.1, "max_timeout": 2.0, "udp_min": 0.3, "arp_timeout": 2.0, "retries": 1},
+    "fast":     {"initial_timeout": 0.5, "min_timeout": 0.05, "max_timeout": 0.5, "udp_min": 0.15, "arp_timeout": 1.0, "retries": 0},
+}
+DEFAULT_TIMING = "normal"
+
+class RttEstimator:
+    """Thread-safe smoothed RTT / variance tracker that yields the current probe timeout."""
+
+    def __init__(self, initial_timeout=1.0, min_timeout=0.1, max_timeout=2.0, udp_min=0.3, arp_timeout=2.0, retries=1):
+        self.initial_timeout = float(initial_timeout)
+        self.min_timeout = float(min_timeout)
+        self.max_timeout = max(float(max_timeout), self.min_timeout)
+        self.udp_min = float(udp_min)
+        self.arp_timeout = float(arp_timeout)
+        self.retries = int(retries)
+        self.srtt = None
+        self.rttvar = None
+        self.samples = 0
+        self._lock = threading.Lock()
+
+    def update(self, rtt):
+        """Feed one measured round-trip time in seconds."""
+        if rtt is None or rtt < 0:
+            return
+        with self._lock:
+            if self.srtt is None:
+                self.srtt = rtt
+                self.rttvar = rtt / 2
+            else:
+                delta = rtt - self.srtt
+                self.srtt += delta / 8
+                self.rttvar += (abs(delta) - self.rttvar) / 4
+            self.samples += 1
+
+    def timeout(self):
+        """Current probe timeout in seconds."""
+        with self._lock:
+            if self.srtt is None:
+                value = self.initial_timeout
+            else:
+                value = self.srtt + 4 * self.rttvar
+        return min(self.max_timeout, max(self.min_timeout, value))
+
+    def udp_timeout(self):
+        """Reply window for UDP service probes (never below the template's udp_min)."""
+        return max(self.udp_min, self.timeout())
+
+    def snapshot(self):
+        """JSON-friendly summary for logs."""
+        with self._lock:
+            return {"srtt": self.srtt, "rttvar": self.rttvar, "samples": self.samples}
+
+def make_estimator(template=DEFAULT_TIMING, initial_timeout=None):
+    """
+    Build an RttEstimator from a template name (paranoid/normal/fast).
+    initial_timeout overrides the template's starting timeout (it also raises
+    max_timeout if needed so the override is honoured).
+    """
+    if isinstance(template, RttEstimator):
+        return template
+    params = dict(TIMING_TEMPLATES.get(template or DEFAULT_TIMING, TIMING_TEMPLATES[DEFAULT_TIMING]))
+    if initial_timeout is not None:
+        params["initial_timeout"] = float(initial_timeout)
+        params["max_timeout"] = max(params["max_timeout"], float(initial_timeout))
+    return RttEstimator(**params)
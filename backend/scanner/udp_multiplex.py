@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+udp_multiplex.py
+
+SSDP / mDNS discovery probes for many hosts from two shared UDP sockets.
+
+One socket carries every SSDP M-SEARCH, the other every mDNS query, so replies
+are attributed by socket (protocol) and source address. The whole sweep costs
+about one timeout regardless of how many targets there are.
+
+Usage:
+  from udp_multiplex import udp_sweep, udp_multicast_discover
+  udp_sweep(["192.168.1.10", "192.168.1.11"], timeout=0.6)   # {ip: "ssdp"|"mdns"}
+  udp_multicast_discover(timeout=1.0)                        # one M-SEARCH to 239.255.255.250,
+                                                             # one query to 224.0.0.251
+"""
+
+import errno
+import select
+import socket
+import struct
+import time
+
+SSDP_ADDR = ("239.255.255.250", 1900)
+MDNS_ADDR = ("224.0.0.251", 5353)
+SSDP_MX = 1
+
+SSDP_MSEARCH = "\r\n".join([
+    'M-SEARCH * HTTP/1.1',
+    'HOST:239.255.255.250:1900',
+    'MAN:"ssdp:discover"',
+    f'MX:{SSDP_MX}',
+    'ST:ssdp:all',
+    '', ''
+]).encode('utf-8')
+
+# ---------- mDNS query ----------
+def build_mdns_query(name="_services._dns-sd._udp.local", qtype=12, unicast_response=True, txid=0x4E56):
+    """
+    Build a DNS query for `name` (default: DNS-SD service enumeration, PTR).
+    unicast_response sets the QU bit (RFC 6762 section 5.4). A non-zero txid is
+    echoed back by responders answering a legacy unicast query.
+    """
+    header = struct.pack("!HHHHHH", txid & 0xFFFF, 0, 1, 0, 0, 0)
+    qname = b"".join(bytes([len(label)]) + label.encode("ascii") for label in name.split(".") if label) + b"\x00"
+    qclass = 1 | (0x8000 if unicast_response else 0)
+    return header + qname + struct.pack("!HH", qtype, qclass)
+
+MDNS_QUERY = build_mdns_query()
+
+# ---------- Multiplexer ----------
+class UdpProbeMux:
+    """
+    Two non-blocking UDP sockets (SSDP + mDNS) shared by every target of a sweep.
+    An optional `pacer` (rate_limit.RateScheduler) gates every datagram sent.
+    """
+
+    def __init__(self, timeout=0.6, source_ip=None, pacer=None):
+        self.timeout = timeout
+        self.source_ip = source_ip
+        self.pacer = pacer
+        self.socks = {}
+
+    def open(self):
+        for proto in ("ssdp", "mdns"):
+            if proto in self.socks:
+                continue
+            s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            try:
+                s.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+            except Exception:
+                pass
+            s.bind((self.source_ip or "", 0))
+            s.setblocking(False)
+            self.socks[proto] = s
+        return self
+
+    def close(self):
+        for s in self.socks.values():
+            try:
+                s.close()
+            except Exception:
+                pass
+        self.socks = {}
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def _send(self, proto, payload, addr):
+        s = self.socks[proto]
+        if self.pacer is not None:
+            self.pacer.take()
+        for _ in range(50):
+            try:
+                s.sendto(payload, addr)
+                return True
+            except (BlockingIOError, InterruptedError):
+                self._congested()
+            except OSError as e:
+                if e.errno in (errno.ENOBUFS, errno.EAGAIN):
+                    self._congested()
+                    continue
+                return False
+        return False
+
+    def _congested(self):
+        if self.pacer is not None:
+            self.pacer.congestion()
+        time.sleep(0.001)
+
+    def _drain(self, found, accept, wait):
+        """Collect queued replies into found {ip: proto}; accept(ip) filters sources."""
+        by_fd = {s: proto for proto, s in self.socks.items()}
+        try:
+            ready, _, _ = select.select(list(by_fd), [], [], max(0.0, wait))
+        except (OSError, ValueError):
+            return
+        for s in ready:
+            while True:
+                try:
+                    data, addr = s.recvfrom(4096)
+                except (BlockingIOError, InterruptedError):
+                    break
+                except ConnectionResetError:
+                    # Windows reports ICMP port-unreachable on the next recvfrom; ignore it
+                    continue
+                except OSError:
+                    break
+                ip = addr[0]
+                if data and ip not in found and accept(ip):
+                    found[ip] = by_fd[s]
+
+    def sweep(self, ips, ssdp=True, mdns=True):
+        """Send SSDP and/or mDNS to every ip and return {ip: "ssdp"|"mdns"} for responders."""
+        targets = dict.fromkeys(str(ip) for ip in ips)
+        found = {}
+        self.open()
+        for ip in targets:
+            if ssdp:
+                self._send("ssdp", SSDP_MSEARCH, (ip, 1900))
+            if mdns:
+                self._send("mdns", MDNS_QUERY, (ip, 5353))
+            self._drain(found, targets.__contains__, 0.0)
+        self._wait(found, targets.__contains__, self.timeout)
+        return found
+
+    def multicast(self, accept=None, ttl_ssdp=2, ttl_mdns=255):
+        """
+        One SSDP M-SEARCH to 239.255.255.250 and one mDNS query to 224.0.0.251.
+        Waits at least SSDP_MX seconds since SSDP responders delay randomly up to MX.
+        Returns {ip: "ssdp"|"mdns"} for responders accepted by accept(ip).
+        """
+        self.open()
+        for proto, ttl in (("ssdp", ttl_ssdp), ("mdns", ttl_mdns)):
+            s = self.socks[proto]
+            try:
+                s.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, ttl)
+                if self.source_ip:
+                    s.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton(self.source_ip))
+            except Exception:
+                pass
+        found = {}
+        self._send("ssdp", SSDP_MSEARCH, SSDP_ADDR)
+        self._send("mdns", MDNS_QUERY, MDNS_ADDR)
+        self._wait(found, accept or (lambda ip: True), max(self.timeout, SSDP_MX + 0.2))
+        return found
+
+    def _wait(self, found, accept, duration):
+        deadline = time.monotonic() + duration
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self._drain(found, accept, remaining)
+
+def udp_sweep(ips, timeout=0.6, source_ip=None, pacer=None):
+    """Multiplexed SSDP + mDNS probe of every ip. Returns {ip: proto}; {} on socket errors."""
+    try:
+        with UdpProbeMux(timeout=timeout, source_ip=source_ip, pacer=pacer) as mux:
+            return mux.sweep(ips)
+    except OSError:
+        return {}
+
+def udp_multicast_discover(timeout=1.0, source_ip=None, accept=None, pacer=None):
+    """Multicast SSDP + mDNS discovery. Returns {ip: proto}; {} on socket errors."""
+    try:
+        with UdpProbeMux(timeout=timeout, source_ip=source_ip, pacer=pacer) as mux:
+            return mux.multicast(accept=accept)
+    except OSError:
+        return {}
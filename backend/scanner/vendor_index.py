@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+vendor_index.py
+
+Compact, memory-mapped MAC vendor index built from the IEEE registries
+(MA-L / OUI 24-bit, MA-M 28-bit, MA-S 36-bit).
+
+The index is one sorted binary file, so a freshly spawned scanner pays only an
+mmap() instead of parsing a text vendor database into a dict:
+
+  header   b"NVTOUI1\\0" | uint32 record count | uint32 string table offset
+  records  count x (uint64 key, uint32 name offset), sorted by key
+           key = (48-bit MAC prefix, left aligned) << 8 | prefix length in bits
+  strings  uint16 length + UTF-8 vendor name, de-duplicated
+
+Lookups binary-search each assignment size (36, 28, then 24 bits) so the longest
+matching prefix wins.
+
+Accepted source formats (auto-detected per line):
+  IEEE CSV        MA-L,00000C,"Cisco Systems, Inc",...      (oui.csv, mam.csv, oui36.csv)
+  IEEE text       00-00-0C (hex) / 00000C (base 16) lines  (oui.txt, mam.txt, oui36.txt)
+  Wireshark manuf 00:1B:C5:00:00:00/36	Short	Long name
+  prefix:vendor   00000C:Cisco Systems, Inc                 (mac-vendor-lookup cache)
+
+Usage:
+  python vendor_index.py build oui.csv mam.csv oui36.csv   # writes the default index path
+  python vendor_index.py lookup 00:1b:c5:00:10:01
+"""
+
+import csv
+import mmap
+import os
+import re
+import struct
+import sys
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_INDEX_PATH = os.environ.get("OUI_INDEX_PATH") or os.path.join(SCRIPT_DIR, "oui.idx")
+
+MAGIC = b"NVTOUI1\x00"
+_HEADER = struct.Struct(">8sII")
+_RECORD = struct.Struct(">QI")
+_PREFIX_BITS = (36, 28, 24)
+
+_IEEE_HEX = re.compile(r"^\s*([0-9A-Fa-f]{2}(?:-[0-9A-Fa-f]{2}){2})\s+\(hex\)")
+_IEEE_BASE16 = re.compile(r"^\s*([0-9A-Fa-f]{6})(?:-([0-9A-Fa-f]{6}))?\s+\(base 16\)\s+(.*\S)\s*$")
+_MANUF = re.compile(r"^([0-9A-Fa-f]{2}(?:[:\-.][0-9A-Fa-f]{2}){2,5})(?:/(\d+))?\s+(\S+)(?:\s+(.*\S))?\s*$")
+_PLAIN = re.compile(r"^([0-9A-Fa-f]{6,9})[:\t ]\s*(.*\S)\s*$")
+
+# ---------- Parsing ----------
+def mac_to_int(mac):
+    """48-bit integer for a MAC in any common notation, or None."""
+    if mac is None:
+        return None
+    if isinstance(mac, bytes) and len(mac) == 6:
+        return int.from_bytes(mac, "big")
+    hexonly = re.sub(r"[^0-9a-fA-F]", "", str(mac))
+    if len(hexonly) != 12:
+        return None
+    return int(hexonly, 16)
+
+def _entry(hex_prefix, bits, name):
+    hex_prefix = re.sub(r"[^0-9a-fA-F]", "", hex_prefix)
+    if bits is None:
+        bits = len(hex_prefix) * 4
+    if bits not in _PREFIX_BITS or not name:
+        return None
+    value = int(hex_prefix.ljust(12, "0")[:12], 16)
+    value = (value >> (48 - bits)) << (48 - bits)  # clear bits beyond the prefix
+    return value, bits, name.strip()
+
+def parse_registry(path):
+    """Yield (prefix_value_48bit, bits, vendor) from one registry file."""
+    with open(path, "r", encoding="utf-8", errors="replace", newline="") as f:
+        first = f.readline()
+        f.seek(0)
+        if "Assignment" in first and "," in first:
+            for row in csv.DictReader(f):
+                entry = _entry(row.get("Assignment") or "", None, row.get("Organization Name") or "")
+                if entry:
+                    yield entry
+            return
+        oui = None  # last "(hex)" line; MA-M / MA-S "(base 16)" lines only give the low-bit range
+        for line in f:
+            if not line.strip() or line.lstrip().startswith("#"):
+                continue
+            m = _IEEE_HEX.match(line)
+            if m:
+                oui = m.group(1).replace("-", "")
+                continue
+            m = _IEEE_BASE16.match(line)
+            if m:
+                if m.group(2) and oui:
+                    start, end = int(m.group(1), 16), int(m.group(2), 16)
+                    free_bits = (end - start + 1).bit_length() - 1
+                    entry = _entry(oui + m.group(1), 48 - free_bits, m.group(3))
+                else:
+                    entry = _entry(m.group(1), None, m.group(3))
+            else:
+                m = _MANUF.match(line)
+                if m:
+                    raw = m.group(1)
+                    bits = int(m.group(2)) if m.group(2) else 24
+                    entry = _entry(raw, bits, m.group(4) or m.group(3))
+                else:
+                    m = _PLAIN.match(line)
+                    entry = _entry(m.group(1), None, m.group(2)) if m else None
+            if entry:
+                yield entry
+
+# ---------- Building ----------
+def build_index(sources, out_path=DEFAULT_INDEX_PATH):
+    """Compile the registry files in `sources` into `out_path`. Returns the record count."""
+    entries = {}
+    for src in sources:
+        for value, bits, name in parse_registry(src):
+            entries[(value << 8) | bits] = name  # later sources override earlier ones
+
+    names = {}
+    strings = bytearray()
+    records = []
+    for key in sorted(entries):
+        name = entries[key]
+        if name not in names:
+            raw = name.encode("utf-8")[:0xFFFF]
+            names[name] = len(strings)
+            strings += struct.pack(">H", len(raw)) + raw
+        records.append(_RECORD.pack(key, names[name]))
+
+    string_offset = _HEADER.size + len(records) * _RECORD.size
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, len(records), string_offset))
+        f.write(b"".join(records))
+        f.write(bytes(strings))
+    os.replace(tmp_path, out_path)  # atomic swap so running scanners never see a half-written file
+    return len(records)
+
+# ---------- Lookup ----------
+class VendorIndex:
+    """Read-only mmap view of a compiled index."""
+
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, self._strings = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            self._mm.close()
+            raise ValueError(f"{path} is not a vendor index")
+
+    def close(self):
+        self._mm.close()
+
+    def _find(self, key):
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            mid_key = struct.unpack_from(">Q", self._mm, _HEADER.size + mid * _RECORD.size)[0]
+            if mid_key < key:
+                lo = mid + 1
+            elif mid_key > key:
+                hi = mid
+            else:
+                return _RECORD.unpack_from(self._mm, _HEADER.size + mid * _RECORD.size)[1]
+        return None
+
+    def _name(self, offset):
+        pos = self._strings + offset
+        (length,) = struct.unpack_from(">H", self._mm, pos)
+        return self._mm[pos + 2:pos + 2 + length].decode("utf-8", errors="replace")
+
+    def lookup(self, mac):
+        """Vendor name for `mac` using the longest matching assignment, or None."""
+        value = mac_to_int(mac)
+        if value is None:
+            return None
+        for bits in _PREFIX_BITS:
+            prefix = (value >> (48 - bits)) << (48 - bits)
+            offset = self._find((prefix << 8) | bits)
+            if offset is not None:
+                return self._name(offset)
+        return None
+
+_index = None
+_index_checked = False
+
+def get_index(path=DEFAULT_INDEX_PATH):
+    """Shared VendorIndex for this process, or None if no index has been built."""
+    global _index, _index_checked
+    if not _index_checked:
+        _index_checked = True
+        try:
+            _index = VendorIndex(path)
+        except (OSError, ValueError):
+            _index = None
+    return _index
+
+def main(argv):
+    if len(argv) >= 2 and argv[0] == "build":
+        count = build_index(argv[1:])
+        print(f"[+] Wrote {count} prefixes to {DEFAULT_INDEX_PATH}")
+        return 0
+    if len(argv) == 2 and argv[0] == "lookup":
+        idx = get_index()
+        if idx is None:
+            print(f"[!] No vendor index at {DEFAULT_INDEX_PATH}; build one first.")
+            return 1
+        print(idx.lookup(argv[1]) or "Unknown")
+        return 0
+    print(__doc__)
+    return 2
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -5,17 +5,28 @@ ping_only_scanner_json_only.py
 Outputs only JSON.
 Ping-only discovery.
 No logs or status messages printed.
-Continuously runs every second.
+Continuously runs every 5 seconds.
+
+Usage:
+  python scanner_service.py                  # full sweep each cycle, prints the whole device list
+  python scanner_service.py --incremental    # keep a host table, print join/leave/change events
+                                             # (one JSON object per line) plus periodic snapshots
+  python scanner_service.py --import-profile # print per-module import cost to stderr once at startup
+  python scanner_service.py --incremental --passive
+                                             # also learn hosts from ARP/DHCP/mDNS/SSDP/NetBIOS broadcasts:
+                                             # joins surface immediately and hosts heard recently are not re-pinged
 """
 
+import argparse
 import ipaddress
+import math
 import platform
+import queue
 import subprocess
 import sys
 import os
 import json
 import time
-from collections import OrderedDict
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import re
 from typing import Tuple
@@ -25,12 +36,44 @@ try:
 except Exception:
     sys.exit("netifaces required. Install with: pip install netifaces")
 
+# ---------------- Batched ICMP engine (shared with backend/scanner) ----------------
+SCANNER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scanner")
+if SCANNER_DIR not in sys.path:
+    sys.path.insert(0, SCANNER_DIR)
+
+# deferred imports: this service is respawned often, so optional modules load on first use
+from lazy_import import lazy_module, print_import_profile
+
+try:
+    from icmp_engine import icmp_sweep
+    from timing import make_estimator
+    ICMP_ENGINE_AVAILABLE = True
+except Exception:
+    ICMP_ENGINE_AVAILABLE = False
+
+try:
+    from neighbors import read_neighbors, macs_for
+except Exception:
+    read_neighbors = lambda network_cidr=None: {}
+    macs_for = lambda ips, table: {}
+
+try:
+    from passive import PassiveListener
+    PASSIVE_AVAILABLE = True
+except Exception:
+    PASSIVE_AVAILABLE = False
+
 # ---------------- Vendor Lookup ----------------
 try:
-    from mac_vendor_lookup import MacLookup
-    MACLOOKUP_AVAILABLE = True
+    from vendor_index import get_index
 except Exception:
-    MACLOOKUP_AVAILABLE = False
+    get_index = lambda: None
+
+# compact array-backed result table (stdlib only)
+from host_store import HostStore
+
+# only imported when a MAC needs a vendor and no OUI index has been built
+mac_vendor_lookup = lazy_module("mac_vendor_lookup", hint="pip install mac-vendor-lookup")
 
 _mac_lookup = None
 _vendor_cache = {}
@@ -63,11 +106,17 @@ def safe_vendor_lookup(mac):
     if mac_n in _vendor_cache:
         return _vendor_cache[mac_n]
     vendor = "Unknown"
-    if MACLOOKUP_AVAILABLE:
+    index = get_index()  # mmap OUI index built by network_scanner_cli.py --update-vendors
+    if index is not None:
+        try:
+            vendor = index.lookup(mac_n) or "Unknown"
+        except Exception:
+            vendor = "Unknown"
+    elif mac_vendor_lookup.available():
         global _mac_lookup
         try:
             if _mac_lookup is None:
-                _mac_lookup = MacLookup()
+                _mac_lookup = mac_vendor_lookup.MacLookup()
             vendor = _mac_lookup.lookup(mac_n)
         except Exception:
             vendor = "Unknown"
@@ -137,14 +186,27 @@ def ping_host(ip, timeout=1):
             cmd = ["ping", "-c", "1", "-W", str(max(1, int(round(timeout)))), ip]
         else:
             cmd = ["ping", "-c", "1", "-W", str(max(1, int(round(timeout)))), ip]
-        res = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        # -W only takes whole seconds on Linux/macOS; enforce the real timeout here.
+        res = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=timeout + 0.25)
         return res.returncode == 0
     except Exception:
         return False
 
-def ping_sweep(network_cidr, max_workers=200, timeout=0.5):
+def ping_sweep(network_cidr, max_workers=200, timeout=0.5, rtt=None):
     net = ipaddress.IPv4Network(network_cidr, strict=False)
-    ips = [str(ip) for ip in net.hosts()]
+    return ping_ips([str(ip) for ip in net.hosts()], max_workers=max_workers, timeout=timeout, rtt=rtt)
+
+def ping_ips(ips, max_workers=200, timeout=0.5, rtt=None):
+    if not ips:
+        return []
+    # One ICMP socket for the whole sweep; fork `ping` per host only if that is not permitted.
+    # `rtt` (timing.RttEstimator) carries learned round-trip times from cycle to cycle.
+    if ICMP_ENGINE_AVAILABLE:
+        if rtt is not None:
+            timeout = rtt.timeout()
+        icmp_alive = icmp_sweep(ips, timeout=timeout, rtt=rtt)
+        if icmp_alive is not None:
+            return sorted(icmp_alive, key=lambda s: tuple(int(x) for x in s.split(".")))
     alive = []
     with ThreadPoolExecutor(max_workers=max(4, min(max_workers, 1000))) as exe:
         futures = {exe.submit(ping_host, ip, timeout): ip for ip in ips}
@@ -160,57 +222,194 @@ def ping_sweep(network_cidr, max_workers=200, timeout=0.5):
 
 # ---------------- JSON Output ----------------
 def merge_and_dedupe(arp_map, ping_list):
-    mac_map = OrderedDict()
-    for ip, mac in arp_map.items():
-        key = mac or f"unknown-mac:{ip}"
-        if key not in mac_map:
-            mac_map[key] = {"mac": mac, "ips": set()}
-        mac_map[key]["ips"].add(ip)
-    for ip in ping_list:
-        if ip in arp_map:
-            continue
-        key = f"ping-only:{ip}"
-        if key not in mac_map:
-            mac_map[key] = {"mac": None, "ips": set()}
-        mac_map[key]["ips"].add(ip)
-    return mac_map
+    return HostStore(vendor_lookup=safe_vendor_lookup).merge(arp_map, ping_list)
 
 def results_to_json(mac_map):
-    out = []
-    for entry in mac_map.values():
-        mac = entry["mac"]
-        ips = sorted(entry["ips"])
-        if mac:
-            vendor = safe_vendor_lookup(mac)
-            mobile = any(k in vendor.lower() for k in 
-                         ["apple", "samsung", "xiaomi", "huawei", "oneplus", "pixel", "realme", "vivo"])
-            out.append({
-                "mac": mac,
-                "ips": ips,
-                "vendor": vendor,
-                "mobile": mobile,
-                "ping_only": False
-            })
-        else:
-            out.append({
-                "mac": None,
-                "ips": ips,
-                "vendor": "Unknown (ping-only)",
-                "mobile": False,
-                "ping_only": True
-            })
-    return out
+    return mac_map.to_json()
+
+# ---------------- Incremental mode ----------------
+def device_for(ip, mac=None, hostname=None):
+    """Device object for one host, in the same shape results_to_json() emits (plus "hostname" if known)."""
+    device = results_to_json(merge_and_dedupe({ip: mac} if mac else {}, [ip]))[0]
+    if hostname:
+        device["hostname"] = hostname
+    return device
+
+def emit(obj):
+    print(json.dumps(obj))
+    sys.stdout.flush()
+
+class HostTable:
+    """
+    In-memory view of the live hosts keyed by IP.
+    A host leaves after `miss_limit` consecutive failed re-verifications so a
+    single dropped echo reply does not flap it out and back in.
+    """
+
+    def __init__(self, miss_limit=2):
+        self.miss_limit = max(1, miss_limit)
+        self.hosts = {}
+
+    def seen(self, ip, device):
+        """Record a reply; returns a join/change event or None if nothing changed."""
+        entry = self.hosts.get(ip)
+        now = time.time()
+        if entry is None:
+            self.hosts[ip] = {"device": device, "misses": 0, "first_seen": now, "last_seen": now}
+            return {"type": "join", "device": device}
+        entry["misses"] = 0
+        entry["last_seen"] = now
+        if entry["device"] != device:
+            previous = entry["device"]
+            entry["device"] = device
+            return {"type": "change", "device": device, "previous": previous}
+        return None
+
+    def missed(self, ip):
+        """Record a failed re-verification; returns a leave event once miss_limit is reached."""
+        entry = self.hosts.get(ip)
+        if entry is None:
+            return None
+        entry["misses"] += 1
+        if entry["misses"] < self.miss_limit:
+            return None
+        del self.hosts[ip]
+        return {"type": "leave", "device": entry["device"]}
+
+    def devices(self):
+        return [self.hosts[ip]["device"] for ip in sorted(self.hosts, key=lambda s: tuple(int(x) for x in s.split(".")))]
+
+def run_incremental(network_cidr, rtt=None, verify_interval=5.0, sweep_period=60.0, snapshot_interval=60.0, miss_limit=2,
+                    passive=None):
+    """
+    Seed the host table with one full sweep, then every `verify_interval` seconds:
+      - re-ping the known-alive hosts,
+      - ping the next slice of the unassigned address space (the whole space is
+        covered once every `sweep_period` seconds),
+    and print only join/leave/change events, plus a full snapshot every
+    `snapshot_interval` seconds so consumers can resynchronise.
+
+    With `passive` (a started passive.PassiveListener) hosts heard on the wire join
+    as soon as they are seen instead of at the next sweep, keep their MAC/hostname,
+    are not re-pinged while they keep talking, and are skipped by the rotating sweep
+    until they have been silent for miss_limit * verify_interval seconds.
+    """
+    net = ipaddress.IPv4Network(network_cidr, strict=False)
+    all_ips = [str(ip) for ip in net.hosts()]
+    table = HostTable(miss_limit=miss_limit)
+    info = {}          # ip -> (mac, hostname) learned passively
+    heard = {}         # ip -> wall-clock time of the last passive sighting (PassiveTable last_seen)
+    # a silent host stays in the table for miss_limit failed checks; a sighting is trusted as long
+    heard_ttl = table.miss_limit * verify_interval
+
+    def device(ip):
+        return device_for(ip, *info.get(ip, (None, None)))
+
+    def listen(until):
+        """Apply passive sightings until `until` (monotonic); plain sleep without a listener."""
+        if passive is None:
+            time.sleep(max(0.0, until - time.monotonic()))
+            return
+        while True:
+            remaining = until - time.monotonic()
+            if remaining <= 0:
+                return
+            try:
+                event = passive.events.get(timeout=remaining)
+            except queue.Empty:
+                return
+            ip = event["ip"]
+            info[ip] = (event["mac"], event["hostname"])
+            heard[ip] = event["last_seen"]
+            change = table.seen(ip, device(ip))
+            if change:
+                emit(change)
+
+    seed = ping_ips(all_ips, rtt=rtt)
+    for ip, mac in macs_for(seed, read_neighbors(network_cidr)).items():
+        info[ip] = (mac, None)
+    for ip in seed:
+        table.seen(ip, device(ip))
+    emit({"type": "snapshot", "network": network_cidr, "devices": table.devices()})
+    last_snapshot = time.monotonic()
+
+    cycles_per_rotation = max(1, int(round(sweep_period / max(verify_interval, 0.1))))
+    slice_size = max(1, math.ceil(len(all_ips) / cycles_per_rotation))
+    cursor = 0
+
+    while True:
+        started = time.monotonic()
+        now = time.time()
+        # events only report joins / changes; repeat sightings of a host that keeps talking
+        # only move its last_seen in the listener's table
+        if passive is not None:
+            heard.update(passive.table.last_seen())
+        # forget stale sightings so hosts that went quiet (or left) are swept and can leave again
+        for ip in [ip for ip, when in heard.items() if now - when > heard_ttl]:
+            del heard[ip]
+        # hosts heard within the last interval are alive without a probe
+        quiet = [ip for ip in table.hosts if now - heard.get(ip, float("-inf")) > verify_interval]
+        fresh = []
+        for _ in range(min(slice_size, len(all_ips))):
+            ip = all_ips[cursor]
+            cursor = (cursor + 1) % len(all_ips)
+            if ip not in table.hosts and ip not in heard:
+                fresh.append(ip)
+
+        alive = set(ping_ips(quiet + fresh, rtt=rtt))
+        # the kernel resolved MACs for whatever answered; use them for hosts still without one
+        for ip, mac in macs_for(alive, read_neighbors(network_cidr)).items():
+            if not info.get(ip, (None, None))[0]:
+                info[ip] = (mac, info.get(ip, (None, None))[1])
+        for ip in quiet:
+            event = table.seen(ip, device(ip)) if ip in alive else table.missed(ip)
+            if event:
+                emit(event)
+        for ip in fresh:
+            if ip in alive:
+                event = table.seen(ip, device(ip))
+                if event:
+                    emit(event)
+
+        if time.monotonic() - last_snapshot >= snapshot_interval:
+            emit({"type": "snapshot", "network": network_cidr, "devices": table.devices()})
+            last_snapshot = time.monotonic()
+
+        listen(started + verify_interval)
 
 # ---------------- Main ----------------
 def main():
+    ap = argparse.ArgumentParser(description="Continuous ping-only scanner (JSON on stdout)")
+    ap.add_argument("--incremental", action="store_true", help="emit join/leave/change events instead of full lists")
+    ap.add_argument("--verify-interval", type=float, default=5.0, help="incremental: seconds between re-checks of known hosts")
+    ap.add_argument("--sweep-period", type=float, default=60.0, help="incremental: seconds to rotate through the unassigned address space")
+    ap.add_argument("--snapshot-interval", type=float, default=60.0, help="incremental: seconds between full snapshots")
+    ap.add_argument("--miss-limit", type=int, default=2, help="incremental: failed re-checks before a host leaves")
+    ap.add_argument("--passive", action="store_true", help="incremental: also learn hosts from broadcast traffic (needs scapy and capture privileges)")
+    ap.add_argument("--import-profile", action="store_true", help="print how long each module import took (to stderr) before the first cycle")
+    args = ap.parse_args()
+
+    if args.import_profile:
+        print_import_profile()
+
     iface, ip, netmask, network_cidr = auto_select_iface_and_network()
     if not network_cidr:
         print(json.dumps({"error": "Could not detect active network"}))
         return
 
+    rtt = make_estimator("normal") if ICMP_ENGINE_AVAILABLE else None
+    if args.incremental:
+        passive = None
+        if args.passive and PASSIVE_AVAILABLE:
+            net = ipaddress.IPv4Network(network_cidr, strict=False)
+            passive = PassiveListener(iface=iface, accept=lambda addr: ipaddress.IPv4Address(addr) in net).start()
+        run_incremental(network_cidr, rtt=rtt, verify_interval=args.verify_interval, sweep_period=args.sweep_period,
+                        snapshot_interval=args.snapshot_interval, miss_limit=args.miss_limit, passive=passive)
+        return
+
     while True:
-        ping_list = ping_sweep(network_cidr)
-        arp_map = {}
+        ping_list = ping_sweep(network_cidr, rtt=rtt)
+        arp_map = macs_for(ping_list, read_neighbors(network_cidr))
         mac_map = merge_and_dedupe(arp_map, ping_list)
         out = results_to_json(mac_map)
         print(json.dumps(out, indent=2))
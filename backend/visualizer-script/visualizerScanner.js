@@ -47,57 +47,98 @@ async function connectMongo() {
     });
 }
 
+// ---------------- DEVICE SYNC ----------------
+async function refreshVisualizer() {
+  // Lazy import of visualizer update AFTER setup
+  console.log("⚙️ Running visualizer update after scan...");
+  try {
+    const { runVisualizerUpdate } = await import("./visualizer.js");
+    await runVisualizerUpdate();
+    console.log("✅ Visualizer update completed.");
+  } catch (err) {
+    console.error("❌ Visualizer update failed:", err.message);
+  }
+}
+
+async function upsertDevice(d) {
+  await Device.findOneAndUpdate(
+    { "ips.0": d.ips[0] },
+    { ...d, lastSeen: new Date() },
+    { upsert: true, new: true }
+  );
+}
+
+async function syncSnapshot(devices) {
+  console.log(`📡 Received ${devices.length} devices from Python`);
+  const currentIPs = devices.map((d) => d.ips[0]);
+  await Device.deleteMany({ "ips.0": { $nin: currentIPs } });
+
+  for (const d of devices) {
+    await upsertDevice(d);
+  }
+
+  console.log(`✅ Synced ${devices.length} devices to DB`);
+}
+
+// One JSON object per line from `scanner_service.py --incremental`:
+//   {type: "snapshot", devices: [...]}  full resync
+//   {type: "join" | "change", device}    upsert one device
+//   {type: "leave", device}              remove one device
+async function handleScannerEvent(event) {
+  switch (event.type) {
+    case "snapshot":
+      await syncSnapshot(event.devices || []);
+      break;
+    case "join":
+    case "change":
+      console.log(`➕ ${event.type}: ${event.device.ips[0]}`);
+      await upsertDevice(event.device);
+      break;
+    case "leave":
+      console.log(`➖ leave: ${event.device.ips[0]}`);
+      await Device.deleteMany({ "ips.0": event.device.ips[0] });
+      break;
+    default:
+      if (event.error) console.error("🔥 Scanner error:", event.error);
+      return;
+  }
+  await refreshVisualizer();
+}
+
 // ---------------- RUN SCANNER LOOP ----------------
 async function runScannerCycle() {
   console.log("🚀 Starting Python scanner cycle...");
 
   return new Promise((resolve) => {
-    const scannerProcess = spawn("python", [scannerPath], {
+    const scannerProcess = spawn("python", [scannerPath, "--incremental"], {
       cwd: __dirname,
       stdio: ["ignore", "pipe", "pipe"],
     });
 
     let buffer = "";
+    // Events are applied strictly in order, even when several arrive in one chunk.
+    let queue = Promise.resolve();
     scannerProcess.stdout.setEncoding("utf8");
 
-    scannerProcess.stdout.on("data", async (data) => {
+    scannerProcess.stdout.on("data", (data) => {
       buffer += data.toString();
 
-      if (buffer.trim().endsWith("]")) {
+      let newline;
+      while ((newline = buffer.indexOf("\n")) !== -1) {
+        const line = buffer.slice(0, newline).trim();
+        buffer = buffer.slice(newline + 1);
+        if (!line) continue;
+
+        let event;
         try {
-          const jsonStart = buffer.indexOf("[");
-          const jsonText = buffer.slice(jsonStart).trim();
-          const devices = JSON.parse(jsonText);
-
-          console.log(`📡 Received ${devices.length} devices from Python`);
-          const currentIPs = devices.map((d) => d.ips[0]);
-          await Device.deleteMany({ "ips.0": { $nin: currentIPs } });
-
-          for (const d of devices) {
-            await Device.findOneAndUpdate(
-              { "ips.0": d.ips[0] },
-              { ...d, lastSeen: new Date() },
-              { upsert: true, new: true }
-            );
-          }
-
-          console.log(`✅ Synced ${devices.length} devices to DB`);
-
-          // Lazy import of visualizer update AFTER setup
-          console.log("⚙️ Running visualizer update after scan...");
-          try {
-            const { runVisualizerUpdate } = await import("./visualizer.js");
-            await runVisualizerUpdate();
-            console.log("✅ Visualizer update completed.");
-          } catch (err) {
-            console.error("❌ Visualizer update failed:", err.message);
-          }
-
-          buffer = "";
+          event = JSON.parse(line);
         } catch (err) {
           console.error("❌ JSON parse error:", err.message);
-          buffer = "";
+          continue;
         }
+        queue = queue
+          .then(() => handleScannerEvent(event))
+          .catch((err) => console.error("❌ Device sync failed:", err.message));
       }
     });
 
@@ -107,7 +148,7 @@ async function runScannerCycle() {
 
     scannerProcess.on("close", (code) => {
       console.log(`🔁 Scanner cycle finished with code ${code}`);
-      resolve();
+      queue.then(resolve);
     });
   });
 }